@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of the algorithm 3 matcher (`normalized_track_match`).
+
+The legacy matcher, which cleaned the Spotify track again for every candidate,
+is kept here as the reference.  For every track of `tests/playliststest.json`
+two result lists of 20 candidates are built, like a YTMusic search would return:
+one with variants of the track (remastered, featuring, other album, other
+artist spelling) and one without, mixed with other tracks of the backup.
+The benchmark checks that the legacy matcher and `normalized_tracks_match`
+take the same decision for every candidate, then times the lookup loop of algorithm 3 (first match wins,
+all candidates are tried when there's none) with both: "cold" clears the
+normalization cache before every run (every result is new), "warm" keeps it
+(the results were seen before, e.g. re-scoring cached searches or the same
+results coming back for several tracks of an artist).
+
+Run from the repository root:
+
+    python benchmarks/bench_matching.py [--repeat N]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from spotify2ytmusic.normalized_metadata_algorithm import (  # noqa: E402
+    clean_track_name,
+    normalize_track,
+    normalize_youtube_track,
+    normalized_album_name_match,
+    normalized_artist_name_match,
+    normalized_track_name_match,
+    normalized_tracks_match,
+)
+
+
+def legacy_normalized_track_match(spotify_track_name, spotify_album, spotify_artist, youtube_track) -> bool:
+    youtube_track_name = youtube_track["title"]
+    youtube_album = youtube_track["album"]["name"] if isinstance(youtube_track["album"], dict) else youtube_track["album"]
+    youtube_artist = youtube_track["artists"][0]["name"]
+
+    if spotify_track_name == youtube_track_name and spotify_artist == youtube_artist:
+        return True
+
+    spotify_is_instrumental = "instrumental" in f"{spotify_track_name} {spotify_album} {spotify_artist}".lower()
+    youtube_is_instrumental = "instrumental" in f"{youtube_track_name} {youtube_album} {youtube_artist}".lower()
+    if spotify_is_instrumental != youtube_is_instrumental:
+        return False
+
+    if normalized_track_name_match(spotify_track_name, youtube_track_name) and \
+       normalized_artist_name_match(spotify_artist, youtube_artist):
+        if normalized_album_name_match(spotify_album, youtube_album):
+            return True
+        cleaned_spotify_track = clean_track_name(spotify_track_name)
+        cleaned_youtube_track = clean_track_name(youtube_track_name)
+        if cleaned_spotify_track == cleaned_youtube_track:
+            return True
+
+    return False
+
+
+def spotify_tracks(path: str = "tests/playliststest.json") -> list:
+    """(title, album, artist) of the tracks of the test backup."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        (t["track"]["name"], t["track"]["album"]["name"], t["track"]["artists"][0]["name"])
+        for playlist in data["playlists"]
+        for t in playlist["tracks"]
+        if t["track"] is not None
+    ]
+
+
+def youtube_result(title: str, album: str, artist: str) -> dict:
+    return {"title": title, "album": {"name": album}, "artists": [{"name": artist}], "videoId": "x"}
+
+
+def search_results(rng: random.Random, track: tuple, tracks: list, found: bool, count: int = 20) -> list:
+    """Results for `track`: variants of it if `found`, else only the instrumental one, among other tracks."""
+    title, album, artist = track
+    variants = [youtube_result(f"{title} (Instrumental)", album, artist)]
+    if found:
+        variants += [
+            youtube_result(f"{title} (Remastered 2011)", album, artist),
+            youtube_result(f"{title} (feat. Someone)", f"{album} (Deluxe Edition)", artist),
+            youtube_result(title, "Greatest Hits", f"{artist} & Friends"),
+            youtube_result(title.upper(), album, artist.lower()),
+        ]
+    # Versioni diverse per ogni ricerca, come i risultati veri: niente cache tra una ricerca e l'altra
+    others = [
+        youtube_result(f"{other_title} {rng.randrange(1000)}", other_album, other_artist)
+        for other_title, other_album, other_artist in rng.sample(tracks, count - len(variants))
+    ]
+    results = others + variants
+    rng.shuffle(results)
+    return results
+
+
+def lookups(tracks: list) -> list:
+    """One lookup per track that finds it among the results, one that doesn't (all 20 candidates are tried)."""
+    rng = random.Random(0)
+    return [(track, search_results(rng, track, tracks, found)) for found in (True, False) for track in tracks]
+
+
+def legacy_lookup(track: tuple, songs: list):
+    title, album, artist = track
+    for song in songs:
+        if legacy_normalized_track_match(title, album, artist, song):
+            return song
+    return songs[0]
+
+
+def current_lookup(track: tuple, songs: list):
+    spotify_track = normalize_track(*track)
+    for song in songs:
+        if normalized_tracks_match(spotify_track, normalize_youtube_track(song)):
+            return song
+    return songs[0]
+
+
+def bench(func, cases: list, repeat: int, cold: bool = True) -> float:
+    best = float("inf")
+    normalize_track.cache_clear()
+    for _ in range(repeat):
+        if cold:
+            normalize_track.cache_clear()
+        start = time.perf_counter()
+        for track, songs in cases:
+            func(track, songs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, the best is kept (default: 5)")
+    args = parser.parse_args()
+
+    tracks = spotify_tracks()
+    cases = lookups(tracks)
+    mismatches = 0
+    for track, songs in cases:
+        spotify_track = normalize_track(*track)
+        for song in songs:
+            if legacy_normalized_track_match(*track, song) != normalized_tracks_match(spotify_track, normalize_youtube_track(song)):
+                mismatches += 1
+    print(f"Checked {sum(len(songs) for _, songs in cases)} candidates: {mismatches} mismatches")
+
+    legacy = bench(legacy_lookup, cases, args.repeat)
+    print(f"legacy:           {len(cases) / legacy:8.0f} tracks/s")
+    for label, cold in (("current, cold:", True), ("current, warm:", False)):
+        current = bench(current_lookup, cases, args.repeat, cold)
+        print(f"{label:17} {len(cases) / current:8.0f} tracks/s  ({legacy / current:.1f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of `normalized_metadata_algorithm.clean_metadata`.
+
+The legacy implementation (regexes compiled on every call, transliteration
+table rebuilt per string) is kept here as the reference: the benchmark first
+checks that the current implementation gives byte-identical output for the
+track, album and artist names in `tests/playliststest.json` and for a large
+set of random strings built from the words and characters the rules act on,
+then times both.
+
+Run from the repository root:
+
+    python benchmarks/bench_normalization.py [--fuzz N] [--repeat N]
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from spotify2ytmusic.normalized_metadata_algorithm import clean_metadata  # noqa: E402
+
+METADATA_TYPES = ("track", "album", "artist")
+
+
+def legacy_transliterate_text(text: str) -> str:
+    replacements = {
+        **{c: 'a' for c in 'áàâäãå'}, **{c: 'A' for c in 'ÁÀÂÄÃÅ'},
+        **{c: 'e' for c in 'éèêë'}, **{c: 'E' for c in 'ÉÈÊË'},
+        **{c: 'i' for c in 'íìîï'}, **{c: 'I' for c in 'ÍÌÎÏ'},
+        **{c: 'o' for c in 'óòôöõø'}, **{c: 'O' for c in 'ÓÒÔÖÕØ'},
+        **{c: 'u' for c in 'úùûü'}, **{c: 'U' for c in 'ÚÙÛÜ'},
+        **{c: 'y' for c in 'ýÿ'}, **{c: 'Y' for c in 'ÝŸ'},
+        'æ': 'ae', 'Æ': 'AE', 'œ': 'oe', 'Œ': 'OE',
+        'ñ': 'n', 'Ñ': 'N', 'ç': 'c', 'Ç': 'C',
+        'ß': 'ss', 'þ': 'th', 'Þ': 'TH',
+    }
+    return ''.join(replacements.get(char, char) for char in text)
+
+
+def legacy_clean_metadata(metadata: str, metadata_type: str = "track") -> str:
+    metadata = legacy_transliterate_text(metadata).lower()
+    metadata = metadata.replace("&", "and")
+
+    if metadata_type == "track":
+        metadata = re.sub(r"[\[(\{](?:feat|featuring|ft|with|prod|prod\.? by|produced by)\.? .*?[\]\)\}]", "", metadata)
+        metadata = re.sub(r"\b(?:deluxe|instrumental|bonus\strack|radio|video|edit|version|edition|single|mono|original|mix|lp|extended|remaster(?:ed)?|re-?edit)(?:\b|$)", "", metadata)
+        metadata = re.sub(r"\b(?:ft\.?|feat\.?|featuring|with|prod\.?(?:\s?by)?)\b.*$", "", metadata)
+    elif metadata_type == "album":
+        metadata = re.sub(r"\b(?:the|super|deluxe|special|anniversary|\d{2}th|extended|version|expanded|edition|re-?master(?:ed)?)(?:\b|$)", "", metadata)
+        metadata = re.sub(r"\b(?:ep|lp|single|instrumentals?)(?:\b|$)", "", metadata)
+    elif metadata_type == "artist":
+        metadata = re.sub(r"\bthe\s+", "", metadata)
+        metadata = re.sub(r"\s+", "", metadata)
+
+    metadata = re.sub(r"(?<!\d)(?:17|18|19|20)\d{2}(?!\d)", "", metadata)
+    metadata = re.sub(r"[.,\"`´’':;+*!\/\-\(\)\[\]\{\}]", "", metadata)
+    metadata = re.sub(r"\s+", " ", metadata).strip()
+    return metadata.strip()
+
+
+def playlist_names(path: str = "tests/playliststest.json") -> list:
+    """Track, album and artist names of the test backup."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    names = []
+    for playlist in data["playlists"]:
+        for src_track in playlist["tracks"]:
+            track = src_track["track"]
+            if track is None:
+                continue
+            names += [track["name"], track["album"]["name"], track["artists"][0]["name"]]
+    return names
+
+
+# Pezzi con cui costruire stringhe casuali che esercitano tutte le regole
+_FUZZ_TOKENS = (
+    "the", "The", "THE", "super", "deluxe", "special", "anniversary", "10th", "25th",
+    "extended", "version", "expanded", "edition", "remaster", "remastered", "re-master",
+    "ep", "EP", "lp", "single", "instrumental", "instrumentals", "bonus track", "radio",
+    "video", "edit", "re-edit", "reedit", "mono", "original", "mix", "feat", "feat.",
+    "ft", "ft.", "featuring", "with", "prod", "prod.", "prod by", "produced by",
+    "1999", "2011", "1700", "12345", "20", "19", "love", "song", "bathe", "theme",
+    "Café", "Ñandú", "Œuvre", "straße", "Þór", "ő", "Ø", "&", "-", "(", ")", "[", "]",
+    "{", "}", ".", ",", "'", "’", "´", "`", ":", ";", "+", "*", "!", "/", '"', "_",
+)
+_FUZZ_SEPARATORS = ("", " ", " ", " ", "  ", "\t", "-", "(", ")", " (", ") ")
+
+
+def fuzz_strings(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    strings = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 8)):
+            parts.append(rng.choice(_FUZZ_TOKENS))
+            parts.append(rng.choice(_FUZZ_SEPARATORS))
+        strings.append("".join(parts))
+    return strings
+
+
+def check(strings: list) -> int:
+    mismatches = 0
+    for text in strings:
+        for metadata_type in METADATA_TYPES:
+            expected = legacy_clean_metadata(text, metadata_type)
+            got = clean_metadata(text, metadata_type)
+            if expected != got:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"MISMATCH {metadata_type}: {text!r}: {expected!r} != {got!r}")
+    return mismatches
+
+
+def bench(func, strings: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in strings:
+            for metadata_type in METADATA_TYPES:
+                func(text, metadata_type)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--fuzz", type=int, default=100000, help="Random strings to check (default: 100000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, the best is kept (default: 5)")
+    args = parser.parse_args()
+
+    names = playlist_names()
+    mismatches = check(names) + check(fuzz_strings(args.fuzz))
+    print(f"Checked {len(names)} playlist names and {args.fuzz} random strings: {mismatches} mismatches")
+
+    for label, strings in (("playlist names", names), ("random strings", fuzz_strings(2000, seed=1))):
+        legacy = bench(legacy_clean_metadata, strings, args.repeat)
+        current = bench(clean_metadata, strings, args.repeat)
+        calls = len(strings) * len(METADATA_TYPES)
+        print(
+            f"{label:15} legacy {legacy / calls * 1e6:6.2f} us/call, "
+            f"current {current / calls * 1e6:6.2f} us/call ({legacy / current:.1f}x)"
+        )
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
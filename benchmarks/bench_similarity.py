@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of `normalized_metadata_algorithm.text_similarity`.
+
+The legacy implementation (full O(n*m) Levenshtein distance, a new list per
+row) is kept here as the reference.  Pairs of cleaned track, album and artist
+names from `tests/playliststest.json` are compared: each name against a few
+misspelled copies of itself and against other names, as when re-scoring search
+results.  The benchmark checks that both give the same true/false results,
+then times them.
+
+Run from the repository root:
+
+    python benchmarks/bench_similarity.py [--repeat N]
+"""
+
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from spotify2ytmusic.normalized_metadata_algorithm import (  # noqa: E402
+    clean_metadata,
+    text_similarity,
+)
+from bench_normalization import METADATA_TYPES, playlist_names  # noqa: E402
+
+
+def legacy_levenshtein_distance(text1: str, text2: str) -> int:
+    if len(text1) < len(text2):
+        return legacy_levenshtein_distance(text2, text1)
+    if not text2:
+        return len(text1)
+    prev = list(range(len(text2) + 1))
+    for i, ca in enumerate(text1):
+        curr = [i + 1]
+        for j, cb in enumerate(text2):
+            curr.append(min(prev[j+1] + 1, curr[-1] + 1, prev[j] + (ca != cb)))
+        prev = curr
+    return prev[-1]
+
+
+def legacy_text_similarity(text1: str, text2: str) -> bool:
+    text1 = text1.strip().lower()
+    text2 = text2.strip().lower()
+    if len(text1) > 1.7 * len(text2) or len(text2) > 1.7 * len(text1):
+        return False
+    if text1 == text2 or text1 in text2 or text2 in text1:
+        return True
+    text1_parts = text1.split()
+    text2_parts = text2.split()
+    if len(text1_parts) > 1 and len(text1_parts) == len(text2_parts):
+        if set(text1_parts) == set(text2_parts):
+            return True
+    if legacy_levenshtein_distance(text1, text2) <= 2:
+        return True
+    if text1.replace(" ", "") == text2.replace(" ", ""):
+        return True
+    return False
+
+
+def misspell(rng: random.Random, text: str, edits: int) -> str:
+    letters = "abcdefghijklmnopqrstuvwxyz "
+    chars = list(text)
+    for _ in range(edits):
+        op = rng.randrange(3)
+        pos = rng.randrange(len(chars) + 1)
+        if op == 0 or not chars:
+            chars.insert(pos, rng.choice(letters))
+        elif op == 1:
+            del chars[min(pos, len(chars) - 1)]
+        else:
+            chars[min(pos, len(chars) - 1)] = rng.choice(letters)
+    return "".join(chars)
+
+
+def similarity_pairs(seed: int = 0) -> list:
+    rng = random.Random(seed)
+    # playlist_names() gives (track, album, artist) triples
+    names = [
+        clean_metadata(name, METADATA_TYPES[i % 3])
+        for i, name in enumerate(playlist_names())
+    ]
+    names = [name for name in names if name]
+    pairs = []
+    for name in names:
+        for edits in (1, 2, 3, 4):
+            pairs.append((name, misspell(rng, name, edits)))
+        for other in rng.sample(names, 8):
+            pairs.append((name, other))
+    return pairs
+
+
+def bench(func, pairs: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text1, text2 in pairs:
+            func(text1, text2)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10, help="Timing repetitions, the best is kept (default: 10)")
+    args = parser.parse_args()
+
+    pairs = similarity_pairs()
+    mismatches = sum(
+        legacy_text_similarity(text1, text2) != text_similarity(text1, text2)
+        for text1, text2 in pairs
+    )
+    print(f"Checked {len(pairs)} pairs: {mismatches} mismatches")
+
+    legacy = bench(legacy_text_similarity, pairs, args.repeat)
+    current = bench(text_similarity, pairs, args.repeat)
+    print(f"legacy:  {legacy / len(pairs) * 1e6:6.2f} us/pair")
+    print(f"current: {current / len(pairs) * 1e6:6.2f} us/pair  ({legacy / current:.1f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end throughput benchmark of the copy commands.
+
+Synthetic Spotify backups (see `synthetic_library.py`) of every size in
+`--sizes` are copied to a fake YTMusic that answers from the same library
+after `--latency` seconds, so nothing but the network is left out.  For every
+size three scenarios are timed, each in its own process so that its peak RSS
+is its own:
+
+- `iter`: reading every playlist and the liked albums with `iter_spotify_*`
+- `copier`: copying "Liked Songs" to a playlist with `copier`
+- `copy_all_playlists`: copying every other playlist
+
+The report (tracks per second, peak RSS, time from the start to the first
+tracks written) is printed and saved as JSON; `--compare` an older report to
+see the change between versions.  The peak RSS of the copy scenarios includes
+the index of the library kept by the fake YTMusic.
+
+Run from the repository root:
+
+    python benchmarks/bench_throughput.py [--sizes 1000,10000,100000] [--latency 0.005]
+        [--output bench_throughput.json] [--compare OLD.json]
+"""
+
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from argparse import SUPPRESS, ArgumentParser
+from datetime import datetime
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from spotify2ytmusic import backend  # noqa: E402
+from synthetic_library import generate_library  # noqa: E402
+
+SCENARIOS = ("iter", "copier", "copy_all_playlists")
+
+
+class FakeYTMusic:
+    """YTMusic stand-in answering searches with the songs of a Spotify backup.
+
+    A search for a song of the backup returns it (95% of the time, among the
+    first 5 results) with a couple of variants and other songs, like YTMusic
+    does; playlists live in memory.  Every call waits `latency` seconds.
+    """
+
+    def __init__(self, backup: Optional[backend.SpotifyBackup], latency: float = 0.0):
+        self.latency = latency
+        self.songs = {}
+        self.catalog = []
+        for src_pl in backup.iter_playlists() if backup is not None else ():
+            for src_track in backup.iter_tracks(src_pl.get("id")):
+                track = src_track["track"]
+                if track is None:
+                    continue
+                song = (track["name"], track["artists"][0]["name"], track["album"]["name"])
+                if song[:2] not in self.songs:
+                    self.songs[song[:2]] = song
+                    self.catalog.append(song)
+        self.by_query = {f"{title} {artist}": song for (title, artist), song in self.songs.items()}
+        self.playlists = {}
+        self.calls = 0
+        self.first_write = None
+        self._lock = threading.Lock()
+
+    def _call(self) -> None:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _wrote(self) -> None:
+        with self._lock:
+            if self.first_write is None:
+                self.first_write = time.perf_counter()
+
+    @staticmethod
+    def _result(title: str, artist: str, album: str) -> dict:
+        return {
+            "resultType": "song",
+            "title": title,
+            "videoId": f"{zlib.crc32(f'{title}|{artist}|{album}'.encode()):011x}",
+            "artists": [{"name": artist, "id": None}],
+            "album": {"name": album, "id": None},
+        }
+
+    def search(self, query: str, filter: str = None, limit: int = 20) -> list:
+        self._call()
+        rng = random.Random(zlib.crc32(query.encode()))
+        results = [self._result(*song) for song in rng.sample(self.catalog, min(8, len(self.catalog)))]
+        song = self.by_query.get(query)
+        if song is not None and rng.random() < 0.95:
+            title, artist, album = song
+            results.insert(rng.randrange(5), self._result(*song))
+            results.insert(rng.randrange(len(results)), self._result(f"{title} (Live)", artist, album))
+        return results
+
+    def get_search_suggestions(self, query: str) -> list:
+        self._call()
+        return [query]
+
+    def get_library_playlists(self, limit: int = 25) -> list:
+        self._call()
+        return [{"playlistId": id, "title": pl["title"], "count": len(pl["tracks"])} for id, pl in self.playlists.items()]
+
+    def create_playlist(self, title: str, description: str, privacy_status: str = "PRIVATE") -> str:
+        self._call()
+        with self._lock:
+            id = f"PL{len(self.playlists):08d}"
+            self.playlists[id] = {"id": id, "title": title, "tracks": []}
+        return id
+
+    def get_playlist(self, playlistId: str, limit: int = 100) -> dict:
+        self._call()
+        return self.playlists.setdefault(playlistId, {"id": playlistId, "title": playlistId, "tracks": []})
+
+    def get_liked_songs(self, limit: int = 100) -> dict:
+        return self.get_playlist("LM")
+
+    def add_playlist_items(self, playlistId: str, videoIds: list, duplicates: bool = False) -> dict:
+        self._call()
+        self._wrote()
+        self.get_playlist(playlistId)["tracks"].extend({"videoId": id} for id in videoIds)
+        return {"status": "STATUS_SUCCEEDED"}
+
+    def rate_song(self, videoId: str, rating: str = "INDIFFERENT") -> dict:
+        self._call()
+        self._wrote()
+        return {}
+
+
+def peak_rss_mb():
+    #  ru_maxrss sopravvive a exec su Linux, il figlio erediterebbe il picco del generatore: meglio VmHWM
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    #  ru_maxrss è in KB su Linux, in byte su macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, 1)
+
+
+def run_scenario(scenario: str, backup_file: str, latency: float, algo: int, concurrency: int) -> dict:
+    """Run one scenario in this process.  Returns its measures."""
+    backup_file = os.path.abspath(backup_file)
+    backup = backend.open_backup(backup_file)
+    fake = FakeYTMusic(backup if scenario != "iter" else None, latency)
+    backend.get_ytmusic = lambda: fake
+    backend.configure_search_cache(enabled=False)
+    backend.configure_rate_limiter(0)
+    backend.playlist_settle_seconds = 0  # La pausa dopo create_playlist serve solo con YTMusic vero
+
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)  # File di log e journal dei comandi
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        tracks = 0
+        if scenario == "iter":
+            for src_pl in backup.iter_playlists():
+                tracks += sum(1 for _ in backend.iter_spotify_playlist(src_pl.get("id"), backup=backup))
+            tracks += sum(1 for _ in backend.iter_spotify_liked_albums(backup=backup))
+        elif scenario == "copier":
+            tracks = backup.track_count(None)
+            backend.copier(
+                backend.iter_spotify_playlist(None, backup=backup),
+                "PLbench",
+                yt_search_algo=algo,
+                yt=fake,
+                concurrency=concurrency,
+                source_id="bench",
+            )
+        elif scenario == "copy_all_playlists":
+            tracks = sum(
+                backup.track_count(src_pl.get("id"))
+                for src_pl in backup.iter_playlists()
+                if src_pl.get("name") != "Liked Songs"
+            )
+            backend.copy_all_playlists(yt_search_algo=algo, concurrency=concurrency, backup=backup)
+        else:
+            raise ValueError(f"Unknown scenario {scenario}")
+        seconds = time.perf_counter() - start
+    os.chdir("/")
+    workdir.cleanup()
+
+    return {
+        "scenario": scenario,
+        "tracks": tracks,
+        "seconds": round(seconds, 3),
+        "tracks_per_second": round(tracks / seconds, 1) if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "time_to_first_write": round(fake.first_write - start, 3) if fake.first_write else None,
+        "ytmusic_calls": fake.calls,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_file: str, results: list) -> None:
+    with open(old_file, encoding="utf-8") as f:
+        old = {(r["size"], r["scenario"]): r for r in json.load(f)["results"]}
+    print(f"\nChange from {old_file}:")
+    for result in results:
+        before = old.get((result["size"], result["scenario"]))
+        if not before or not before["tracks_per_second"] or not result["tracks_per_second"]:
+            continue
+        speed = result["tracks_per_second"] / before["tracks_per_second"] - 1
+        line = f"{result['size']:>7} {result['scenario']:20} {speed:+7.1%} tracks/s"
+        if before["peak_rss_mb"] and result["peak_rss_mb"]:
+            line += f"  {result['peak_rss_mb'] - before['peak_rss_mb']:+7.1f} MB peak RSS"
+        print(line)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Library sizes, in tracks (default: 1000,10000,100000)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds every fake YTMusic call takes (default: 0.005)")
+    parser.add_argument("--algo", type=int, default=3, help="Search algorithm (default: 3)")
+    parser.add_argument("--concurrency", type=int, default=backend.DEFAULT_CONCURRENCY,
+                        help=f"Parallel searches (default: {backend.DEFAULT_CONCURRENCY})")
+    parser.add_argument("--output", default="bench_throughput.json", help="The JSON report to write (default: bench_throughput.json)")
+    parser.add_argument("--compare", help="An earlier JSON report to compare with")
+    parser.add_argument("--run-scenario", help=SUPPRESS)
+    parser.add_argument("--backup", help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        #  Processo figlio: un solo scenario, il risultato sull'ultima riga
+        print(json.dumps(run_scenario(args.run_scenario, args.backup, args.latency, args.algo, args.concurrency)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in (int(size) for size in args.sizes.split(",")):
+            backup_file = os.path.join(tmpdir, f"library-{size}.json")
+            library = generate_library(backup_file, size)
+            print(f"{size} tracks: {library}")
+            for scenario in args.scenarios.split(","):
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--run-scenario", scenario, "--backup", backup_file,
+                     "--latency", str(args.latency), "--algo", str(args.algo), "--concurrency", str(args.concurrency)],
+                    stdout=subprocess.PIPE, text=True, check=True,
+                ).stdout
+                result = dict(size=size, **json.loads(out.splitlines()[-1]))
+                results.append(result)
+                print(
+                    f"{size:>7} {scenario:20} {result['tracks_per_second'] or 0:9.1f} tracks/s"
+                    f"  {result['peak_rss_mb'] or 0:7.1f} MB peak RSS"
+                    f"  first write {result['time_to_first_write'] if result['time_to_first_write'] is not None else '-'} s"
+                )
+
+    report = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency": args.latency,
+        "algo": args.algo,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+Generator of synthetic Spotify backups, in the format written by `spotify_backup`.
+
+The library is made of a catalog of songs that the playlists draw from with a
+skewed popularity, so that like in a real library the same songs are found in
+several playlists, in "Liked Songs" and in the liked albums, and now and then
+twice in the same playlist.  Names mix languages and scripts (accents, ß,
+Cyrillic, Japanese, emoji) and the decorations the matchers have to deal with
+("feat.", "Remastered 2011", "Deluxe Edition"); a few tracks are null like the
+local files of a real backup.
+
+Run from the repository root:
+
+    python benchmarks/synthetic_library.py --tracks 10000 synthetic.json
+"""
+
+import json
+import random
+import zlib
+from argparse import ArgumentParser
+from typing import List, Tuple
+
+_WORDS = (
+    "love", "night", "heart", "fire", "dream", "city", "summer", "rain", "gold", "river",
+    "time", "ghost", "light", "blue", "wild", "home", "paper", "echo", "storm", "dance",
+    "amore", "città", "perché", "così", "notte", "corazón", "niño", "mañana", "señal",
+    "straße", "Mädchen", "schön", "Größe", "été", "rêve", "cœur", "garçon", "naïve",
+    "любовь", "ночь", "звезда", "東京", "夜明け", "さくら", "사랑", "🔥", "✨", "déjà vu",
+)
+_TITLE_SUFFIXES = (
+    " - Remastered 2011", " (feat. {artist})", " - Live", " (Radio Edit)", " [Instrumental]",
+    " - Single Version", " (with {artist})", " - 2009 Remaster",
+)
+_ALBUM_SUFFIXES = (" (Deluxe Edition)", " [Remastered]", " - EP", " (Super Deluxe)", " (20th Anniversary Edition)")
+
+#  Per rendere realistico il peso del file, come nei backup veri
+_MARKETS = ["AD", "AR", "AT", "AU", "BE", "BR", "CA", "CH", "DE", "ES", "FR", "GB", "IT", "JP", "US"]
+
+Song = Tuple[str, str, str, str]  # title, artist, album, id
+
+
+def _name(rng: random.Random, words: int) -> str:
+    name = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return name[0].upper() + name[1:]
+
+
+def make_catalog(rng: random.Random, songs: int) -> List[Song]:
+    """Unique songs, grouped in albums of 8-14 tracks of artists with a few albums each."""
+    catalog = []
+    artists = [("The " if rng.random() < 0.1 else "") + _name(rng, rng.randint(1, 2)) for _ in range(max(1, songs // 40))]
+    while len(catalog) < songs:
+        artist = rng.choice(artists)
+        album = _name(rng, rng.randint(1, 3))
+        if rng.random() < 0.15:
+            album += rng.choice(_ALBUM_SUFFIXES)
+        for _ in range(rng.randint(8, 14)):
+            title = _name(rng, rng.randint(1, 4))
+            if rng.random() < 0.2:
+                title += rng.choice(_TITLE_SUFFIXES).format(artist=rng.choice(artists))
+            catalog.append((title, artist, album, f"{len(catalog):022x}"))
+    return catalog[:songs]
+
+
+def _artist(name: str) -> dict:
+    return {"name": name, "type": "artist", "uri": f"spotify:artist:{zlib.crc32(name.encode()):022d}"}
+
+
+def track_entry(song: Song, added_at: str = "2024-01-01T00:00:00Z") -> dict:
+    title, artist, album, song_id = song
+    return {
+        "added_at": added_at,
+        "is_local": False,
+        "track": {
+            "album": {
+                "album_type": "album",
+                "artists": [_artist(artist)],
+                "available_markets": _MARKETS,
+                "name": album,
+                "release_date": "2015-04-14",
+                "type": "album",
+            },
+            "artists": [_artist(artist)],
+            "available_markets": _MARKETS,
+            "duration_ms": 200000,
+            "explicit": False,
+            "id": song_id,
+            "name": title,
+            "popularity": 50,
+            "type": "track",
+            "uri": f"spotify:track:{song_id}",
+        },
+    }
+
+
+def _popular(rng: random.Random, catalog: List[Song]) -> Song:
+    #  Popolarità sbilanciata: poche canzoni compaiono in molte playlist
+    return catalog[min(len(catalog) - 1, int(len(catalog) * rng.random() ** 2))]
+
+
+def generate_library(path: str, tracks: int, seed: int = 0) -> dict:
+    """Write a backup of about `tracks` playlist tracks (a quarter in "Liked Songs")
+    plus liked albums to `path`.  Returns counts of what was written.
+    """
+    rng = random.Random(seed)
+    catalog = make_catalog(rng, max(10, int(tracks * 0.55)))
+    liked = tracks // 4
+    sizes = [liked]
+    while sum(sizes) < tracks:
+        sizes.append(min(tracks - sum(sizes), int(rng.lognormvariate(3.5, 1.0)) + 5))
+
+    playlists = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"playlists": [')
+        for i, size in enumerate(sizes):
+            songs = []
+            for _ in range(size):
+                #  Ogni tanto la stessa canzone due volte nella stessa playlist
+                songs.append(songs[-1] if songs and rng.random() < 0.01 else _popular(rng, catalog))
+            entries = [track_entry(song) for song in songs]
+            for entry in entries:
+                if rng.random() < 0.002:
+                    entry["track"] = None
+            header = {"name": "Liked Songs"} if i == 0 else {
+                "collaborative": False,
+                "description": "",
+                "id": f"{i:022d}",
+                "name": _name(rng, rng.randint(1, 3)),
+                "public": True,
+                "snapshot_id": f"{rng.getrandbits(64):x}",
+                "type": "playlist",
+            }
+            header["tracks"] = entries
+            f.write((", " if i else "") + json.dumps(header, ensure_ascii=False))
+            playlists += 1
+
+        f.write('], "albums": [')
+        albums = {}
+        for song in catalog:
+            albums.setdefault((song[1], song[2]), []).append(song)
+        liked_albums = rng.sample(sorted(albums), max(1, len(albums) // 20))
+        album_tracks = 0
+        for i, key in enumerate(liked_albums):
+            items = []
+            for title, artist, _album, song_id in albums[key]:
+                items.append({"artists": [_artist(artist)], "id": song_id, "name": title, "type": "track"})
+            album = {"added_at": "2024-01-01T00:00:00Z", "album": {
+                "artists": [_artist(key[0])], "name": key[1], "tracks": {"items": items}, "type": "album",
+            }}
+            f.write((", " if i else "") + json.dumps(album, ensure_ascii=False))
+            album_tracks += len(items)
+        f.write("]}")
+
+    return {"playlists": playlists, "tracks": sum(sizes), "albums": len(liked_albums), "album_tracks": album_tracks, "songs": len(catalog)}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=10000, help="Number of playlist tracks (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("output", help="The backup file to write")
+    args = parser.parse_args()
+    print(generate_library(args.output, args.tracks, args.seed))
+
+
+if __name__ == "__main__":
+    main()
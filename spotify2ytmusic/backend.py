@@ -5,26 +5,47 @@ import sys
 import os
 import time
 import re
-from itertools import tee
-from datetime import datetime  # Importa il modulo datetime
+import operator
 import signal
+import threading
+import atexit
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from ytmusicapi import YTMusic
 from typing import Optional, Union, Iterator, Dict, List
-from collections import namedtuple
+from collections import namedtuple, deque
 from dataclasses import dataclass, field
 from spotify2ytmusic.normalized_metadata_algorithm import *
-
-numeroTotaleTracce = 0  # Variabile globale per il numero totale di tracce da copiare
+from spotify2ytmusic.search_cache import SearchCache, DEFAULT_CACHE_FILE
+from spotify2ytmusic.rate_limiter import RateLimiter, retry_delay, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_RETRY_BACKOFF, DEFAULT_RETRY_BACKOFF_MAX
+from spotify2ytmusic.ytmusic_replay import RecordingYTMusic, ReplayYTMusic
+from spotify2ytmusic.event_log import EventSink, export_csv, DEFAULT_EVENT_LOG, DEFAULT_CSV_LOG
+from spotify2ytmusic.metrics import MetricsRegistry, MetricsExporter, DEFAULT_EXPORT_INTERVAL, FORMATS as METRICS_FORMATS
+from spotify2ytmusic.resume_journal import ResumeJournal, journal_path, track_key
+from spotify2ytmusic.playlists_backup import (
+    DEFAULT_SQLITE_FILE,
+    SpotifyBackup,
+    convert_backup,
+    open_backup,
+)
+
+numeroTotaleTracce = 0  # Variabile globale per il numero totale di tracce da copiare (None se sconosciuto)
 numeroTracciaCorrente = 0 # Variabile globale per tenere traccia delle tracce processate
 matchIncompleto_count = 0 #aggiunta per contare i match incompleti
 duplicate_count = 0 #aggiunta per contare le tracce duplicate
 error_count = 0 #aggiunta per contare le tracce non trovate
 playlistSorgente = ""  # Variabile globale per la playlist sorgente
 playlistDestinazione = ""  # Variabile globale per la playlist destinazione
+active_writer = None  # PlaylistWriter in uso da copier, svuotato anche alla terminazione
+active_journal = None  # ResumeJournal in uso da copier, chiuso anche alla terminazione
+stato_lock = threading.RLock()  # Protegge contatori e file di log, aggiornati anche dai thread di ricerca
 
 def handle_termination(signum, frame):
     print(f"Program terminated with signal {signum}. Cleaning up...", file=sys.__stdout__) # Stampa direttamente su console
+    if active_writer is not None:
+        active_writer.flush()  # Scrive le tracce ancora nel buffer prima di uscire
+    if active_journal is not None:
+        active_journal.close()
     chiudiFile()  # Chiude il file o esegue altre operazioni di cleanup
     sys.exit(0)  # Termina il programma
 
@@ -35,117 +56,334 @@ signal.signal(signal.SIGINT, handle_termination)
 signal.signal(signal.SIGTERM, handle_termination)
 
 
-# AGGIUNTO PER LOG SU FILE
-import csv
-fileOutput = None  # Variabile globale per gestire il file CSV
+# LOG DEGLI EVENTI: un evento JSON per traccia, il vecchio CSV viene rigenerato alla chiusura
+event_log_file = DEFAULT_EVENT_LOG
+csv_log_file: Optional[str] = DEFAULT_CSV_LOG  # None per non scrivere il CSV
+event_sink: Optional[EventSink] = None  # Aperto da copier per la durata della copia
+
+
+def configure_event_log(path: str = DEFAULT_EVENT_LOG, csv_path: Optional[str] = DEFAULT_CSV_LOG) -> None:
+    """Set the JSON-lines event log written by `copier`, and the CSV log regenerated from it (None: no CSV)."""
+    global event_log_file, csv_log_file
+    event_log_file = path
+    csv_log_file = csv_path
+
 
-def inizializzaFile(filename):
-    global fileOutput
-    if fileOutput is None:  # Evita di riaprire il file se già aperto
+def inizializzaFile():
+    """Apre il log degli eventi e registra l'inizio della sessione"""
+    global event_sink
+    if event_sink is None:  # Evita di riaprire il file se già aperto
         try:
-            # Apre il file in modalità append (per aggiungere nuove righe) e per scrivere come CSV
-            fileOutput = open(filename, "a", newline='', encoding="utf-8")
-            
-            scriviFile(["Inizio Sessione", f"Numero totale di tracce: {numeroTotaleTracce}", f"Playlist Sorgente: {playlistSorgente}", f"Playlist Destinazione: {playlistDestinazione}"])
-        except Exception as e:
+            event_sink = EventSink(event_log_file)
+        except OSError as e:
             print(f"Errore nell'apertura del file: {e}")
+            return
+        event_sink.emit("session_start", total=numeroTotaleTracce, source=playlistSorgente, destination=playlistDestinazione)
+
+
+def _emit(event: str, src_track: "SongInfo", dst_track: Optional[dict] = None, **fields) -> None:
+    """Registra l'esito di una traccia"""
+    sink = event_sink
+    if sink is None:
+        return
+    fields.update(title=src_track.title, artist=src_track.artist, album=src_track.album, uri=src_track.uri)
+    if dst_track is not None:
+        artists = dst_track.get("artists") or [{}]
+        album = dst_track.get("album")
+        fields.update(
+            video_id=dst_track.get("videoId"),
+            yt_title=dst_track.get("title"),
+            yt_artist=artists[0].get("name", "<Unknown>"),
+            yt_album=album.get("name", str(album)) if isinstance(album, dict) else album,
+        )
+    sink.emit(event, **fields)
 
-def scriviFile(riga):
-    if fileOutput:
-        try:
-            writer = csv.writer(fileOutput)
-            if riga:  # Se la riga non è vuota, aggiungi il timestamp
-                timestamp = datetime.now().strftime("%y-%m-%d %H:%M:%S")
-                writer.writerow([timestamp] + riga)
-            else:  # Se la riga è vuota, scrivi una riga vuota
-                writer.writerow([])
-        except Exception as e:
-            print(f"Errore nella scrittura del file: {e}")
 
 def chiudiFile():
-    global fileOutput
-    if fileOutput:
+    """Registra la fine della sessione, chiude il log e ne scrive il CSV"""
+    global event_sink
+    sink = event_sink
+    if sink is None:
+        return
+    event_sink = None
+    sink.emit("session_end", processed=numeroTracciaCorrente, incomplete=matchIncompleto_count, errors=error_count, duplicates=duplicate_count)
+    sink.close()
+    if csv_log_file:
         try:
-            
-            scriviFile(["Fine Sessione", f"Numero di elementi processati: {numeroTracciaCorrente}", f"Numero di match incompleti: {matchIncompleto_count}", f"Numero di canzoni non trovate: {error_count}", f"Numero di tracce saltate perché duplicate: {duplicate_count}"])
-            scriviFile([]) # Aggiunge una riga vuota alla fine del file per separare le sessioni
-            scriviFile([])
-            fileOutput.close()  # Chiude il file CSV
-            fileOutput = None  # Resetta la variabile dopo la chiusura
-        except Exception as e:
-            print(f"Errore nella chiusura del file: {e}")
-            raise e
+            export_csv(sink.path, csv_log_file, sink.start_offset)
+        except (OSError, ValueError) as e:
+            print(f"Errore nella scrittura del file: {e}")
 
 # FINE AGGIUNTA FILE
 
-SongInfo = namedtuple("SongInfo", ["title", "artist", "album"])
+SongInfo = namedtuple("SongInfo", ["title", "artist", "album", "uri"], defaults=[None])  # uri: della traccia Spotify
+
+
+ytmusic_record_file = None  # Cassetta in cui registrare le chiamate a YTMusic
+ytmusic_replay_file = None  # Cassetta da cui rispondere al posto di YTMusic
+ytmusic_replay_options = {}
+ytmusic_transport = None  # RecordingYTMusic o ReplayYTMusic condiviso, creato da get_ytmusic
+
+PLAYLIST_SETTLE_SECONDS = 1.0  # Attesa dopo la creazione di una playlist su YTMusic
+playlist_settle_seconds = PLAYLIST_SETTLE_SECONDS  # 0 quando si risponde da una cassetta
+
+
+def configure_ytmusic_transport(
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    seed: Optional[int] = None,
+) -> None:
+    """Make `get_ytmusic` record the YTMusic traffic to the cassette `record`, or
+    replay the cassette `replay` instead of connecting to YTMusic.
+
+    `latency`, `jitter`, `error_rate` and `seed` are passed to `ReplayYTMusic`.
+    A replay skips the pause after creating a playlist, which only the real
+    YTMusic needs.
+    """
+    global ytmusic_record_file, ytmusic_replay_file, ytmusic_replay_options, ytmusic_transport, playlist_settle_seconds
+    if record and replay:
+        raise ValueError("Cannot record and replay YTMusic traffic at the same time")
+    if isinstance(ytmusic_transport, RecordingYTMusic):
+        ytmusic_transport.close()
+    ytmusic_record_file = record
+    ytmusic_replay_file = replay
+    ytmusic_replay_options = dict(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed)
+    ytmusic_transport = None
+    playlist_settle_seconds = 0.0 if replay else PLAYLIST_SETTLE_SECONDS
 
 
 def get_ytmusic() -> YTMusic:
     """
     @@@
     """
+    global ytmusic_transport
+    if ytmusic_replay_file:
+        if ytmusic_transport is None:
+            ytmusic_transport = ReplayYTMusic(ytmusic_replay_file, **ytmusic_replay_options)
+        return ytmusic_transport
+    if ytmusic_record_file and ytmusic_transport is not None:
+        return ytmusic_transport
+
     if not os.path.exists("oauth.json"):
         print("ERROR: No file 'oauth.json' exists in the current directory.")
         print("       Have you logged in to YTMusic?  Run 'ytmusicapi oauth' to login")
         sys.exit(1)
 
     try:
-        return YTMusic("oauth.json")
+        yt = YTMusic("oauth.json")
     except json.decoder.JSONDecodeError as e:
         print(f"ERROR: JSON Decode error while trying start YTMusic: {e}")
         print("       This typically means a problem with a 'oauth.json' file.")
         print("       Have you logged in to YTMusic?  Run 'ytmusicapi oauth' to login")
         sys.exit(1)
 
+    if ytmusic_record_file:
+        ytmusic_transport = RecordingYTMusic(yt, ytmusic_record_file)
+        return ytmusic_transport
+    return yt
+
+
+rate_limiter = RateLimiter(DEFAULT_REQUESTS_PER_SECOND)  # Condiviso da tutte le chiamate a YTMusic
+
+
+def configure_rate_limiter(requests_per_second: float) -> None:
+    """Set the requests-per-second budget of the shared YTMusic rate limiter (0 = unlimited)."""
+    rate_limiter.set_budget(requests_per_second)
+
+
+metrics = MetricsRegistry()  # Metriche della sessione, esportate da configure_metrics
+metrics_exporter: Optional[MetricsExporter] = None
+request_seconds = metrics.histogram("s2yt_request_seconds", "Latency of the YTMusic requests, by method")
+request_errors = metrics.counter("s2yt_request_errors_total", "Failed YTMusic requests, by method")
+request_retries = metrics.counter("s2yt_request_retries_total", "YTMusic requests sent again after an error, by method")
+limiter_sleep = metrics.counter("s2yt_rate_limiter_sleep_seconds_total", "Time spent waiting for the rate limiter")
+retry_sleep = metrics.counter("s2yt_retry_backoff_seconds_total", "Time spent waiting before retrying a failed request")
+limiter_rate = metrics.gauge("s2yt_rate_limiter_rate", "Requests per second currently allowed by the rate limiter (0 = unlimited)")
+lookup_seconds = metrics.histogram("s2yt_lookup_seconds", "Time to look up a track, requests included, by algorithm")
+match_seconds = metrics.histogram("s2yt_match_seconds", "Time to look up a track minus the requests and rate limiting, by algorithm")
+lookups_total = metrics.counter("s2yt_lookups_total", "Track lookups, by algorithm and result (matched, fallback, not_found)")
+tracks_processed = metrics.counter("s2yt_tracks_processed_total", "Source tracks processed by copier, by outcome (looked_up, skipped)")
+tracks_written = metrics.counter("s2yt_tracks_written_total", "Tracks added to YTMusic, by method")
+
+_request_clock = threading.local()  # Tempo passato in ytmusic_call dal thread corrente
+
+
+def _time_in_requests() -> float:
+    return getattr(_request_clock, "seconds", 0.0)
+
+
+def configure_metrics(
+    path: Optional[str] = None,
+    format: str = "prometheus",
+    interval: float = DEFAULT_EXPORT_INTERVAL,
+) -> None:
+    """Write the metrics to `path` every `interval` seconds and at exit ("prometheus" or "json" `format`).
+
+    None stops exporting.
+    """
+    global metrics_exporter
+    if metrics_exporter is not None:
+        metrics_exporter.stop()
+        metrics_exporter = None
+    if path:
+        metrics_exporter = MetricsExporter(metrics, path, format, interval)
+        atexit.register(metrics_exporter.stop)
+
+
+def metrics_summary() -> str:
+    """Where the time went: YTMusic requests, matching, rate limiting."""
+    return (
+        f"Time: {request_seconds.sum():.1f}s in {request_seconds.count()} YTMusic requests "
+        f"({request_retries.value():.0f} retries), {match_seconds.sum():.1f}s matching, "
+        f"{limiter_sleep.value():.1f}s waiting for the rate limiter"
+    )
+
+
+RETRY_BACKOFF_SECONDS = DEFAULT_RETRY_BACKOFF  # Prima attesa dopo un errore, raddoppia a ogni tentativo
+RETRY_BACKOFF_MAX_SECONDS = DEFAULT_RETRY_BACKOFF_MAX
+
+
+def ytmusic_call(func, *args, tries: int = 1, **kwargs):
+    """Call a YTMusic method, e.g. `ytmusic_call(yt.search, query=...)`, through the shared rate limiter.
+
+    Failed calls slow the limiter down and are retried up to `tries` times, each
+    after an exponential back-off (see `retry_delay`) that applies even when the
+    limiter is unlimited.  The last exception is re-raised.
+    """
+    method = getattr(func, "__name__", "request").lstrip("_")
+    for attempt in range(tries):
+        start = time.perf_counter()
+        waited = rate_limiter.acquire()
+        if waited:
+            limiter_sleep.inc(waited)
+        sent = time.perf_counter()
+        try:
+            ret = func(*args, **kwargs)
+        except Exception as e:
+            rate_limiter.on_error()
+            request_errors.inc(method=method)
+            if attempt + 1 >= tries:
+                raise
+            request_retries.inc(method=method)
+            delay = retry_delay(attempt, RETRY_BACKOFF_SECONDS, RETRY_BACKOFF_MAX_SECONDS)
+            print(
+                f"ERROR: (Retrying {getattr(func, '__name__', 'request')}) {e}. waiting {delay:.1f} seconds, slowing down to {rate_limiter.rate:.2f} requests/s"
+            )
+        else:
+            rate_limiter.on_success()
+            return ret
+        finally:
+            end = time.perf_counter()
+            request_seconds.observe(end - sent, method=method)
+            limiter_rate.set(rate_limiter.rate)
+            _request_clock.seconds = _time_in_requests() + end - start
+        #  Fuori dal tempo della richiesta, ma conta come attesa di YTMusic per match_seconds
+        time.sleep(delay)
+        retry_sleep.inc(delay)
+        _request_clock.seconds = _time_in_requests() + delay
+
+
+search_cache: Optional[SearchCache] = None  # Cache su disco dei risultati di ricerca, aperta alla prima ricerca
+search_cache_enabled = True
+search_cache_refresh = False
+search_cache_file = DEFAULT_CACHE_FILE
+
+
+def configure_search_cache(
+    enabled: bool = True, refresh: bool = False, path: str = DEFAULT_CACHE_FILE
+) -> None:
+    """Configure the on-disk search-result cache used by `lookup_song`.
+
+    Args:
+        `enabled` (bool): Use the cache at all (`--no-cache` disables it).
+        `refresh` (bool): Ignore cached results but store the fresh ones (`--refresh-cache`).
+        `path` (str): The SQLite file holding the cache.
+    """
+    global search_cache, search_cache_enabled, search_cache_refresh, search_cache_file
+    if search_cache is not None:
+        search_cache.close()
+        search_cache = None
+    search_cache_enabled = enabled
+    search_cache_refresh = refresh
+    search_cache_file = path
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """Return the shared search cache, opening it on first use.  None if disabled."""
+    global search_cache
+    if not search_cache_enabled:
+        return None
+    with stato_lock:  # Le ricerche concorrenti non devono aprire la cache più volte
+        if search_cache is None:
+            try:
+                search_cache = SearchCache(search_cache_file, refresh=search_cache_refresh)
+            except Exception as e:
+                print(f"WARNING: Unable to open search cache '{search_cache_file}': {e}")
+                configure_search_cache(enabled=False)
+                return None
+    return search_cache
+
+
+def _search(yt: YTMusic, query: str, filter: str) -> List[Dict]:
+    """Wrapper on ytmusic.search that serves repeated searches from the search cache."""
+    cache = get_search_cache()
+    if cache is not None:
+        songs = cache.get(query, filter)
+        if songs is not None:
+            return songs
+
+    songs = ytmusic_call(yt.search, query=query, filter=filter, tries=3)
+
+    if cache is not None:
+        cache.put(query, filter, songs)
+    return songs
+
 
 def _ytmusic_create_playlist(
     yt: YTMusic, title: str, description: str, privacy_status: str = "PRIVATE"
 ) -> str:
     """Wrapper on ytmusic.create_playlist
 
-    This wrapper does retries with back-off because sometimes YouTube Music will
-    rate limit requests or otherwise fail.
+    This wrapper does retries through the shared rate limiter because sometimes
+    YouTube Music will rate limit requests or otherwise fail.
 
     privacy_status can be: PRIVATE, PUBLIC, or UNLISTED
     """
-
-    def _create(
-        yt: YTMusic, title: str, description: str, privacy_status: str
-    ) -> Union[str, dict]:
-        exception_sleep = 5
-        for _ in range(10):
-            try:
-                """Create a playlist on YTMusic, retrying if it fails."""
-                id = yt.create_playlist(
-                    title=title, description=description, privacy_status=privacy_status
-                )
-                return id
-            except Exception as e:
-                print(
-                    f"ERROR: (Retrying create_playlist: {title}) {e}. waiting {exception_sleep} seconds"
-                )
-                time.sleep(exception_sleep)
-                exception_sleep *= 2
-
-        return {
-            "s2yt error": 'ERROR: Could not create playlist "{title}" after multiple retries'
+    try:
+        id = ytmusic_call(
+            yt.create_playlist,
+            title=title,
+            description=description,
+            privacy_status=privacy_status,
+            tries=10,
+        )
+    except Exception as e:
+        id = {
+            "s2yt error": f'ERROR: Could not create playlist "{title}" after multiple retries: {e}'
         }
 
-    id = _create(yt, title, description, privacy_status)
     #  create_playlist returns a dict if there was an error
     if isinstance(id, dict):
         print(f"ERROR: Failed to create playlist (name: {title}): {id}")
         sys.exit(1)
 
-    time.sleep(1)  # seems to be needed to avoid missing playlist ID error
+    if playlist_settle_seconds:
+        time.sleep(playlist_settle_seconds)  # seems to be needed to avoid missing playlist ID error
 
     return id
 
 
 def load_playlists_json(filename: str = "playlists.json", encoding: str = "utf-8"):
-    """Load the `playlists.json` Spotify playlist file"""
-    return json.load(open(filename, "r", encoding=encoding))
+    """Load the `playlists.json` Spotify playlist file
+
+    The whole file is parsed in memory, once per process: `open_backup` gives a
+    handle that streams it instead.  A backup converted by `convert_backup` is
+    read back into the same layout, with only the fields it keeps.
+    """
+    return open_backup(filename, encoding, streaming=False).to_dict()
 
 
 def create_playlist(pl_name: str, privacy_status: str = "PRIVATE") -> None:
@@ -165,19 +403,49 @@ def create_playlist(pl_name: str, privacy_status: str = "PRIVATE") -> None:
     print(f"Playlist ID: {id}")
 
 
+class SongIterator:
+    """Iterator of SongInfo that knows up front how many songs it will yield.
+
+    The count is exposed through `__length_hint__`, so `operator.length_hint()` gives
+    `copier` a total for its progress without walking the songs twice.
+    """
+
+    def __init__(self, songs: Iterator[SongInfo], length: int):
+        self._songs = iter(songs)
+        self._remaining = length
+
+    def __iter__(self) -> "SongIterator":
+        return self
+
+    def __next__(self) -> SongInfo:
+        song = next(self._songs)
+        self._remaining = max(0, self._remaining - 1)
+        return song
+
+    def __length_hint__(self) -> int:
+        return self._remaining
+
+
 def iter_spotify_liked_albums(
     spotify_playlist_file: str = "playlists.json",
     spotify_encoding: str = "utf-8",
-) -> Iterator[SongInfo]:
-    """Songs from liked albums on Spotify."""
-    spotify_pls = load_playlists_json(spotify_playlist_file, spotify_encoding)
+    *,
+    backup: Optional[SpotifyBackup] = None,
+) -> SongIterator:
+    """Songs from liked albums on Spotify.
 
-    if "albums" not in spotify_pls:
-        return None
+    `backup` is an already opened backup to read instead of `spotify_playlist_file`.
+    """
+    if backup is None:
+        backup = open_backup(spotify_playlist_file, spotify_encoding)
+
+    def songs() -> Iterator[SongInfo]:
+        for liked_album in backup.iter_albums():
+            album = liked_album["album"]
+            for track in album["tracks"]["items"]:
+                yield SongInfo(track["name"], track["artists"][0]["name"], album["name"], track.get("uri"))
 
-    for album in [x["album"] for x in spotify_pls["albums"]]:
-        for track in album["tracks"]["items"]:
-            yield SongInfo(track["name"], track["artists"][0]["name"], album["name"])
+    return SongIterator(songs(), backup.album_track_count())
 
 
 def iter_spotify_playlist(
@@ -185,7 +453,9 @@ def iter_spotify_playlist(
     spotify_playlist_file: str = "playlists.json",
     spotify_encoding: str = "utf-8",
     reverse_playlist: bool = True,
-) -> Iterator[SongInfo]:
+    *,
+    backup: Optional[SpotifyBackup] = None,
+) -> SongIterator:
     """Songs from a specific album ("Liked Songs" if None)
 
     Args:
@@ -193,52 +463,39 @@ def iter_spotify_playlist(
         `spotify_playlist_file` (str, optional): The path to the playlists backup files. Defaults to "playlists.json".
         `spotify_encoding` (str, optional): Characters encoding. Defaults to "utf-8".
         `reverse_playlist` (bool, optional): Is the playlist reversed when loading?  Defaults to True.
+        `backup` (Optional[SpotifyBackup]): An already opened backup to read instead of `spotify_playlist_file`.
 
-    Yields:
-        Iterator[SongInfo]: The song's information
+    Returns:
+        SongIterator: The songs' information, with the number of songs as length hint.
     """
-    spotify_pls = load_playlists_json(spotify_playlist_file, spotify_encoding)
-
-    def find_spotify_playlist(spotify_pls: Dict, src_pl_id: Union[str, None]) -> Dict:
-        """Return the spotify playlist that matches the `src_pl_id`.
+    if backup is None:
+        backup = open_backup(spotify_playlist_file, spotify_encoding)
 
-        Args:
-            `spotify_pls`: The playlist datastrcuture saved by spotify-backup.
-            `src_pl_id`: The ID of a playlist to find, or None for the "Liked Songs" playlist.
-        """
-        for src_pl in spotify_pls["playlists"]:
-            if src_pl_id is None and str(src_pl.get("name")) == "Liked Songs":
-                return src_pl
-            if src_pl_id is not None and str(src_pl.get("id")) == src_pl_id:
-                return src_pl
-        print(f"Could not find Spotify playlist {src_pl_id}")
-        raise ValueError(f"Could not find Spotify playlist {src_pl_id}")
-
-    src_pl = find_spotify_playlist(spotify_pls, src_pl_id)
+    src_pl = backup.get_playlist(src_pl_id)
     src_pl_name = src_pl["name"]
 
     print(f"SORGENTE: Spotify Playlist: {src_pl_name}")
 
-    pl_tracks = src_pl["tracks"]
-    if reverse_playlist:
-        pl_tracks = reversed(pl_tracks)
+    def songs() -> Iterator[SongInfo]:
+        for src_track in backup.iter_tracks(src_pl_id, reverse=reverse_playlist):
+            if src_track["track"] is None:
+                print(
+                    f"WARNING: Spotify track seems to be malformed, Skipping.  Track: {src_track!r}"
+                )
+                continue
 
-    for src_track in pl_tracks:
-        if src_track["track"] is None:
-            print(
-                f"WARNING: Spotify track seems to be malformed, Skipping.  Track: {src_track!r}"
-            )
-            continue
+            try:
+                src_album_name = src_track["track"]["album"]["name"]
+                src_track_artist = src_track["track"]["artists"][0]["name"]
+            except TypeError as e:
+                print(f"ERROR: Spotify track seems to be malformed.  Track: {src_track!r}")
+                raise e
+            src_track_name = src_track["track"]["name"]
 
-        try:
-            src_album_name = src_track["track"]["album"]["name"]
-            src_track_artist = src_track["track"]["artists"][0]["name"]
-        except TypeError as e:
-            print(f"ERROR: Spotify track seems to be malformed.  Track: {src_track!r}")
-            raise e
-        src_track_name = src_track["track"]["name"]
+            yield SongInfo(src_track_name, src_track_artist, src_album_name, src_track["track"].get("uri"))
 
-        yield SongInfo(src_track_name, src_track_artist, src_album_name)
+    # Le tracce malformate saltate da songs() sono comprese nel conteggio: è solo un'indicazione
+    return SongIterator(songs(), backup.track_count(src_pl_id))
 
 
 def get_playlist_id_by_name(yt: YTMusic, title: str) -> Optional[str]:
@@ -254,7 +511,7 @@ def get_playlist_id_by_name(yt: YTMusic, title: str) -> Optional[str]:
     #  ytmusicapi seems to run into some situations where it gives a Traceback on listing playlists
     #  https://github.com/sigma67/ytmusicapi/issues/539
     try:
-        playlists = yt.get_library_playlists(limit=5000)
+        playlists = ytmusic_call(yt.get_library_playlists, limit=5000)
     except KeyError as e:
         print("=" * 60)
         print(f"Attempting to look up playlist '{title}' failed with KeyError: {e}")
@@ -283,6 +540,27 @@ class ResearchDetails:
     query: Optional[str] = field(default=None)
     songs: Optional[List[Dict]] = field(default=None)
     suggestions: Optional[List[str]] = field(default=None)
+    scores: Optional[List[CandidateScore]] = field(default=None)
+    matched_by: Optional[str] = field(default=None)  # Quale regola dell'algoritmo ha scelto la canzone
+    fallback: bool = field(default=False)  # Nessun match: è stato usato il primo (o il migliore) risultato
+    messages: Optional[List[str]] = field(default=None)  # Se è una lista, i messaggi della ricerca vanno qui invece che su stdout
+
+
+def _lookup_message(details: Optional[ResearchDetails], message: str) -> None:
+    """Print a message about the lookup, or keep it in `details.messages` for the caller to print."""
+    if details is not None and details.messages is not None:
+        details.messages.append(message)
+    else:
+        print(message)
+
+
+match_threshold = DEFAULT_ACCEPT_THRESHOLD  # Punteggio minimo di un risultato accettato senza altre ricerche
+
+
+def configure_matcher(threshold: float = DEFAULT_ACCEPT_THRESHOLD) -> None:
+    """Set the score a candidate needs to be accepted by the scored matching (algorithm 4, and 2 before searching videos)."""
+    global match_threshold
+    match_threshold = threshold
 
 
 def lookup_song(
@@ -292,6 +570,7 @@ def lookup_song(
     album_name,
     yt_search_algo: int,
     details: Optional[ResearchDetails] = None,
+    suggestions: bool = True,
 ) -> dict:
     """Look up a song on YTMusic
 
@@ -311,8 +590,9 @@ def lookup_song(
         `track_name` (str): The name of the researched track
         `artist_name` (str): The name of the researched track's artist
         `album_name` (str): The name of the researched track's album
-        `yt_search_algo` (int): 0 for exact matching, 1 for extended matching (Ricerca match perfetto Titolo-Artista-Album. Se non trova nelle prime 20 canzoni, ricerca match Titolo-Artista. Come ultima scelta, usa la prima canzone e lo riporta nel file output canzoniNO-MATCH.csv), 2 for approximate matching (search in videos), 3 for normalized metadata matching
+        `yt_search_algo` (int): 0 for exact matching, 1 for extended matching (Ricerca match perfetto Titolo-Artista-Album. Se non trova nelle prime 20 canzoni, ricerca match Titolo-Artista. Come ultima scelta, usa la prima canzone e lo riporta nel file output canzoniNO-MATCH.csv), 2 for approximate matching (search in videos), 3 for normalized metadata matching, 4 for scored matching (best scoring result, accepted if it scores at least `match_threshold`, else logged like 1 and 3)
         `details` (ResearchDetails): If specified, more information about the search and the response will be populated for use by the caller.
+        `suggestions` (bool): Whether to fetch the search suggestions into `details`, one more request.
 
     Raises:
         ValueError: If no track is found, it returns an error
@@ -321,6 +601,36 @@ def lookup_song(
         dict: The infos of the researched song
     """
 
+    own_details = details is None
+    if own_details:
+        details = ResearchDetails()  # Per sapere se il risultato è un ripiego
+    start = time.perf_counter()
+    requests = _time_in_requests()
+    try:
+        song = _lookup_song(
+            yt, track_name, artist_name, album_name, yt_search_algo, details, suggestions and not own_details
+        )
+    except Exception:
+        lookups_total.inc(algo=yt_search_algo, result="not_found")
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        lookup_seconds.observe(elapsed, algo=yt_search_algo)
+        match_seconds.observe(max(0.0, elapsed - (_time_in_requests() - requests)), algo=yt_search_algo)
+    lookups_total.inc(algo=yt_search_algo, result="fallback" if details.fallback else "matched")
+    return song
+
+
+def _lookup_song(
+    yt: YTMusic,
+    track_name: str,
+    artist_name: str,
+    album_name,
+    yt_search_algo: int,
+    details: Optional[ResearchDetails] = None,
+    suggestions: bool = True,
+) -> dict:
+    """The search and matching of `lookup_song`, without the metrics."""
     """ NON USO LA RICERCA PER ALBUM PERCHé RITORNA LA VERSIONE VIDEO PER GLI ACCOUNT NON PREMIUM
     albums = yt.search(query=f"{album_name} by {artist_name}", filter="albums")
     for album in albums[:3]:
@@ -335,19 +645,24 @@ def lookup_song(
         except Exception as e:
             print(f"Unable to lookup album ({e}), continuing...")
     """
-    global matchIncompleto_count  # Dichiara che stiamo usando la variabile globale
-
     query = f"{track_name} {artist_name}" #PRIMA C'ERA 'BY'
     if details:
         details.query = query
-        details.suggestions = yt.get_search_suggestions(query=query)
-    songs = yt.search(query=query, filter="songs")    
+        if suggestions:
+            details.suggestions = ytmusic_call(yt.get_search_suggestions, query=query)
+    songs = _search(yt, query, "songs")
+    if details:
+        details.songs = songs
+
+    def matched(song: dict, rule: str, fallback: bool = False) -> dict:
+        if details:
+            details.matched_by = rule
+            details.fallback = fallback
+        return song
 
     match yt_search_algo:
         case 0:
-            if details:
-                details.songs = songs
-            return songs[0]
+            return matched(songs[0], "first_result")
 
         case 1:
             numeroCanzoniStampate = 0 #stampo solo le prime x canzoni, la probabilità che un possibile match sia più in basso è bassa
@@ -358,38 +673,32 @@ def lookup_song(
                     and song["album"] is not None
                     and song["album"]["name"] == album_name
                 ):
-                    return song
+                    return matched(song, "exact")
                 else:
                     if numeroCanzoniStampate >= 3:
                         continue
                     numeroCanzoniStampate += 1
-                    print(f"\tNO-MATCH: {song['title']} - {song['artists'][0]['name']} - {song['album']['name'] if song['album'] is not None else "no-album"} - {song['videoId']}")
+                    _lookup_message(details, f"\tNO-MATCH: {song['title']} - {song['artists'][0]['name']} - {song['album']['name'] if song['album'] is not None else "no-album"} - {song['videoId']}")
             
             #ripeto la ricerca senza considerare l'album (alcune canzoni non hanno un album).anche se il match non è perfetto, non ha senso loggare le canzoni trovate così
-            print("\t-->Performing album-independent matching...")
+            _lookup_message(details, "\t-->Performing album-independent matching...")
             for song in songs:
                 if (
                     song["title"] == track_name
                     and song["artists"][0]["name"] == artist_name
                 ):
-                    return song
+                    return matched(song, "title_artist")
                 
             #se ancora non ho trovato nulla loggo e uso il primo risultato
-            print(f"\t-->NOT FOUND. using first result: https://youtu.be/{songs[0]['videoId']}")
-
-            #scrivo sul file di log le canzoni con match da controllare
-            scriviFile(["Spotify", track_name, artist_name, album_name])
-            scriviFile(["YouTubeMusic", songs[0]['title'], songs[0]['artists'][0]['name'], songs[0]['album']['name'] if songs[0]['album'] is not None else "no-album", f"https://youtu.be/{songs[0]['videoId']}"])
-            scriviFile([])
-
-            matchIncompleto_count += 1 #conto un match incompleto in più
+            _lookup_message(details, f"\t-->NOT FOUND. using first result: https://youtu.be/{songs[0]['videoId']}")
 
-            return songs[0]#aggiunto: se non trovo un match preciso, uso la prima canzone
+            return matched(songs[0], "first_result", fallback=True)#aggiunto: se non trovo un match preciso, uso la prima canzone
             raise ValueError(
                 f"Did not find {track_name} by {artist_name} from {album_name}. Added the first result of the list"
             )
 
         case 2:
+            spotify_track = normalize_track(track_name, album_name, artist_name)
             #  This would need to do fuzzy matching
             for song in songs:
                 # Remove everything in brackets in the song title
@@ -406,7 +715,7 @@ def lookup_song(
                     song["artists"][0]["name"] == artist_name
                     or artist_name in song["artists"][0]["name"]
                 ):
-                    return song
+                    return matched(song, "fuzzy")
 
             # Finds approximate match
             # This tries to find a song anyway. Works when the song is not released as a music but a video.
@@ -417,9 +726,14 @@ def lookup_song(
                     track_name not in first_song_title
                     or songs[0]["artists"][0]["name"] != artist_name
                 ):  # If the first song is not the one we are looking for
-                    print("Not found in songs, searching videos")
-                    new_songs = yt.search(
-                        query=f"{track_name} by {artist_name}", filter="videos"
+                    # Un risultato sicuro tra le canzoni evita la ricerca tra i video
+                    confident = best_candidate(spotify_track, songs, match_threshold)
+                    if confident is not None:
+                        return matched(confident.song, "score")
+
+                    _lookup_message(details, "Not found in songs, searching videos")
+                    new_songs = _search(
+                        yt, f"{track_name} by {artist_name}", "videos"
                     )  # Search videos
 
                     # From here, we search for videos reposting the song. They often contain the name of it and the artist. Like with 'Nekfeu - Ecrire'.
@@ -431,62 +745,368 @@ def lookup_song(
                             track_name in new_song_title
                             and artist_name in new_song_title
                         ) or (track_name in new_song_title):
-                            print("Found a video")
-                            return new_song
+                            _lookup_message(details, "Found a video")
+                            return matched(new_song, "video")
                     else:
                         # Basically we only get here if the song isn't present anywhere on YouTube
                         raise ValueError(
                             f"Did not find {track_name} by {artist_name} from {album_name}"
                         )
                 else:
-                    return songs[0]
+                    return matched(songs[0], "first_result")
             
         case 3:
             numeroCanzoniStampate = 0 #stampo solo le prime x canzoni, la probabilità che un possibile match sia più in basso è bassa
+            spotify_track = normalize_track(track_name, album_name, artist_name) # normalizzata una volta sola per tutti i risultati
             for song in songs:
-                if (normalized_track_match(track_name, album_name, artist_name, song)):
-                    return song
+                if (normalized_tracks_match(spotify_track, normalize_youtube_track(song))):
+                    return matched(song, "normalized")
                 else:
                     if numeroCanzoniStampate >= 3:
                         continue
                     numeroCanzoniStampate += 1
-                    print(f"\tNO-MATCH: {song['title']} - {song['artists'][0]['name']} - {song['album']['name'] if song['album'] is not None else "no-album"} - {song['videoId']}")
+                    _lookup_message(details, f"\tNO-MATCH: {song['title']} - {song['artists'][0]['name']} - {song['album']['name'] if song['album'] is not None else "no-album"} - {song['videoId']}")
             
             #se ancora non ho trovato nulla loggo e uso il primo risultato
-            print(f"\t-->NOT FOUND. using first result: https://youtu.be/{songs[0]['videoId']}")
+            _lookup_message(details, f"\t-->NOT FOUND. using first result: https://youtu.be/{songs[0]['videoId']}")
 
-            #scrivo sul file di log le canzoni con match da controllare
-            scriviFile(["Spotify", track_name, artist_name, album_name])
-            scriviFile(["YouTubeMusic", songs[0]['title'], songs[0]['artists'][0]['name'], songs[0]['album']['name'] if songs[0]['album'] is not None else "no-album", f"https://youtu.be/{songs[0]['videoId']}"])
-            scriviFile([])
-
-            matchIncompleto_count += 1 #conto un match incompleto in più
-
-            return songs[0]#aggiunto: se non trovo un match preciso, uso la prima canzone
+            return matched(songs[0], "first_result", fallback=True)#aggiunto: se non trovo un match preciso, uso la prima canzone
 
             raise ValueError(
                 f"Did not find '{track_name} by {artist_name}' from {album_name}\n\n"
             )
 
+        case 4:
+            ranked = rank_candidates(normalize_track(track_name, album_name, artist_name), songs)
+            if details:
+                details.scores = ranked
+            if not ranked:
+                raise ValueError(f"Did not find '{track_name} by {artist_name}' from {album_name}")
+
+            best = ranked[0]
+            if best.score >= match_threshold:
+                return matched(best.song, "score")
+
+            for candidate in ranked[:3]:
+                song = candidate.song
+                _lookup_message(details, f"\tNO-MATCH ({candidate.score:.2f} {','.join(candidate.reasons)}): {song['title']} - {song['videoId']}")
+
+            #nessun risultato abbastanza sicuro: uso il migliore e lo loggo
+            _lookup_message(details, f"\t-->NOT CONFIDENT. using best result: https://youtu.be/{best.song['videoId']}")
+            return matched(best.song, "best_score", fallback=True)
+
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CONCURRENCY = 4
+
+
+class PlaylistEditRejected(ValueError):
+    """YTMusic answered an `add_playlist_items` call with a status other than SUCCEEDED."""
+
+
+class PlaylistWriter:
+    """Buffer of resolved videoIds that are written to YTMusic in chunks.
+
+    Tracks are written in the order they were added.  If a chunk fails it is split
+    in half and each half is retried, down to single tracks.  A single track that
+    fails in transit gets the usual retries through the rate limiter; one whose
+    edit YTMusic rejects (with `duplicates=False` the whole chunk is rejected if any
+    track is already in the playlist) is not retried and is journaled as a duplicate.
+    With `playlist_id` None the tracks are liked instead; YTMusic has no batch call
+    for that, so they are rated one by one.
+
+    Args:
+        `yt` (YTMusic)
+        `playlist_id` (Optional[str]): The destination playlist, None to like the tracks.
+        `batch_size` (int): Number of tracks written with a single `add_playlist_items` call.
+        `journal` (Optional[ResumeJournal]): Tracks are journaled as added once they are written.
+    """
+
+    def __init__(
+        self,
+        yt: YTMusic,
+        playlist_id: Optional[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        journal: Optional[ResumeJournal] = None,
+    ):
+        self.yt = yt
+        self.playlist_id = playlist_id
+        self.batch_size = max(1, batch_size)
+        self.journal = journal
+        self.written = 0
+        self.failed: List[str] = []
+        self.rejected: List[str] = []
+        self._pending: List[tuple] = []  # (videoId, chiave del journal)
+        self._method = "rate_song" if playlist_id is None else "add_playlist_items"
+
+    def add(self, video_id: str, key: Optional[str] = None) -> None:
+        self._pending.append((video_id, key))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every buffered track."""
+        #  Swap the buffer first, so a flush from the signal handler can't write a chunk twice
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        if self.playlist_id is None:
+            for entry in pending:
+                self._write([entry])
+        else:
+            self._write(pending)
+
+    def _write(self, entries: List[tuple]) -> None:
+        video_ids = [video_id for video_id, _ in entries]
+        if len(entries) == 1:
+            try:
+                self._request(video_ids, tries=10)
+            except PlaylistEditRejected as e:
+                print(f"NOTE: {video_ids[0]} not added to {self.playlist_id}, probably already there: {e}")
+                self.rejected.append(video_ids[0])
+                self._journal(entries, "duplicate")
+                return
+            except Exception as e:
+                print(f"ERROR: Giving up adding {video_ids[0]} to {self.playlist_id}: {e}")
+                self.failed.append(video_ids[0])
+                self._journal(entries, "error")
+                return
+            self.written += 1
+            tracks_written.inc(method=self._method)
+            self._journal(entries, "added")
+            return
+
+        try:
+            self._request(video_ids)
+        except Exception as e:
+            half = len(entries) // 2
+            print(
+                f"ERROR: (add_playlist_items of {len(entries)} tracks failed: {e}) retrying as {half} + {len(entries) - half} tracks"
+            )
+            self._write(entries[:half])
+            self._write(entries[half:])
+            return
+        self.written += len(entries)
+        tracks_written.inc(len(entries), method=self._method)
+        self._journal(entries, "added")
+
+    def _journal(self, entries: List[tuple], outcome: str) -> None:
+        if self.journal is None:
+            return
+        for video_id, key in entries:
+            if key is not None:
+                self.journal.record(key, outcome, video_id)
+
+    def _request(self, video_ids: List[str], tries: int = 1) -> None:
+        if self.playlist_id is None:
+            ytmusic_call(self.yt.rate_song, video_ids[0], "LIKE", tries=tries)
+            return
+        ret = ytmusic_call(self._add_playlist_items, video_ids, tries=tries)
+        #  add_playlist_items returns the whole response instead of raising when YTMusic refuses the edit.
+        #  Checked outside ytmusic_call: a refusal is an answer, not a failure to retry or slow down for
+        if isinstance(ret, dict) and "SUCCEEDED" not in str(ret.get("status", "SUCCEEDED")):
+            raise PlaylistEditRejected(f"add_playlist_items failed: {ret.get('status')}")
+
+    def _add_playlist_items(self, video_ids: List[str]):
+        return self.yt.add_playlist_items(
+            playlistId=self.playlist_id,
+            videoIds=video_ids,
+            duplicates=False,
+        )
+
+
+class PlaylistIndex:
+    """Index of the tracks already in a YTMusic playlist.
+
+    Used by the sync mode of `copier`: a source track whose normalized title and artist
+    are already in the destination is skipped before it is searched.
+
+    Args:
+        `tracks` (List[dict]): The `tracks` of `get_playlist` or `get_liked_songs`.
+    """
+
+    def __init__(self, tracks: List[dict]):
+        self.video_ids = set()
+        self.songs = set()
+        for track in tracks:
+            if track.get("videoId"):
+                self.video_ids.add(track["videoId"])
+            if track.get("title") and track.get("artists"):
+                self.songs.add(
+                    self.song_key(track["title"], track["artists"][0]["name"])
+                )
+
+    @staticmethod
+    def song_key(title: str, artist: str) -> tuple:
+        return (clean_track_name(title), clean_artist_name(artist))
+
+    def __contains__(self, src_track: SongInfo) -> bool:
+        return self.song_key(src_track.title, src_track.artist) in self.songs
+
+    def __len__(self) -> int:
+        return len(self.video_ids)
+
+
+class LookupMemo:
+    """Run-scoped memo of `lookup_song` results, keyed on the normalized SongInfo.
+
+    `copy_all_playlists` shares one memo between all the playlists it copies, so a
+    song that appears in several playlists is only looked up once.  Failed lookups
+    are not remembered (the error may be a transient one): the lookups already
+    waiting for one get its error, later ones try again.
+    """
+
+    def __init__(self):
+        self._results: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(src_track: SongInfo) -> tuple:
+        # Stessa normalizzazione (in cache) che poi usa l'algoritmo 3
+        track = normalize_track(src_track.title, src_track.album, src_track.artist)
+        return (track.clean_title, track.clean_artist, track.clean_album)
+
+    def lookup(self, src_track: SongInfo, lookup_func) -> dict:
+        """Return the memoized result for `src_track`, calling `lookup_func(src_track)` on a miss.
+
+        A lookup of the same song already running in another thread is waited for
+        instead of being started a second time.
+        """
+        key = self.key(src_track)
+        with self._lock:
+            result = self._results.get(key)
+            owner = result is None
+            if owner:
+                result = self._results[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                result.set_result(lookup_func(src_track))
+            except Exception as e:
+                result.set_exception(e)
+                with self._lock:
+                    if self._results.get(key) is result:
+                        del self._results[key]
+        return result.result()
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"Lookup memo: {self.hits} hits, {self.misses} misses ({rate:.1f}% of tracks were repeats)"
+
+
+def _iter_lookups(
+    yt: YTMusic,
+    src_tracks: Iterator[SongInfo],
+    yt_search_algo: int,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    memo: Optional[LookupMemo] = None,
+) -> Iterator[tuple]:
+    """Look up the source tracks, up to `concurrency` at a time.
+
+    Results are reassembled in source order before being yielded, so the caller sees
+    exactly the sequence the serial loop would produce.  At most `2 * concurrency`
+    lookups are queued ahead of the caller, which bounds memory and keeps a stopped
+    consumer from searching the whole library.
+
+    The messages of each lookup are kept in its ResearchDetails instead of being
+    printed by the search threads, so the caller can print them next to the track.
+
+    Yields:
+        (SongInfo, Optional[dict], Optional[ResearchDetails], Optional[Exception]): The
+        source track, the YTMusic track found for it and the details of the lookup
+        (`fallback` if nothing matched and the first or best result was used), or the
+        exception raised by `lookup_song`.
+    """
+
+    def search(src_track: SongInfo) -> tuple:
+        details = ResearchDetails(messages=[])
+        song = lookup_song(
+            yt, src_track.title, src_track.artist, src_track.album, yt_search_algo,
+            details=details, suggestions=False,
+        )
+        return song, details
+
+    def lookup(src_track: SongInfo) -> tuple:
+        return search(src_track) if memo is None else memo.lookup(src_track, search)
+
+    if concurrency <= 1:
+        for src_track in src_tracks:
+            try:
+                yield src_track, *lookup(src_track), None
+            except Exception as e:
+                yield src_track, None, None, e
+        return
+
+    def result(src_track: SongInfo, future) -> tuple:
+        try:
+            return src_track, *future.result(), None
+        except Exception as e:
+            return src_track, None, None, e
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="lookup") as pool:
+        in_flight = deque()
+        for src_track in src_tracks:
+            in_flight.append((src_track, pool.submit(lookup, src_track)))
+            if len(in_flight) >= 2 * concurrency:
+                yield result(*in_flight.popleft())
+        while in_flight:
+            yield result(*in_flight.popleft())
+
 
 def copier(
     src_tracks: Iterator[SongInfo],
     dst_pl_id: Optional[str] = None,
     dry_run: bool = False,
-    track_sleep: float = 0.1,
+    track_sleep: Optional[float] = None,
     yt_search_algo: int = 3,
     *,
     yt: Optional[YTMusic] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    source_id: Optional[str] = None,
+    resume: bool = True,
+    sync: bool = False,
+    memo: Optional[LookupMemo] = None,
 ):
     """
     @@@
+
+    `track_sleep` is the old fixed delay between requests.  If given, it sets the
+    budget of the shared rate limiter to `1 / track_sleep` requests per second
+    (0 means unlimited), otherwise the budget set by `configure_rate_limiter` is used.
+
+    If `source_id` identifies the source playlist, every processed track is recorded
+    in a resume journal for the (source, destination) pair and tracks already added
+    by an earlier run are skipped without searching.  `resume` False starts the
+    journal over.
+
+    With `sync` the destination (playlist, or liked songs) is fetched once and source
+    tracks already in it are skipped before any search, so re-syncing a mostly
+    unchanged playlist only costs searches for the new tracks.
+
+    A `memo` shared between several calls avoids looking up the same song twice.
     """
+    if track_sleep is not None:
+        configure_rate_limiter(1 / track_sleep if track_sleep > 0 else 0)
+
     if yt is None:
         yt = get_ytmusic()
 
+    yt_pl = None
     if dst_pl_id is not None:
         try:
-            yt_pl = yt.get_playlist(playlistId=dst_pl_id)
+            yt_pl = ytmusic_call(
+                yt.get_playlist,
+                playlistId=dst_pl_id,
+                limit=None if sync else 100,
+                tries=3,
+            )
         except Exception as e:
             print(f"ERROR: Unable to find YTMusic playlist {dst_pl_id}: {e}")
             print(
@@ -497,20 +1117,76 @@ def copier(
         print(f"DESTINAZIONE: Youtube Playlist: {yt_pl['title']}")
 
     tracks_added_set = set()
+    present_index = None
+    if sync:
+        if yt_pl is None:
+            yt_pl = ytmusic_call(yt.get_liked_songs, limit=None, tries=3)
+        present_index = PlaylistIndex(yt_pl.get("tracks") or [])
+        tracks_added_set.update(present_index.video_ids)
+        print(f"Sync: {len(present_index)} tracks already in the destination")
+
     global numeroTracciaCorrente  # Dichiara che stiamo usando la variabile globale
     numeroTracciaCorrente = 0  # Inizializza il contatore delle tracce processate
-    src_tracks, src_tracks_copy = tee(src_tracks)  # Duplica l'iteratore perché non può essere consumato più volte
     global numeroTotaleTracce  # Dichiara che stiamo usando la variabile globale
-    numeroTotaleTracce = sum(1 for _ in src_tracks_copy)  # Conta gli elementi consumando la copia
-    print(f"Numero totale di tracce da copiare: {numeroTotaleTracce}")
-
-    inizializzaFile("canzoniNO-MATCH.csv")#Aggiunto
-
-    for src_track in src_tracks:
+    # Totale dal length hint dell'iteratore (SongIterator), None se sconosciuto: niente seconda passata
+    numeroTotaleTracce = operator.length_hint(src_tracks, -1)
+    if numeroTotaleTracce < 0:
+        numeroTotaleTracce = None
+    print(f"Numero totale di tracce da copiare: {numeroTotaleTracce if numeroTotaleTracce is not None else 'sconosciuto'}")
+
+    inizializzaFile()#Aggiunto
+
+    global active_writer, active_journal
+    journal = None
+    if source_id is not None and not dry_run:
+        journal = ResumeJournal(
+            journal_path(source_id, dst_pl_id or "liked"), reset=not resume
+        )
+        active_journal = journal
+        if len(journal):
+            print(f"Resuming from {journal.path}: {len(journal)} tracks already processed")
+
+    writer = None
+    if not dry_run:
+        writer = PlaylistWriter(yt, dst_pl_id, batch_size, journal)
+        active_writer = writer
+
+    resumed_count = 0
+    present_count = 0
+
+    def pending_tracks() -> Iterator[SongInfo]:
+        """The source tracks, without the ones an earlier run or the destination already have."""
+        nonlocal resumed_count, present_count
+        global numeroTracciaCorrente
+        for src_track in src_tracks:
+            if journal is not None and journal.is_done(track_key(src_track)):
+                video_id = journal.get(track_key(src_track))["videoId"]
+                if video_id:
+                    tracks_added_set.add(video_id)
+                resumed_count += 1
+                numeroTracciaCorrente += 1
+                _emit("skipped", src_track, reason="resumed")
+                tracks_processed.inc(outcome="skipped")
+                continue
+            if present_index is not None and src_track in present_index:
+                present_count += 1
+                numeroTracciaCorrente += 1
+                _emit("skipped", src_track, reason="present")
+                tracks_processed.inc(outcome="skipped")
+                continue
+            yield src_track
+
+    for src_track, dst_track, details, lookup_error in _iter_lookups(
+        yt, pending_tracks(), yt_search_algo, concurrency, memo
+    ):
         print("======\n\n======")#aggiunto
 
         numeroTracciaCorrente += 1
-        print(f"{numeroTracciaCorrente}/{numeroTotaleTracce}: {numeroTracciaCorrente/numeroTotaleTracce*100:.2f}%")
+        tracks_processed.inc(outcome="looked_up")
+        if numeroTotaleTracce:
+            print(f"{numeroTracciaCorrente}/{numeroTotaleTracce}: {numeroTracciaCorrente/numeroTotaleTracce*100:.2f}%")
+        else:
+            print(f"{numeroTracciaCorrente}/?")
 
         # presente nella versione di FrederikBertelsen
         # TODO: REMOVE THIS
@@ -518,16 +1194,17 @@ def copier(
         #    continue
 
         print(f"Spotify:   {src_track.title} - {src_track.artist} - {src_track.album}")
+        if details is not None:
+            for message in details.messages:
+                print(message)
 
-        try:
-            dst_track = lookup_song(
-                yt, src_track.title, src_track.artist, src_track.album, yt_search_algo
-            )
-        except Exception as e:
-            print(f"ERROR: Unable to look up song on YTMusic: {e}")
+        if lookup_error is not None:
+            print(f"ERROR: Unable to look up song on YTMusic: {lookup_error}")
             global error_count  # Dichiara che stiamo usando la variabile globale
             error_count += 1
-            scriviFile(["ERROR: Not Found on Youtube", src_track.title, src_track.artist, src_track.album])  # Aggiunto per loggare le canzoni non trovate
+            _emit("error", src_track, error=str(lookup_error))  # Aggiunto per loggare le canzoni non trovate
+            if journal is not None:
+                journal.record(track_key(src_track), "error")
             continue
 
         yt_artist_name = "<Unknown>"
@@ -544,41 +1221,50 @@ def copier(
 
         print(f"Youtube: {dst_track['title']} - {yt_artist_name} - {album_str}")
 
+        fallback = details.fallback
+        if fallback:
+            global matchIncompleto_count  # Dichiara che stiamo usando la variabile globale
+            matchIncompleto_count += 1  # conto un match incompleto in più
+
         if dst_track["videoId"] in tracks_added_set:
             print("(DUPLICATE, this track has already been added)")
             global duplicate_count  # Dichiara che stiamo usando la variabile globale
             duplicate_count += 1
-            scriviFile(["DUPLICATE (presente)(YTMusic)", dst_track['title'], yt_artist_name, album_str])  # Aggiunto per loggare le canzoni duplicate
-            scriviFile(["DUPLICATE (saltata)(Spotify)", src_track.title, src_track.artist, src_track.album])
+            _emit("duplicate", src_track, dst_track, fallback=fallback)  # Aggiunto per loggare le canzoni duplicate
+            if journal is not None:
+                journal.record(track_key(src_track), "duplicate", dst_track["videoId"])
+            continue  # Già aggiunta: la riscrittura con duplicates=False non avrebbe effetto
         tracks_added_set.add(dst_track["videoId"])
-
-        if not dry_run:
-            exception_sleep = 5
-            for _ in range(10):
-                try:
-                    if dst_pl_id is not None:
-                        yt.add_playlist_items(
-                            playlistId=dst_pl_id,
-                            videoIds=[dst_track["videoId"]],
-                            duplicates=False,
-                        )
-                    else:
-                        yt.rate_song(dst_track["videoId"], "LIKE")
-                    break
-                except Exception as e:
-                    print(
-                        f"ERROR: (Retrying add_playlist_items: {dst_pl_id} {dst_track['videoId']}) {e}. waiting {exception_sleep} seconds"
-                    )
-                    time.sleep(exception_sleep)
-                    exception_sleep *= 1.2
-
-        if track_sleep:
-            time.sleep(track_sleep)
+        _emit("fallback" if fallback else "match", src_track, dst_track)
+
+        if writer is not None:
+            writer.add(dst_track["videoId"], track_key(src_track))
+
+    if writer is not None:
+        writer.flush()
+        active_writer = None
+        if writer.failed:
+            print(f"ERROR: {len(writer.failed)} tracks could not be written: {writer.failed}")
+        if writer.rejected:
+            print(f"{len(writer.rejected)} tracks were refused by YTMusic, probably already in the playlist")
+    if journal is not None:
+        journal.close()
+        active_journal = None
+        if resumed_count:
+            print(f"Skipped {resumed_count} tracks already processed by an earlier run")
+    if present_count:
+        print(f"Skipped {present_count} tracks already in the destination")
 
     print()
     print(
         f"Added {len(tracks_added_set)} tracks, encountered {duplicate_count} duplicates, {error_count} errors, {matchIncompleto_count} incomplete matches"
     )
+    if search_cache is not None:
+        print(search_cache.summary())
+    print(rate_limiter.summary())
+    print(metrics_summary())
+    if ytmusic_transport is not None and yt is ytmusic_transport:
+        print(ytmusic_transport.summary())
     chiudiFile()#Aggiunto
 
 
@@ -587,20 +1273,30 @@ def copy_playlist(
     ytmusic_playlist_id: str,
     spotify_playlists_encoding: str = "utf-8",
     dry_run: bool = False,
-    track_sleep: float = 0.1,
+    track_sleep: Optional[float] = None,
     yt_search_algo: int = 3,
     reverse_playlist: bool = True,
     privacy_status: str = "PRIVATE",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    resume: bool = True,
+    sync: bool = False,
+    backup: Optional[SpotifyBackup] = None,
 ):
     """
     Copy a Spotify playlist to a YTMusic playlist
     @@@
+
+    `backup` is an already opened Spotify backup, "playlists.json" is read if None.
     """
 
     if spotify_playlist_id == "":
         print("ERROR: Campo sorgente non può essere vuoto")
         return
 
+    if backup is None:
+        backup = open_backup("playlists.json", spotify_playlists_encoding)
+
     print("Using search algo n°: ", yt_search_algo)
     yt = get_ytmusic()
     pl_name: str = ""
@@ -615,11 +1311,10 @@ def copy_playlist(
     if ytmusic_playlist_id == "" or ytmusic_playlist_id is None: # creo nuova playlist con nome = nome della playlist spotify
         if pl_name == "":
             print("No playlist name or ID provided, creating playlist...")
-            spotify_pls: dict = load_playlists_json()
-            for pl in spotify_pls["playlists"]:
-                if len(pl.keys()) > 3 and pl["id"] == spotify_playlist_id:
-                    pl_name_spotify = pl["name"]
-                    pl_name = pl_name_spotify
+            pl = backup.find_playlist(spotify_playlist_id)
+            if pl is not None:
+                pl_name_spotify = pl["name"]
+                pl_name = pl_name_spotify
 
         if pl_name != "":
             ytmusic_playlist_id = _ytmusic_create_playlist(
@@ -648,10 +1343,9 @@ def copy_playlist(
         reverse_playlist = True # verificare?
         print(f"NOTE: Uso come sorgente i brani preferiti di Spotify")
     
-    spotify_pls: dict = load_playlists_json()
-    for pl in spotify_pls["playlists"]:
-        if len(pl.keys()) > 3 and pl["id"] == spotify_playlist_id:
-            pl_name_spotify = pl["name"]
+    pl = backup.find_playlist(spotify_playlist_id) if spotify_playlist_id is not None else None
+    if pl is not None:
+        pl_name_spotify = pl["name"]
 
 
     global playlistSorgente, playlistDestinazione  # Dichiara che stiamo usando le variabili globali
@@ -661,32 +1355,46 @@ def copy_playlist(
     copier(
         iter_spotify_playlist(
             spotify_playlist_id,
-            spotify_encoding=spotify_playlists_encoding,
             reverse_playlist=reverse_playlist,
+            backup=backup,
         ),
         ytmusic_playlist_id,
         dry_run,
         track_sleep,
         yt_search_algo,
         yt=yt,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        source_id=spotify_playlist_id or "liked",
+        resume=resume,
+        sync=sync,
     )
 
 
 def copy_all_playlists(
-    track_sleep: float = 0.1,
+    track_sleep: Optional[float] = None,
     dry_run: bool = False,
     spotify_playlists_encoding: str = "utf-8",
     yt_search_algo: int = 3,
     reverse_playlist: bool = True,
     privacy_status: str = "PRIVATE",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    resume: bool = True,
+    sync: bool = False,
+    backup: Optional[SpotifyBackup] = None,
 ):
     """
     Copy all Spotify playlists (except Liked Songs) to YTMusic playlists
+
+    `backup` is an already opened Spotify backup, "playlists.json" is read if None.
     """
-    spotify_pls = load_playlists_json()
+    if backup is None:
+        backup = open_backup("playlists.json", spotify_playlists_encoding)
     yt = get_ytmusic()
+    memo = LookupMemo()  # Le canzoni presenti in più playlist vengono cercate una volta sola
 
-    for src_pl in spotify_pls["playlists"]:
+    for src_pl in backup.iter_playlists():
         if str(src_pl.get("name")) == "Liked Songs":
             continue
 
@@ -715,14 +1423,22 @@ def copy_all_playlists(
         copier(
             iter_spotify_playlist(
                 src_pl["id"],
-                spotify_encoding=spotify_playlists_encoding,
                 reverse_playlist=reverse_playlist,
+                backup=backup,
             ),
             dst_pl_id,
             dry_run,
             track_sleep,
             yt_search_algo,
+            yt=yt,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            source_id=src_pl["id"],
+            resume=resume,
+            sync=sync,
+            memo=memo,
         )
         print("\nPlaylist done!\n")
 
+    print(memo.summary())
     print("All done!")
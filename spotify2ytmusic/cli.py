@@ -1,17 +1,212 @@
 #!/usr/bin/env python3
 
 import sys
+import os
+import json
+import contextlib
 from argparse import ArgumentParser
 import pprint
 
 from . import backend
+from . import evaluation
+
+
+def _add_search_cache_arguments(parser: ArgumentParser) -> None:
+    """Add the search-result cache switches shared by the commands that search YTMusic."""
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not use the on-disk cache of YTMusic search results (default: False)",
+    )
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="Ignore cached search results, search again and update the cache (default: False)",
+    )
+
+
+def _add_batch_size_argument(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=backend.DEFAULT_BATCH_SIZE,
+        help=f"Number of tracks added to the YTMusic playlist per request (default: {backend.DEFAULT_BATCH_SIZE})",
+    )
+
+
+def _add_concurrency_argument(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=backend.DEFAULT_CONCURRENCY,
+        help=f"Number of YTMusic searches run in parallel, 1 searches one track at a time (default: {backend.DEFAULT_CONCURRENCY})",
+    )
+
+
+def _add_rate_limit_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=backend.DEFAULT_REQUESTS_PER_SECOND,
+        help="Maximum YTMusic requests per second, the rate is lowered automatically "
+        f"while YTMusic returns errors. 0 for no limit (default: {backend.DEFAULT_REQUESTS_PER_SECOND})",
+    )
+    parser.add_argument(
+        "--track-sleep",
+        type=float,
+        default=None,
+        help="Deprecated, use --requests-per-second.  Time between YTMusic requests, "
+        "overrides --requests-per-second with 1/TRACK_SLEEP.",
+    )
+
+
+def _configure_rate_limiter(args) -> None:
+    backend.configure_rate_limiter(args.requests_per_second)
+
+
+def _add_resume_argument(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Ignore the journal of an earlier interrupted run and process every track again (default: False)",
+    )
+
+
+def _add_sync_argument(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Read the destination once and skip tracks that are already in it before searching (default: False)",
+    )
+
+
+def _add_spotify_backup_argument(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--spotify-backup",
+        default="playlists.json",
+        help="The Spotify backup to read, `playlists.json` or a database made by convert_backup (default: playlists.json)",
+    )
+
+
+def _add_match_threshold_argument(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--match-threshold",
+        type=float,
+        default=backend.DEFAULT_ACCEPT_THRESHOLD,
+        help="Score (0-1) a search result needs to be accepted by the scored matching of --algo 4, "
+        f"and by --algo 2 before it searches videos (default: {backend.DEFAULT_ACCEPT_THRESHOLD})",
+    )
+
+
+def _add_ytmusic_transport_arguments(parser: ArgumentParser) -> None:
+    """Add the switches to record the YTMusic traffic to a cassette, or replay one offline."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--record",
+        metavar="CASSETTE",
+        help="Record the YTMusic requests and responses to the CASSETTE file",
+    )
+    group.add_argument(
+        "--replay",
+        metavar="CASSETTE",
+        help="Do not connect to YTMusic, answer from a CASSETTE written by --record",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        default=0.0,
+        help="Seconds every replayed request waits before answering (default: 0)",
+    )
+    parser.add_argument(
+        "--replay-jitter",
+        type=float,
+        default=0.0,
+        help="Up to this many seconds are added at random to --replay-latency (default: 0)",
+    )
+    parser.add_argument(
+        "--replay-error-rate",
+        type=float,
+        default=0.0,
+        help="Share (0-1) of the replayed requests that fail (default: 0)",
+    )
+    parser.add_argument(
+        "--replay-seed",
+        type=int,
+        default=None,
+        help="Seed of the replay latency and errors, for repeatable runs",
+    )
+
+
+def _configure_ytmusic_transport(args) -> None:
+    backend.configure_ytmusic_transport(
+        record=args.record,
+        replay=args.replay,
+        latency=args.replay_latency,
+        jitter=args.replay_jitter,
+        error_rate=args.replay_error_rate,
+        seed=args.replay_seed,
+    )
+
+
+def _add_metrics_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--metrics-file",
+        help="Write request latencies, retries, rate limiting and matching time to this file while running",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=backend.METRICS_FORMATS,
+        default="prometheus",
+        help="Format of --metrics-file: prometheus (for the node_exporter textfile collector) or json (default: prometheus)",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=backend.DEFAULT_EXPORT_INTERVAL,
+        help=f"Seconds between two writes of --metrics-file (default: {backend.DEFAULT_EXPORT_INTERVAL})",
+    )
+
+
+def _configure_metrics(args) -> None:
+    backend.configure_metrics(args.metrics_file, args.metrics_format, args.metrics_interval)
+
+
+def _add_event_log_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--event-log",
+        default=backend.DEFAULT_EVENT_LOG,
+        help=f"Append what was done to every track to this JSON-lines file (default: {backend.DEFAULT_EVENT_LOG})",
+    )
+    parser.add_argument(
+        "--no-csv-log",
+        action="store_true",
+        help=f"Do not write the tracks to check to {backend.DEFAULT_CSV_LOG} at the end of the copy (default: False)",
+    )
+
+
+def _configure_event_log(args) -> None:
+    backend.configure_event_log(args.event_log, None if args.no_csv_log else backend.DEFAULT_CSV_LOG)
+
+
+def _configure_search_cache(args) -> None:
+    backend.configure_search_cache(
+        enabled=not args.no_cache, refresh=args.refresh_cache
+    )
 
 
 def list_liked_albums():
     """
     List albums that have been liked.
     """
-    for song in backend.iter_spotify_liked_albums():
+
+    def parse_arguments():
+        parser = ArgumentParser()
+        _add_spotify_backup_argument(parser)
+        return parser.parse_args()
+
+    args = parse_arguments()
+
+    for song in backend.iter_spotify_liked_albums(backup=backend.open_backup(args.spotify_backup)):
         print(f"{song.album} - {song.artist} - {song.title}")
 
 
@@ -19,20 +214,30 @@ def list_playlists():
     """
     List the playlists on Spotify and YTMusic
     """
+
+    def parse_arguments():
+        parser = ArgumentParser()
+        _add_spotify_backup_argument(parser)
+        _add_ytmusic_transport_arguments(parser)
+        return parser.parse_args()
+
+    args = parse_arguments()
+    _configure_ytmusic_transport(args)
+
     yt = backend.get_ytmusic()
 
-    spotify_pls = backend.load_playlists_json()
+    backup = backend.open_backup(args.spotify_backup)
 
     #  Liked music
     print("== Spotify")
-    for src_pl in spotify_pls["playlists"]:
+    for src_pl in backup.iter_playlists():
         print(
-            f"{src_pl.get('id')} - {src_pl['name']:50} ({len(src_pl['tracks'])} tracks)"
+            f"{src_pl.get('id')} - {src_pl['name']:50} ({backup.track_count(src_pl.get('id'))} tracks)"
         )
 
     print()
     print("== YTMusic")
-    for pl in yt.get_library_playlists(limit=5000):
+    for pl in backend.ytmusic_call(yt.get_library_playlists, limit=5000):
         print(f"{pl['playlistId']} - {pl['title']:40} ({pl.get('count', '?')} tracks)")
 
 
@@ -53,10 +258,12 @@ def create_playlist():
             type=str,
             help="Name of playlist to create.",
         )
+        _add_ytmusic_transport_arguments(parser)
 
         return parser.parse_args()
 
     args = parse_arguments()
+    _configure_ytmusic_transport(args)
 
     backend.create_playlist(args.playlist_name, privacy_status=args.privacy)
 
@@ -85,11 +292,17 @@ def search():
             "--algo",
             type=int,
             default=0,
-            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching)",
+            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching, 4 = scored matching)",
         )
+        _add_match_threshold_argument(parser)
+        _add_search_cache_arguments(parser)
+        _add_ytmusic_transport_arguments(parser)
         return parser.parse_args()
 
     args = parse_arguments()
+    _configure_search_cache(args)
+    _configure_ytmusic_transport(args)
+    backend.configure_matcher(args.match_threshold)
 
     yt = backend.get_ytmusic()
     details = backend.ResearchDetails()
@@ -102,6 +315,11 @@ def search():
     pprint.pprint(ret)
     print()
     print(f"Search Suggestions: '{details.suggestions}'")
+    if details.scores:
+        print("Top 5 scored results:")
+        for candidate in details.scores[:5]:
+            song = candidate.song
+            print(f"  {candidate.score:.2f} {','.join(candidate.reasons)}: {song['title']} - {song['videoId']}")
     if details.songs:
         print("Top 5 songs returned from search:")
         for song in details.songs[:5]:
@@ -116,12 +334,7 @@ def load_liked_albums():
 
     def parse_arguments():
         parser = ArgumentParser()
-        parser.add_argument(
-            "--track-sleep",
-            type=float,
-            default=0.1,
-            help="Time to sleep between each track that is added (default: 0.1)",
-        )
+        _add_rate_limit_arguments(parser)
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -132,27 +345,45 @@ def load_liked_albums():
             default="utf-8",
             help="The encoding of the `playlists.json` file.",
         )
+        _add_spotify_backup_argument(parser)
         parser.add_argument(
             "--algo",
             type=int,
             default=0,
-            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching)",
+            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching, 4 = scored matching)",
         )
-
+        _add_match_threshold_argument(parser)
+
+        _add_concurrency_argument(parser)
+        _add_resume_argument(parser)
+        _add_metrics_arguments(parser)
+        _add_event_log_arguments(parser)
+        _add_sync_argument(parser)
+        _add_search_cache_arguments(parser)
+        _add_ytmusic_transport_arguments(parser)
         return parser.parse_args()
 
     args = parse_arguments()
-
-    spotify_pls = backend.load_playlists_json()
+    _configure_search_cache(args)
+    _configure_ytmusic_transport(args)
+    backend.configure_matcher(args.match_threshold)
+    _configure_rate_limiter(args)
+    _configure_metrics(args)
+    _configure_event_log(args)
 
     backend.copier(
         backend.iter_spotify_liked_albums(
-            spotify_encoding=args.spotify_playlists_encoding
+            spotify_playlist_file=args.spotify_backup,
+            spotify_encoding=args.spotify_playlists_encoding,
         ),
         None,
         args.dry_run,
         args.track_sleep,
         args.algo,
+        concurrency=args.concurrency,
+        source_id="liked_albums",
+        resume=not args.no_resume,
+        sync=args.sync,
     )
 
 
@@ -163,12 +394,7 @@ def load_liked():
 
     def parse_arguments():
         parser = ArgumentParser()
-        parser.add_argument(
-            "--track-sleep",
-            type=float,
-            default=0.1,
-            help="Time to sleep between each track that is added (default: 0.1)",
-        )
+        _add_rate_limit_arguments(parser)
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -179,12 +405,14 @@ def load_liked():
             default="utf-8",
             help="The encoding of the `playlists.json` file.",
         )
+        _add_spotify_backup_argument(parser)
         parser.add_argument(
             "--algo",
             type=int,
             default=0,
-            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching)",
+            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching, 4 = scored matching)",
         )
+        _add_match_threshold_argument(parser)
         parser.add_argument(
             "--reverse-playlist",
             action="store_true",
@@ -192,13 +420,27 @@ def load_liked():
             "they are added in the opposite order from other commands in this program.",
         )
 
+        _add_concurrency_argument(parser)
+        _add_resume_argument(parser)
+        _add_metrics_arguments(parser)
+        _add_event_log_arguments(parser)
+        _add_sync_argument(parser)
+        _add_search_cache_arguments(parser)
+        _add_ytmusic_transport_arguments(parser)
         return parser.parse_args()
 
     args = parse_arguments()
+    _configure_search_cache(args)
+    _configure_ytmusic_transport(args)
+    backend.configure_matcher(args.match_threshold)
+    _configure_rate_limiter(args)
+    _configure_metrics(args)
+    _configure_event_log(args)
 
     backend.copier(
         backend.iter_spotify_playlist(
             None,
+            spotify_playlist_file=args.spotify_backup,
             spotify_encoding=args.spotify_playlists_encoding,
             reverse_playlist=args.reverse_playlist,
         ),
@@ -206,6 +448,10 @@ def load_liked():
         args.dry_run,
         args.track_sleep,
         args.algo,
+        concurrency=args.concurrency,
+        source_id="liked",
+        resume=not args.no_resume,
+        sync=args.sync,
     )
 
 
@@ -216,12 +462,7 @@ def copy_playlist():
 
     def parse_arguments():
         parser = ArgumentParser()
-        parser.add_argument(
-            "--track-sleep",
-            type=float,
-            default=0.1,
-            help="Time to sleep between each track that is added (default: 0.1)",
-        )
+        _add_rate_limit_arguments(parser)
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -242,12 +483,14 @@ def copy_playlist():
             default="utf-8",
             help="The encoding of the `playlists.json` file.",
         )
+        _add_spotify_backup_argument(parser)
         parser.add_argument(
             "--algo",
             type=int,
             default=0,
-            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching)",
+            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching, 4 = scored matching)",
         )
+        _add_match_threshold_argument(parser)
         parser.add_argument(
             "--no-reverse-playlist",
             action="store_true",
@@ -260,9 +503,23 @@ def copy_playlist():
             help="The privacy seting of created playlists (PRIVATE, PUBLIC, UNLISTED, default PRIVATE)",
         )
 
+        _add_batch_size_argument(parser)
+        _add_concurrency_argument(parser)
+        _add_resume_argument(parser)
+        _add_metrics_arguments(parser)
+        _add_event_log_arguments(parser)
+        _add_sync_argument(parser)
+        _add_search_cache_arguments(parser)
+        _add_ytmusic_transport_arguments(parser)
         return parser.parse_args()
 
     args = parse_arguments()
+    _configure_search_cache(args)
+    _configure_ytmusic_transport(args)
+    backend.configure_matcher(args.match_threshold)
+    _configure_rate_limiter(args)
+    _configure_metrics(args)
+    _configure_event_log(args)
     backend.copy_playlist(
         spotify_playlist_id=args.spotify_playlist_id,
         ytmusic_playlist_id=args.ytmusic_playlist_id,
@@ -272,6 +529,11 @@ def copy_playlist():
         reverse_playlist=not args.no_reverse_playlist,
         privacy_status=args.privacy,
         yt_search_algo=args.algo,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        resume=not args.no_resume,
+        sync=args.sync,
+        backup=backend.open_backup(args.spotify_backup, args.spotify_playlists_encoding),
     )
 
 
@@ -282,12 +544,7 @@ def copy_all_playlists():
 
     def parse_arguments():
         parser = ArgumentParser()
-        parser.add_argument(
-            "--track-sleep",
-            type=float,
-            default=0.1,
-            help="Time to sleep between each track that is added (default: 0.1)",
-        )
+        _add_rate_limit_arguments(parser)
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -298,12 +555,14 @@ def copy_all_playlists():
             default="utf-8",
             help="The encoding of the `playlists.json` file.",
         )
+        _add_spotify_backup_argument(parser)
         parser.add_argument(
             "--algo",
             type=int,
             default=0,
-            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching)",
+            help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate, 3 = normalized metadata matching, 4 = scored matching)",
         )
+        _add_match_threshold_argument(parser)
         parser.add_argument(
             "--no-reverse-playlist",
             action="store_true",
@@ -316,9 +575,23 @@ def copy_all_playlists():
             help="The privacy seting of created playlists (PRIVATE, PUBLIC, UNLISTED, default PRIVATE)",
         )
 
+        _add_batch_size_argument(parser)
+        _add_concurrency_argument(parser)
+        _add_resume_argument(parser)
+        _add_metrics_arguments(parser)
+        _add_event_log_arguments(parser)
+        _add_sync_argument(parser)
+        _add_search_cache_arguments(parser)
+        _add_ytmusic_transport_arguments(parser)
         return parser.parse_args()
 
     args = parse_arguments()
+    _configure_search_cache(args)
+    _configure_ytmusic_transport(args)
+    backend.configure_matcher(args.match_threshold)
+    _configure_rate_limiter(args)
+    _configure_metrics(args)
+    _configure_event_log(args)
     backend.copy_all_playlists(
         track_sleep=args.track_sleep,
         dry_run=args.dry_run,
@@ -326,9 +599,139 @@ def copy_all_playlists():
         reverse_playlist=not args.no_reverse_playlist,
         privacy_status=args.privacy,
         yt_search_algo=args.algo,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        resume=not args.no_resume,
+        sync=args.sync,
+        backup=backend.open_backup(args.spotify_backup, args.spotify_playlists_encoding),
     )
 
 
+def convert_backup():
+    """
+    Convert a Spotify backup to the compact, indexed database format
+    """
+
+    def parse_arguments():
+        parser = ArgumentParser()
+        parser.add_argument(
+            "--spotify-playlists-encoding",
+            default="utf-8",
+            help="The encoding of the `playlists.json` file.",
+        )
+        parser.add_argument(
+            "src",
+            nargs="?",
+            default="playlists.json",
+            help="The backup to convert (default: playlists.json)",
+        )
+        parser.add_argument(
+            "dst",
+            nargs="?",
+            default=backend.DEFAULT_SQLITE_FILE,
+            help=f"The database to write (default: {backend.DEFAULT_SQLITE_FILE})",
+        )
+        return parser.parse_args()
+
+    args = parse_arguments()
+
+    backup = backend.convert_backup(args.src, args.dst, args.spotify_playlists_encoding)
+    print(
+        f"Wrote {args.dst}: {sum(1 for _ in backup.iter_playlists())} playlists, "
+        f"{backup.album_track_count()} tracks in liked albums.  Use it with --spotify-backup {args.dst}"
+    )
+
+
+def evaluate():
+    """
+    Compare the accuracy and cost of the search algorithms on a golden set
+    """
+
+    def parse_arguments():
+        parser = ArgumentParser()
+        parser.add_argument(
+            "golden_set",
+            help="CSV file with the columns title, artist, album and video_id (the expected YTMusic videoIds, separated by |)",
+        )
+        parser.add_argument(
+            "--algos",
+            default=",".join(str(algo) for algo in evaluation.ALGORITHMS),
+            help="The algorithms to evaluate (default: all)",
+        )
+        parser.add_argument(
+            "--suggestions",
+            action="store_true",
+            help="Also fetch the search suggestions, like s2yt_search does (default: False)",
+        )
+        parser.add_argument(
+            "--output",
+            help="Also write the report to this JSON file",
+        )
+        _add_rate_limit_arguments(parser)
+        _add_match_threshold_argument(parser)
+        _add_ytmusic_transport_arguments(parser)
+        _add_metrics_arguments(parser)
+        return parser.parse_args()
+
+    args = parse_arguments()
+    _configure_ytmusic_transport(args)
+    backend.configure_matcher(args.match_threshold)
+    #  Ogni ricerca deve arrivare a YTMusic (o alla cassetta) per essere contata
+    backend.configure_search_cache(enabled=False)
+    if args.replay:
+        backend.configure_rate_limiter(0)
+    else:
+        _configure_rate_limiter(args)
+    _configure_metrics(args)
+
+    golden = evaluation.load_golden_set(args.golden_set)
+    yt = backend.get_ytmusic()
+    reports = []
+    for algo in (int(algo) for algo in args.algos.split(",")):
+        print(f"Evaluating algorithm {algo} on {len(golden)} tracks...")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            reports.append(evaluation.evaluate_algorithm(yt, golden, algo, args.suggestions))
+
+    print()
+    print("algo  precision  recall  fallback  not found  CPU ms/track  requests/track")
+    for report in reports:
+        print(
+            f"{report.algo:4}  {report.precision:9.1%}  {report.recall:6.1%}  {report.fallback_rate:8.1%}"
+            f"  {report.not_found:9}  {report.cpu_ms_per_track:12.2f}  {report.requests_per_track:14.2f}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump([report.as_dict() for report in reports], f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+def export_event_log():
+    """
+    Write the tracks to check from an event log to a CSV file
+    """
+
+    def parse_arguments():
+        parser = ArgumentParser()
+        parser.add_argument(
+            "events",
+            nargs="?",
+            default=backend.DEFAULT_EVENT_LOG,
+            help=f"The JSON-lines event log (default: {backend.DEFAULT_EVENT_LOG})",
+        )
+        parser.add_argument(
+            "csv",
+            nargs="?",
+            default=backend.DEFAULT_CSV_LOG,
+            help=f"The CSV file to append to (default: {backend.DEFAULT_CSV_LOG})",
+        )
+        return parser.parse_args()
+
+    args = parse_arguments()
+
+    rows = backend.export_csv(args.events, args.csv)
+    print(f"Wrote {rows} rows to {args.csv}")
+
+
 def gui():
     """
     Run the Spotify2YTMusic GUI.
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+"""
+Evaluation of the search algorithms against a golden set.
+
+The golden set is a CSV file with the columns `title`, `artist`, `album` and
+`video_id`: a Spotify track and the YTMusic videoId it should be matched to.
+Several acceptable videoIds (the album and the single version of a song) are
+separated by "|"; an empty `video_id` means the song is not on YTMusic, so any
+answer is wrong.
+
+Every track is looked up with every algorithm, usually replaying a cassette
+recorded with `--record` (see `ytmusic_replay`) so that all the algorithms see
+the same search results and no time is spent on the network.  For each
+algorithm the report gives:
+
+- precision: correct answers / answers
+- recall: correct answers / tracks that are on YTMusic
+- fallback rate: share of the tracks answered with the first (or best scoring)
+  result because nothing matched
+- CPU time and YTMusic requests per track (retries included)
+"""
+
+import csv
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List
+
+from spotify2ytmusic import backend
+
+GoldenTrack = namedtuple("GoldenTrack", ["title", "artist", "album", "video_ids"])
+
+ALGORITHMS = (0, 1, 2, 3, 4)
+
+
+def load_golden_set(filename: str, encoding: str = "utf-8") -> List[GoldenTrack]:
+    """Read a golden set CSV file (see the module documentation)."""
+    golden = []
+    with open(filename, newline="", encoding=encoding) as f:
+        for row in csv.DictReader(f):
+            video_ids: FrozenSet[str] = frozenset(
+                video_id.strip() for video_id in (row.get("video_id") or "").split("|") if video_id.strip()
+            )
+            golden.append(GoldenTrack(row["title"], row["artist"], row.get("album") or "", video_ids))
+    return golden
+
+
+@dataclass
+class AlgorithmReport:
+    algo: int
+    tracks: int = 0
+    on_ytmusic: int = 0  # Tracce del golden set con almeno un videoId atteso
+    answered: int = 0
+    correct: int = 0
+    fallbacks: int = 0
+    not_found: int = 0  # lookup_song ha sollevato un'eccezione
+    cpu_seconds: float = 0.0
+    requests: int = 0
+    matched_by: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def precision(self) -> float:
+        return self.correct / self.answered if self.answered else 0.0
+
+    @property
+    def recall(self) -> float:
+        return self.correct / self.on_ytmusic if self.on_ytmusic else 0.0
+
+    @property
+    def fallback_rate(self) -> float:
+        return self.fallbacks / self.tracks if self.tracks else 0.0
+
+    @property
+    def cpu_ms_per_track(self) -> float:
+        return self.cpu_seconds * 1000 / self.tracks if self.tracks else 0.0
+
+    @property
+    def requests_per_track(self) -> float:
+        return self.requests / self.tracks if self.tracks else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "algo": self.algo,
+            "tracks": self.tracks,
+            "precision": round(self.precision, 4),
+            "recall": round(self.recall, 4),
+            "fallback_rate": round(self.fallback_rate, 4),
+            "not_found": self.not_found,
+            "cpu_ms_per_track": round(self.cpu_ms_per_track, 3),
+            "requests_per_track": round(self.requests_per_track, 3),
+            "matched_by": dict(self.matched_by),
+        }
+
+
+def _requests_sent() -> int:
+    #  Ogni chiamata a YTMusic passa da ytmusic_call, che le conta nel rate limiter
+    return backend.rate_limiter.successes + backend.rate_limiter.errors
+
+
+def evaluate_algorithm(yt, golden: List[GoldenTrack], algo: int, suggestions: bool = False) -> AlgorithmReport:
+    """Look up every track of `golden` with `algo`.
+
+    The search cache should be disabled, otherwise the requests are not counted.
+    With `suggestions` the search suggestions are fetched too, like `s2yt_search` does.
+    """
+    report = AlgorithmReport(algo)
+    for track in golden:
+        report.tracks += 1
+        report.on_ytmusic += bool(track.video_ids)
+        details = backend.ResearchDetails()
+        requests = _requests_sent()
+        cpu = time.process_time()
+        try:
+            song = backend.lookup_song(
+                yt, track.title, track.artist, track.album, algo, details=details, suggestions=suggestions
+            )
+        except Exception:
+            song = None
+        report.cpu_seconds += time.process_time() - cpu
+        report.requests += _requests_sent() - requests
+
+        if song is None:
+            report.not_found += 1
+            continue
+        report.answered += 1
+        report.correct += song.get("videoId") in track.video_ids
+        report.fallbacks += details.fallback
+        rule = details.matched_by or "unknown"
+        report.matched_by[rule] = report.matched_by.get(rule, 0) + 1
+    return report
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+Structured log of what a copy did to every track, one JSON object per line.
+
+`EventSink` keeps the events in memory and writes them in blocks: when
+`buffer_size` events are waiting, and every `flush_interval` seconds from a
+background thread.  Appending an event only takes a lock around a list
+append, so logging does not slow down the copy.
+
+Every event has `ts` (Unix time) and `event`: "session_start", "session_end",
+and one per source track: "match", "fallback" (no match, the first or best
+result was used), "duplicate", "error" or "skipped".  Track events carry the
+Spotify `title`, `artist`, `album` and `uri`, and the YouTube `video_id`,
+`yt_title`, `yt_artist` and `yt_album` when a song was found.
+
+`export_csv` writes the events in the format of the old `canzoniNO-MATCH.csv`.
+"""
+
+import csv
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List
+
+DEFAULT_EVENT_LOG = "s2yt_events.jsonl"
+DEFAULT_CSV_LOG = "canzoniNO-MATCH.csv"
+DEFAULT_BUFFER_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+
+class EventSink:
+    """Buffered, thread-safe JSON-lines event writer, appending to `path`."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_EVENT_LOG,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.buffer_size = max(1, buffer_size)
+        self._file = open(path, "a", encoding="utf-8")
+        self.start_offset = self._file.tell()  # Dove iniziano gli eventi di questa sessione
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()  # Protegge il buffer
+        self._write_lock = threading.Lock()  # Tiene in ordine i blocchi scritti
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_periodically, args=(flush_interval,), name="event-log", daemon=True
+        )
+        self._flusher.start()
+
+    def emit(self, event: str, **fields) -> None:
+        fields["ts"] = time.time()
+        fields["event"] = event
+        with self._lock:
+            self._buffer.append(fields)
+            full = len(self._buffer) >= self.buffer_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+            if not events or self._file.closed:
+                return
+            self._file.write("".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events))
+            self._file.flush()
+
+    def _flush_periodically(self, interval: float) -> None:
+        while not self._closed.wait(interval):
+            self.flush()
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.flush()
+        with self._write_lock:
+            self._file.close()
+
+
+def read_events(path: str, offset: int = 0) -> Iterator[dict]:
+    """The events of `path`, starting at the byte `offset`."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _csv_rows(event: dict) -> List[list]:
+    """The rows the old log wrote for `event`; the empty rows had no timestamp."""
+    spotify = [event.get("title"), event.get("artist"), event.get("album")]
+    youtube = [event.get("yt_title"), event.get("yt_artist"), event.get("yt_album") or "no-album"]
+    kind = event["event"]
+    rows = []
+    if kind == "session_start":
+        rows.append([
+            "Inizio Sessione",
+            f"Numero totale di tracce: {event.get('total')}",
+            f"Playlist Sorgente: {event.get('source')}",
+            f"Playlist Destinazione: {event.get('destination')}",
+        ])
+    elif kind == "session_end":
+        rows += [[
+            "Fine Sessione",
+            f"Numero di elementi processati: {event.get('processed')}",
+            f"Numero di match incompleti: {event.get('incomplete')}",
+            f"Numero di canzoni non trovate: {event.get('errors')}",
+            f"Numero di tracce saltate perché duplicate: {event.get('duplicates')}",
+        ], [], []]
+    elif kind == "error":
+        rows.append(["ERROR: Not Found on Youtube"] + spotify)
+    if kind == "fallback" or event.get("fallback"):
+        rows += [["Spotify"] + spotify, ["YouTubeMusic"] + youtube + [f"https://youtu.be/{event.get('video_id')}"], []]
+    if kind == "duplicate":
+        rows += [["DUPLICATE (presente)(YTMusic)"] + youtube, ["DUPLICATE (saltata)(Spotify)"] + spotify]
+    return rows
+
+
+def export_csv(events_path: str, csv_path: str = DEFAULT_CSV_LOG, offset: int = 0) -> int:
+    """Append the events of `events_path` (from the byte `offset`) to `csv_path`
+    in the format of the old `canzoniNO-MATCH.csv`.  Returns the number of rows written.
+    """
+    count = 0
+    with open(csv_path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for event in read_events(events_path, offset):
+            timestamp = datetime.fromtimestamp(event["ts"]).strftime("%y-%m-%d %H:%M:%S")
+            for row in _csv_rows(event):
+                writer.writerow([timestamp] + row if row else [])
+                count += 1
+    return count
@@ -284,7 +284,7 @@ class Window:
             self.tab7,
             self.var_algo,
             0,
-            *[1, 2, 3],
+            *[1, 2, 3, 4],
             command=lambda x: self.load_write_settings(1),
         )
         menu_algo.pack(anchor=tk.CENTER, expand=True)
@@ -372,7 +372,7 @@ class Window:
         Args:
             action (int): 0 to load the settings, 1 to write the settings.
         """
-        texts = {0: "Exact match", 1: "Ricerca match perfetto Titolo-Artista-Album. Se non trova nelle prime 20 canzoni, ricerca match Titolo-Artista.\n Come ultima scelta, usa la prima canzone e lo riporta nel file output canzoniNO-MATCH.csv", 2: "Fuzzy match with videos", 3: "Normalized Metadata Matching Algorithm"}
+        texts = {0: "Exact match", 1: "Ricerca match perfetto Titolo-Artista-Album. Se non trova nelle prime 20 canzoni, ricerca match Titolo-Artista.\n Come ultima scelta, usa la prima canzone e lo riporta nel file output canzoniNO-MATCH.csv", 2: "Fuzzy match with videos", 3: "Normalized Metadata Matching Algorithm", 4: "Scored Matching: il risultato con il punteggio più alto,\n se non è abbastanza sicuro lo riporta nel file output canzoniNO-MATCH.csv"}
 
         exist = True
         if action == 0:
@@ -395,7 +395,7 @@ class Window:
                 }
                 json.dump(settings, f)
 
-        self.algo_label.config(text=f"Algorithm (USARE 1 o 3):\n {texts[self.var_algo.get()]}")
+        self.algo_label.config(text=f"Algorithm (USARE 1, 3 o 4):\n {texts[self.var_algo.get()]}")
         self.root.update()
 
     def on_closing(self):
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+"""
+Counters and latency histograms of a transfer run, exported while it runs.
+
+The metrics tell where the time of a slow run goes: waiting for YTMusic
+(request latency), matching search results (CPU), or sleeping in the rate
+limiter after YTMusic started refusing requests.  `MetricsExporter` writes a
+snapshot every few seconds, either in the Prometheus text format (for the
+node_exporter textfile collector) or as JSON.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+#  Da 0.5ms a 60s, circa 2.5x tra un limite e il successivo
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_EXPORT_INTERVAL = 10.0
+
+FORMATS = ("prometheus", "json")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """A value that only goes up, e.g. `requests.inc(method="search")`."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """The value for `labels`, or the sum over all labels if none are given."""
+        with self._lock:
+            if labels:
+                return self._values.get(_labels(labels), 0.0)
+            return sum(self._values.values())
+
+    def _samples(self) -> List[Tuple[Labels, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def to_prometheus(self) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in self._samples()]
+
+    def to_json(self) -> List[dict]:
+        return [{"labels": dict(labels), "value": value} for labels, value in self._samples()]
+
+
+class Gauge(Counter):
+    """A value that can also go down, e.g. the current rate limit."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+
+class Histogram:
+    """Distribution of durations in seconds, e.g. `with request_seconds.time(method="search"): ...`."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # Per etichette: conteggi per bucket (l'ultimo è +Inf), somma
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            return sum(sum(counts) for key, (counts, _) in self._values.items() if not labels or key == _labels(labels))
+
+    def sum(self, **labels) -> float:
+        with self._lock:
+            return sum(total[0] for key, (_, total) in self._values.items() if not labels or key == _labels(labels))
+
+    def _samples(self) -> List[Tuple[Labels, List[int], float]]:
+        with self._lock:
+            return [(labels, list(counts), total[0]) for labels, (counts, total) in sorted(self._values.items())]
+
+    def _quantile(self, counts: List[int], q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the `q` quantile (None if it is in +Inf)."""
+        rank = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def to_prometheus(self) -> List[str]:
+        lines = []
+        for labels, counts, total in self._samples():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+    def to_json(self) -> List[dict]:
+        return [
+            {
+                "labels": dict(labels),
+                "count": sum(counts),
+                "sum": total,
+                "p50": self._quantile(counts, 0.5),
+                "p90": self._quantile(counts, 0.9),
+                "p99": self._quantile(counts, 0.99),
+                "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], counts)),
+            }
+            for labels, counts, total in self._samples()
+        ]
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """The metrics of a run, by name."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.to_prometheus())
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        now = time.time()
+        return json.dumps(
+            {
+                "timestamp": now,
+                "elapsed_seconds": now - self.started,
+                "metrics": {
+                    metric.name: {"type": metric.type, "help": metric.help, "values": metric.to_json()}
+                    for metric in metrics
+                },
+            },
+            indent=2,
+        )
+
+    def write(self, path: str, format: str = "prometheus") -> None:
+        """Write a snapshot to `path`, atomically so readers never see half a file."""
+        if format not in FORMATS:
+            raise ValueError(f"Unknown metrics format {format}, use one of {', '.join(FORMATS)}")
+        text = self.to_prometheus() if format == "prometheus" else self.to_json()
+        partial = f"{path}.partial"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(partial, path)
+
+
+class MetricsExporter:
+    """Write a snapshot of `registry` to `path` every `interval` seconds, from a daemon thread.
+
+    `stop()` writes a last snapshot.
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        path: str,
+        format: str = "prometheus",
+        interval: float = DEFAULT_EXPORT_INTERVAL,
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown metrics format {format}, use one of {', '.join(FORMATS)}")
+        self.registry = registry
+        self.path = path
+        self.format = format
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def _write(self) -> None:
+        try:
+            self.registry.write(self.path, self.format)
+        except OSError as e:
+            print(f"ERROR: Unable to write the metrics to {self.path}: {e}")
+
+    def stop(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self._write()
@@ -11,75 +11,104 @@ Features:
 - Metadata cleaning (removing version indicators, features, etc.)
 - Smart text comparison with multiple matching strategies
 - Track matching based on title, album, and artist information
+- Pre-normalized tracks (`NormalizedTrack`), so a track is cleaned once however many
+  candidates it is compared with
+- Scored matching: every candidate gets a confidence score and reason codes, and the
+  best one is accepted if it clears a threshold
 """
 
 import re
-
-
-def transliterate_text(text: str) -> str:
+import threading
+import unicodedata
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import List, Optional, Tuple
+
+# Character mapping table for common accents and special characters, built once for str.translate
+_TRANSLITERATION = str.maketrans({
+    # Vowels with diacritics
+    **{c: 'a' for c in 'áàâäãå'}, **{c: 'A' for c in 'ÁÀÂÄÃÅ'},
+    **{c: 'e' for c in 'éèêë'}, **{c: 'E' for c in 'ÉÈÊË'},
+    **{c: 'i' for c in 'íìîï'}, **{c: 'I' for c in 'ÍÌÎÏ'},
+    **{c: 'o' for c in 'óòôöõø'}, **{c: 'O' for c in 'ÓÒÔÖÕØ'},
+    **{c: 'u' for c in 'úùûü'}, **{c: 'U' for c in 'ÚÙÛÜ'},
+    **{c: 'y' for c in 'ýÿ'}, **{c: 'Y' for c in 'ÝŸ'},
+    # Special characters
+    'æ': 'ae', 'Æ': 'AE', 'œ': 'oe', 'Œ': 'OE',
+    'ñ': 'n', 'Ñ': 'N', 'ç': 'c', 'Ç': 'C',
+    'ß': 'ss', 'þ': 'th', 'Þ': 'TH',
+})
+
+# Cleaning patterns, compiled once.  Each list is applied in order, every match removed.
+# Patterns are merged into one alternation only where a single pass provably gives the
+# same result as the separate passes (see benchmarks/bench_normalization.py).
+_CLEANING_PATTERNS = {
+    "track": [
+        # Remove featuring artists sections
+        re.compile(r"[\[(\{](?:feat|featuring|ft|with|prod|prod\.? by|produced by)\.? .*?[\]\)\}]"),
+        # Remove common track version identifiers (but not remix, as that would likely be a different track)
+        re.compile(r"\b(?:deluxe|instrumental|bonus\strack|radio|video|edit|version|edition|single|mono|original|mix|lp|extended|remaster(?:ed)?|re-?edit)(?:\b|$)"),
+        # Remove anything after featuring artists indicators
+        re.compile(r"\b(?:ft\.?|feat\.?|featuring|with|prod\.?(?:\s?by)?)\b.*$"),
+    ],
+    "album": [
+        # Remove album edition/version indicators.  Every word is matched whole, so removing one
+        # can't create or hide a match of another: the two original passes are merged.
+        re.compile(r"\b(?:the|super|deluxe|special|anniversary|\d{2}th|extended|version|expanded|edition|re-?master(?:ed)?|ep|lp|single|instrumentals?)(?:\b|$)"),
+    ],
+    "artist": [
+        # Remove the "the " prefix and all spaces for artist comparison
+        re.compile(r"\bthe\s+|\s+"),
+    ],
+}
+
+# General cleaning: years, and unwanted characters (none of which is a digit, so the two don't interact)
+_GENERAL_PATTERN = re.compile(r"(?<!\d)(?:17|18|19|20)\d{2}(?!\d)|[.,\"`´’':;+*!\/\-\(\)\[\]\{\}]")
+
+
+def transliterate_text(text: str, fold_unicode: bool = False) -> str:
     """
     Convert non-ASCII characters to their ASCII equivalents.
+
+    With `fold_unicode`, characters the table doesn't know are also decomposed
+    (Unicode NFKD) and stripped of their combining marks, e.g. "ő" -> "o".
     """
-    # Character mapping dictionary for common accents and special characters
-    replacements = {
-        # Vowels with diacritics
-        **{c: 'a' for c in 'áàâäãå'}, **{c: 'A' for c in 'ÁÀÂÄÃÅ'}, 
-        **{c: 'e' for c in 'éèêë'}, **{c: 'E' for c in 'ÉÈÊË'},
-        **{c: 'i' for c in 'íìîï'}, **{c: 'I' for c in 'ÍÌÎÏ'},
-        **{c: 'o' for c in 'óòôöõø'}, **{c: 'O' for c in 'ÓÒÔÖÕØ'},
-        **{c: 'u' for c in 'úùûü'}, **{c: 'U' for c in 'ÚÙÛÜ'},
-        **{c: 'y' for c in 'ýÿ'}, **{c: 'Y' for c in 'ÝŸ'},
-        # Special characters
-        'æ': 'ae', 'Æ': 'AE', 'œ': 'oe', 'Œ': 'OE',
-        'ñ': 'n', 'Ñ': 'N', 'ç': 'c', 'Ç': 'C',
-        'ß': 'ss', 'þ': 'th', 'Þ': 'TH',
-    }
-    
-    return ''.join(replacements.get(char, char) for char in text)
+    if text.isascii():
+        return text  # Nothing to transliterate, skip the (per character) table lookups
+    text = text.translate(_TRANSLITERATION)
+    if fold_unicode and not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return text
 
 
-def clean_metadata(metadata: str, metadata_type: str = "track") -> str:
+def clean_metadata(metadata: str, metadata_type: str = "track", fold_unicode: bool = False) -> str:
     """
     Standardize and clean music metadata by removing variations and formatting.
     
     Args:
         metadata: Raw metadata text to clean
         metadata_type: Type of metadata ("track", "album", or "artist")
+        fold_unicode: Also fold accents the transliteration table doesn't cover (NFKD)
         
     Returns:
         Cleaned and standardized metadata string
     """
     # Convert to lowercase and transliterate international characters
-    metadata = transliterate_text(metadata).lower()
+    metadata = transliterate_text(metadata, fold_unicode).lower()
     
     # Replace ampersands with "and" for consistency
     metadata = metadata.replace("&", "and")
-    
-    if metadata_type == "track":
-        # Remove featuring artists sections
-        metadata = re.sub(r"[\[(\{](?:feat|featuring|ft|with|prod|prod\.? by|produced by)\.? .*?[\]\)\}]", "", metadata)
-        # Remove common track version identifiers (but not remix, as that would likely be a different track)
-        metadata = re.sub(r"\b(?:deluxe|instrumental|bonus\strack|radio|video|edit|version|edition|single|mono|original|mix|lp|extended|remaster(?:ed)?|re-?edit)(?:\b|$)", "", metadata)
-        # Remove anything after featuring artists indicators
-        metadata = re.sub(r"\b(?:ft\.?|feat\.?|featuring|with|prod\.?(?:\s?by)?)\b.*$", "", metadata)
-                
-    elif metadata_type == "album":
-        # Remove album edition/version indicators
-        metadata = re.sub(r"\b(?:the|super|deluxe|special|anniversary|\d{2}th|extended|version|expanded|edition|re-?master(?:ed)?)(?:\b|$)", "", metadata)
-        metadata = re.sub(r"\b(?:ep|lp|single|instrumentals?)(?:\b|$)", "", metadata)
-
-    elif metadata_type == "artist":
-        # Remove spaces for artist comparison
-        metadata = re.sub(r"\bthe\s+", "", metadata)  # Remove "the " prefix
-        metadata = re.sub(r"\s+", "", metadata)       # Remove all spaces
-        
-    # General cleaning patterns
-    metadata = re.sub(r"(?<!\d)(?:17|18|19|20)\d{2}(?!\d)", "", metadata)  # Remove years
-    metadata = re.sub(r"[.,\"`´’':;+*!\/\-\(\)\[\]\{\}]", "", metadata)  # Remove unwanted characters
 
-    metadata = re.sub(r"\s+", " ", metadata).strip()  # Normalize whitespace
+    if metadata_type == "artist" and "the" not in metadata:
+        metadata = "".join(metadata.split())  # Same as the artist pattern when there's no "the"
+    else:
+        for pattern in _CLEANING_PATTERNS.get(metadata_type, ()):
+            metadata = pattern.sub("", metadata)
+
+    metadata = _GENERAL_PATTERN.sub("", metadata)
 
-    return metadata.strip()
+    # Normalize whitespace (str.split and \s agree on what whitespace is)
+    return " ".join(metadata.split())
 
 
 def clean_track_name(track_name: str) -> str:
@@ -124,6 +153,75 @@ def levenshtein_distance(text1: str, text2: str) -> int:
         prev = curr
     return prev[-1]
 
+_levenshtein_buffers = threading.local()
+
+
+def bounded_levenshtein_distance(text1: str, text2: str, max_distance: int) -> int:
+    """
+    Calculate the edit distance between two strings, up to `max_distance`.
+
+    Same as `levenshtein_distance` when the distance is at most `max_distance`,
+    otherwise returns `max_distance + 1`.  Only the diagonal band of width
+    2 * max_distance + 1 is computed, and the computation stops as soon as a
+    whole row exceeds `max_distance`.  The row buffers are reused across calls
+    (one pair per thread).
+
+    Returns:
+        The number of edits needed to transform text1 into text2, capped at max_distance + 1
+    """
+    if len(text1) < len(text2):
+        text1, text2 = text2, text1
+    too_far = max_distance + 1
+    if len(text1) - len(text2) > max_distance:
+        return too_far
+
+    # Common prefix and suffix don't change the distance
+    start = 0
+    end1, end2 = len(text1), len(text2)
+    while start < end2 and text1[start] == text2[start]:
+        start += 1
+    while end2 > start and text1[end1 - 1] == text2[end2 - 1]:
+        end1 -= 1
+        end2 -= 1
+    text1 = text1[start:end1]
+    text2 = text2[start:end2]
+    n, m = len(text1), len(text2)
+    if m == 0:
+        return n if n <= max_distance else too_far
+
+    prev = getattr(_levenshtein_buffers, "prev", None)
+    if prev is None or len(prev) < m + 2:
+        prev = _levenshtein_buffers.prev = [0] * (m + 2)
+        _levenshtein_buffers.curr = [0] * (m + 2)
+    curr = _levenshtein_buffers.curr
+
+    for j in range(m + 1):
+        prev[j] = j if j <= max_distance else too_far
+    for i in range(1, n + 1):
+        lo = max(1, i - max_distance)
+        hi = min(m, i + max_distance)
+        # Cells left of the band are out of reach
+        curr[lo - 1] = min(i, too_far) if lo == 1 else too_far
+        row_min = curr[lo - 1]
+        ca = text1[i - 1]
+        for j in range(lo, hi + 1):
+            value = prev[j - 1] + (ca != text2[j - 1])
+            if prev[j] + 1 < value:
+                value = prev[j] + 1
+            if curr[j - 1] + 1 < value:
+                value = curr[j - 1] + 1
+            curr[j] = value
+            if value < row_min:
+                row_min = value
+        if hi < m:
+            curr[hi + 1] = too_far  # Read by the next row as the cell above its band
+        if row_min > max_distance:
+            return too_far
+        prev, curr = curr, prev
+
+    return min(prev[m], too_far)
+
+
 def text_similarity(text1: str, text2: str) -> bool:
     """
     Determine if two text strings should be considered similar/matching.
@@ -137,9 +235,13 @@ def text_similarity(text1: str, text2: str) -> bool:
     Returns:
         True if texts are considered similar, False otherwise
     """
-    text1 = text1.strip().lower()
-    text2 = text2.strip().lower()
-        
+    return _cleaned_text_similarity(text1.strip().lower(), text2.strip().lower())
+
+
+def _cleaned_text_similarity(text1: str, text2: str) -> bool:
+    """
+    `text_similarity` of texts already stripped and lowercased, like the output of `clean_metadata`.
+    """
     # Length disparity check - different lengths suggest different content
     if len(text1) > 1.7 * len(text2) or len(text2) > 1.7 * len(text1):
         return False
@@ -156,7 +258,7 @@ def text_similarity(text1: str, text2: str) -> bool:
             return True
     
     # Fuzzy matching with Levenshtein distance (checking for up to 2 spelling mistakes)
-    if levenshtein_distance(text1, text2) <= 2:
+    if bounded_levenshtein_distance(text1, text2, 2) <= 2:
         return True
     
     # Exact match after removing spaces
@@ -224,6 +326,116 @@ def normalized_artist_name_match(artist1_name: str, artist2_name: str) -> bool:
     return text_similarity(cleaned_artist1, cleaned_artist2)
 
 
+# Youtube sometimes joins 2 artist names together in the artist field
+_ARTIST_SEPARATORS = re.compile(r'[&,\/]|and|with')
+
+# Number of distinct tracks whose normalized forms are kept
+NORMALIZED_TRACK_CACHE_SIZE = 8192
+
+
+@dataclass(frozen=True)
+class NormalizedTrack:
+    """
+    A track's metadata along with its normalized forms.
+
+    Each normalized form is computed the first time it is needed and then kept,
+    and `normalize_track` hands out the same instance for the same metadata, so
+    a track is cleaned once however many candidates it is compared with.
+    """
+    title: str
+    album: Optional[str]
+    artist: str
+
+    @cached_property
+    def clean_title(self) -> str:
+        return clean_track_name(self.title)
+
+    @cached_property
+    def clean_title_after_colon(self) -> str:
+        """Cleaned title without an "Artist:" prefix, if there's one."""
+        parts = self.title.split(":")
+        return clean_track_name(parts[1]) if len(parts) == 2 else self.clean_title
+
+    @cached_property
+    def clean_album(self) -> str:
+        return clean_album_name(self.album)
+
+    @cached_property
+    def clean_artist(self) -> str:
+        return clean_artist_name(self.artist)
+
+    @cached_property
+    def lower_artist(self) -> str:
+        return self.artist.strip().lower()
+
+    @cached_property
+    def artist_parts(self) -> tuple:
+        """The artist split where YouTube joins several artist names."""
+        return tuple(name_part.strip() for name_part in _ARTIST_SEPARATORS.split(self.artist.lower()))
+
+    @cached_property
+    def is_instrumental(self) -> bool:
+        return "instrumental" in f"{self.title} {self.album} {self.artist}".lower()
+
+
+@lru_cache(maxsize=NORMALIZED_TRACK_CACHE_SIZE)
+def normalize_track(title: str, album: Optional[str], artist: str) -> NormalizedTrack:
+    """
+    The `NormalizedTrack` of a track, shared by every caller asking for the same metadata.
+    """
+    return NormalizedTrack(title, album, artist)
+
+
+def normalize_youtube_track(youtube_track: dict) -> NormalizedTrack:
+    """
+    The `NormalizedTrack` of a YouTube Music search result.
+    """
+    youtube_album = youtube_track["album"]["name"] if isinstance(youtube_track["album"], dict) else youtube_track["album"]
+    return normalize_track(youtube_track["title"], youtube_album, youtube_track["artists"][0]["name"])
+
+
+def normalized_tracks_match(spotify_track: NormalizedTrack, youtube_track: NormalizedTrack) -> bool:
+    """
+    Determine if a Spotify track matches a YouTube Music track, both already normalized.
+
+    Same decisions as `normalized_track_match`.
+
+    Returns:
+        True if the tracks likely match, False otherwise
+    """
+    # Exact match for track and artist is a strong indicator (even if album is different)
+    if spotify_track.title == youtube_track.title and spotify_track.artist == youtube_track.artist:
+        return True
+
+    # Check for instrumental/non-instrumental mismatch (reject these)
+    if spotify_track.is_instrumental != youtube_track.is_instrumental:
+        return False
+
+    # Prioritize track name + artist match (see normalized_track_name_match and normalized_artist_name_match)
+    # The cleaned forms are already stripped and lowercased
+    if not _cleaned_text_similarity(spotify_track.clean_title, youtube_track.clean_title):
+        # Without an "Artist:" prefix on either side the second comparison would be the same one
+        if (
+            spotify_track.clean_title_after_colon is spotify_track.clean_title
+            and youtube_track.clean_title_after_colon is youtube_track.clean_title
+        ) or not _cleaned_text_similarity(spotify_track.clean_title_after_colon, youtube_track.clean_title_after_colon):
+            return False
+    artists_match = (
+        spotify_track.lower_artist in youtube_track.artist_parts
+        or youtube_track.lower_artist in spotify_track.artist_parts
+        or _cleaned_text_similarity(spotify_track.clean_artist, youtube_track.clean_artist)
+    )
+    if not artists_match:
+        return False
+
+    # Check album match but allow some flexibility if track and artist match well
+    if _cleaned_text_similarity(spotify_track.clean_album, youtube_track.clean_album):
+        return True
+
+    # For exact track name matches, we can be more lenient with album mismatches
+    return spotify_track.clean_title == youtube_track.clean_title
+
+
 def normalized_track_match(spotify_track_name: str, spotify_album: str, spotify_artist: str, youtube_track: dict) -> bool:
     """
     Determine if a Spotify track matches a YouTube Music track.
@@ -234,32 +446,115 @@ def normalized_track_match(spotify_track_name: str, spotify_album: str, spotify_
     Returns:
         True if the tracks likely match, False otherwise
     """
-    youtube_track_name = youtube_track["title"]
-    youtube_album = youtube_track["album"]["name"] if isinstance(youtube_track["album"], dict) else youtube_track["album"]
-    youtube_artist = youtube_track["artists"][0]["name"]
+    return normalized_tracks_match(
+        normalize_track(spotify_track_name, spotify_album, spotify_artist),
+        normalize_youtube_track(youtube_track),
+    )
 
-    # Exact match for track and artist is a strong indicator (even if album is different)
-    if spotify_track_name == youtube_track_name and spotify_artist == youtube_artist:
-        return True
 
-    # Check for instrumental/non-instrumental mismatch (reject these)
-    spotify_is_instrumental = "instrumental" in f"{spotify_track_name} {spotify_album} {spotify_artist}".lower()
-    youtube_is_instrumental = "instrumental" in f"{youtube_track_name} {youtube_album} {youtube_artist}".lower()
-    if spotify_is_instrumental != youtube_is_instrumental:
-        return False
-    
-    # Prioritize track name + artist match
-    if normalized_track_name_match(spotify_track_name, youtube_track_name) and \
-       normalized_artist_name_match(spotify_artist, youtube_artist):
-        
-        # Check album match but allow some flexibility if track and artist match well
-        if normalized_album_name_match(spotify_album, youtube_album):
-            return True
-        
-        # For exact track name matches, we can be more lenient with album mismatches
-        cleaned_spotify_track = clean_track_name(spotify_track_name)
-        cleaned_youtube_track = clean_track_name(youtube_track_name)
-        if cleaned_spotify_track == cleaned_youtube_track:
-            return True
-    
-    return False
\ No newline at end of file
+# Scored matching.  Points for each field, a candidate matching on everything and
+# first in the results scores 1.0
+_TITLE_POINTS = {"title_exact": 0.4, "title_clean": 0.35, "title_similar": 0.25}
+_ARTIST_POINTS = {"artist_exact": 0.3, "artist_joined": 0.25, "artist_similar": 0.2}
+_ALBUM_POINTS = {"album_exact": 0.2, "album_similar": 0.15}
+_POSITION_POINTS = 0.1
+_INSTRUMENTAL_PENALTY = 0.5
+
+# Minimum score of a candidate accepted without further searching
+DEFAULT_ACCEPT_THRESHOLD = 0.7
+
+
+@dataclass(frozen=True)
+class CandidateScore:
+    """
+    The score of a search result against a Spotify track.
+
+    `reasons` are the codes of what matched or not, e.g. ("title_clean", "artist_exact", "album_mismatch").
+    """
+    song: dict
+    position: int
+    score: float
+    reasons: Tuple[str, ...]
+
+
+def score_candidate(spotify_track: NormalizedTrack, youtube_track: NormalizedTrack, position: int = 0, count: int = 1) -> Tuple[float, Tuple[str, ...]]:
+    """
+    Score a YouTube Music track against a Spotify track, both already normalized.
+
+    Args:
+        spotify_track: The track looked for
+        youtube_track: The candidate
+        position: The candidate's position in the search results, earlier results get a few more points
+        count: The number of search results
+
+    Returns:
+        The score (1.0 for a perfect match in first position) and the reason codes
+    """
+    reasons = []
+
+    if spotify_track.title == youtube_track.title:
+        reasons.append("title_exact")
+    elif spotify_track.clean_title == youtube_track.clean_title:
+        reasons.append("title_clean")
+    elif _cleaned_text_similarity(spotify_track.clean_title, youtube_track.clean_title) or \
+         _cleaned_text_similarity(spotify_track.clean_title_after_colon, youtube_track.clean_title_after_colon):
+        reasons.append("title_similar")
+    else:
+        reasons.append("title_mismatch")
+
+    if spotify_track.artist == youtube_track.artist:
+        reasons.append("artist_exact")
+    elif spotify_track.lower_artist in youtube_track.artist_parts or youtube_track.lower_artist in spotify_track.artist_parts:
+        reasons.append("artist_joined")
+    elif _cleaned_text_similarity(spotify_track.clean_artist, youtube_track.clean_artist):
+        reasons.append("artist_similar")
+    else:
+        reasons.append("artist_mismatch")
+
+    if spotify_track.album is None or youtube_track.album is None:
+        reasons.append("album_missing")
+    elif spotify_track.album == youtube_track.album:
+        reasons.append("album_exact")
+    elif _cleaned_text_similarity(spotify_track.clean_album, youtube_track.clean_album):
+        reasons.append("album_similar")
+    else:
+        reasons.append("album_mismatch")
+
+    score = sum(_TITLE_POINTS.get(r, 0) + _ARTIST_POINTS.get(r, 0) + _ALBUM_POINTS.get(r, 0) for r in reasons)
+    score += _POSITION_POINTS * (1 - position / max(count, 1))
+
+    if spotify_track.is_instrumental != youtube_track.is_instrumental:
+        reasons.append("instrumental_mismatch")
+        score -= _INSTRUMENTAL_PENALTY
+
+    return round(score, 3), tuple(reasons)
+
+
+def rank_candidates(spotify_track: NormalizedTrack, youtube_tracks: List[dict]) -> List[CandidateScore]:
+    """
+    Score every search result against a Spotify track, in a single pass.
+
+    Returns:
+        The candidates, best first (ties keep the search order)
+    """
+    scores = []
+    for position, song in enumerate(youtube_tracks):
+        try:
+            score, reasons = score_candidate(spotify_track, normalize_youtube_track(song), position, len(youtube_tracks))
+        except (KeyError, IndexError, TypeError):
+            score, reasons = 0.0, ("malformed",)  # e.g. a video without artists
+        scores.append(CandidateScore(song, position, score, reasons))
+    return sorted(scores, key=lambda candidate: (-candidate.score, candidate.position))
+
+
+def best_candidate(spotify_track: NormalizedTrack, youtube_tracks: List[dict], threshold: float = DEFAULT_ACCEPT_THRESHOLD) -> Optional[CandidateScore]:
+    """
+    The best search result for a Spotify track, if it scores at least `threshold`.
+
+    Returns:
+        The best candidate, or None if no candidate is good enough
+    """
+    ranked = rank_candidates(spotify_track, youtube_tracks)
+    if ranked and ranked[0].score >= threshold:
+        return ranked[0]
+    return None
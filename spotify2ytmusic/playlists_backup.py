@@ -0,0 +1,712 @@
+#!/usr/bin/env python3
+
+"""
+Shared handle on a Spotify backup (`playlists.json`).
+
+The backup is opened once per process: `open_backup` hands out the same handle
+for repeated opens of a file whose modification time and size did not change,
+and the handle keeps an id -> playlist index so finding a playlist doesn't mean
+walking the whole list again.
+
+Three readers implement the `SpotifyBackup` interface:
+
+- `StreamingBackup` scans the file once, keeping only the playlist headers and
+  the byte offsets of their track lists, and decodes tracks one at a time while
+  they are iterated.  Memory stays flat however big the library is.  A backup
+  cut short (e.g. an interrupted `spotify_backup`) is read up to the cut.
+- `PlaylistsBackup` is the whole file parsed with `json.load`, used for
+  encodings the streaming reader can't scan byte-wise (e.g. UTF-16).
+- `SqliteBackup` reads the compact format written by `convert_backup`: only the
+  fields the backend uses, in an SQLite database indexed by playlist id, name
+  and track URI.  `open_backup` recognizes it by its header, whatever the file
+  is called.
+"""
+
+import codecs
+import json
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+LIKED_SONGS = "Liked Songs"
+
+#  Dimensione dei blocchi letti dal file dallo scanner
+CHUNK_SIZE = 1 << 20
+
+DEFAULT_SQLITE_FILE = "playlists.sqlite3"
+SQLITE_FORMAT_VERSION = 1
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+#  Campi della playlist conservati nel formato compatto
+_SQLITE_HEADER_FIELDS = ("id", "name", "description", "snapshot_id", "uri")
+
+
+class SpotifyBackup(ABC):
+    """Interface of the backup readers.  `backend` only goes through these methods.
+
+    Playlists are identified by their id, None being "Liked Songs".
+    """
+
+    def __init__(self, filename: Optional[str] = None):
+        self.filename = filename
+        self._headers: List[dict] = []
+        self._by_id: Dict[str, dict] = {}
+        self._liked: Optional[dict] = None
+
+    def _add_playlist(self, header: dict) -> Optional[str]:
+        """Index a playlist.  Returns its key (the id, None for "Liked Songs"), or "" if it can't be looked up."""
+        self._headers.append(header)
+        if header.get("id") is not None:
+            key = str(header["id"])
+            if key in self._by_id:
+                return ""  # Vince la prima playlist con lo stesso id
+            self._by_id[key] = header
+            return key
+        if self._liked is None and str(header.get("name")) == LIKED_SONGS:
+            self._liked = header
+            return None
+        return ""
+
+    def iter_playlists(self) -> Iterator[dict]:
+        """The playlists, without their tracks for readers that don't keep them in memory."""
+        return iter(self._headers)
+
+    def find_playlist(self, playlist_id: Optional[str]) -> Optional[dict]:
+        """The playlist with `playlist_id`, or "Liked Songs" for None.  None if there is no such playlist."""
+        if playlist_id is None:
+            return self._liked
+        return self._by_id.get(playlist_id)
+
+    def get_playlist(self, playlist_id: Optional[str]) -> dict:
+        """Like `find_playlist`, but raises ValueError if the playlist is not in the backup."""
+        playlist = self.find_playlist(playlist_id)
+        if playlist is None:
+            print(f"Could not find Spotify playlist {playlist_id}")
+            raise ValueError(f"Could not find Spotify playlist {playlist_id}")
+        return playlist
+
+    def find_playlist_by_name(self, name: str) -> Optional[dict]:
+        """The first playlist called `name`, None if there is none."""
+        for playlist in self._headers:
+            if playlist.get("name") == name:
+                return playlist
+        return None
+
+    def find_track(self, uri: str) -> Optional[dict]:
+        """The first track entry with the Spotify `uri`, in any playlist.  None if there is none."""
+        for playlist in self._headers:
+            key = playlist.get("id")
+            if key is None and playlist is not self._liked:
+                continue
+            for src_track in self.iter_tracks(key):
+                if src_track.get("track") and src_track["track"].get("uri") == uri:
+                    return src_track
+        return None
+
+    @abstractmethod
+    def track_count(self, playlist_id: Optional[str]) -> int:
+        """Number of track entries of a playlist (0 if there is no such playlist)."""
+
+    @abstractmethod
+    def iter_tracks(self, playlist_id: Optional[str], reverse: bool = False) -> Iterator[dict]:
+        """The track entries of a playlist, as in the Spotify API (`{"track": {...}, ...}`)."""
+
+    @abstractmethod
+    def iter_albums(self) -> Iterator[dict]:
+        """The liked albums, as in the Spotify API (`{"album": {...}, ...}`)."""
+
+    @abstractmethod
+    def album_track_count(self) -> int:
+        """Number of tracks across the liked albums."""
+
+    def to_dict(self) -> dict:
+        """The whole backup in memory, in the `playlists.json` layout.
+
+        Playlists that can't be looked up (an id already seen, no id) get no tracks.
+        """
+        playlists = []
+        for header in self._headers:
+            if header is self._liked:
+                tracks = list(self.iter_tracks(None))
+            elif header.get("id") is not None and self._by_id.get(str(header["id"])) is header:
+                tracks = list(self.iter_tracks(str(header["id"])))
+            else:
+                tracks = []
+            playlists.append(dict(header, tracks=tracks))
+        return {"playlists": playlists, "albums": list(self.iter_albums())}
+
+
+class PlaylistsBackup(SpotifyBackup):
+    """A Spotify backup parsed in memory.
+
+    Args:
+        `data` (dict): The backup, as written by `spotify_backup.write_to_file`.
+        `filename` (Optional[str]): Where it was read from, for messages.
+    """
+
+    def __init__(self, data: dict, filename: Optional[str] = None):
+        super().__init__(filename)
+        self.data = data
+        for playlist in self.playlists:
+            self._add_playlist(playlist)
+
+    @property
+    def playlists(self) -> List[dict]:
+        return self.data.get("playlists", [])
+
+    @property
+    def albums(self) -> List[dict]:
+        return self.data.get("albums", [])
+
+    def _tracks(self, playlist_id: Optional[str]) -> list:
+        playlist = self.find_playlist(playlist_id)
+        if playlist is None or not isinstance(playlist.get("tracks"), list):
+            return []
+        return playlist["tracks"]
+
+    def track_count(self, playlist_id: Optional[str]) -> int:
+        return len(self._tracks(playlist_id))
+
+    def iter_tracks(self, playlist_id: Optional[str], reverse: bool = False) -> Iterator[dict]:
+        tracks = self.get_playlist(playlist_id).get("tracks")
+        if not isinstance(tracks, list):
+            return iter(())
+        return reversed(tracks) if reverse else iter(tracks)
+
+    def iter_albums(self) -> Iterator[dict]:
+        return iter(self.albums)
+
+    def album_track_count(self) -> int:
+        return sum(len(x["album"]["tracks"]["items"]) for x in self.albums)
+
+    def to_dict(self) -> dict:
+        return self.data
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _Scanner:
+    """Incremental JSON scanner over a binary file, read in `CHUNK_SIZE` blocks.
+
+    The bytes are decoded as latin-1, which maps every byte to one character:
+    positions in the text are byte offsets in the file, and the JSON structure
+    (all ASCII) is untouched for any ASCII-compatible encoding.  Values are
+    skipped with the C JSON scanner and only re-decoded with the real encoding
+    when they are asked for.  Running off the end of the file raises EOFError, a
+    malformed value ValueError.
+    """
+
+    def __init__(self, f, offset: int = 0):
+        f.seek(offset)
+        self._f = f
+        self._text = ""
+        self._base = offset  # Posizione nel file di self._text[0]
+        self._pos = 0
+        self._eof = False
+
+    def tell(self) -> int:
+        return self._base + self._pos
+
+    def _more(self) -> bool:
+        if self._eof:
+            return False
+        data = self._f.read(CHUNK_SIZE)
+        if not data:
+            self._eof = True
+            return False
+        #  Quello che precede la posizione corrente non serve più
+        self._text = self._text[self._pos :] + data.decode("latin-1")
+        self._base += self._pos
+        self._pos = 0
+        return True
+
+    def skip_bom(self) -> None:
+        if self.peek() == "\xef" and self._text.startswith("\xef\xbb\xbf", self._pos):
+            self._pos += 3
+
+    def peek(self) -> str:
+        """The next character that is not whitespace, "" at the end of the file."""
+        while True:
+            self._pos = _WHITESPACE.match(self._text, self._pos).end()
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._more():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            if found == "":
+                raise EOFError(f"Expected {char!r} at byte {self.tell()}, found end of file")
+            raise ValueError(f"Expected {char!r} at byte {self.tell()}, found {found!r}")
+        self._pos += 1
+
+    def skip(self) -> Tuple[int, int]:
+        """Skip the next value.  Returns its (start, end) byte offsets."""
+        self.peek()
+        while True:
+            try:
+                _, end = _DECODER.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError as err:
+                #  Un valore spezzato a fine blocco si riconosce dalla posizione dell'errore: alla fine del
+                #  testo, all'inizio di un letterale o di un escape tagliati ("fals", "\u00") o di una
+                #  stringa senza chiusura: si legge il blocco successivo e si riprova.  Altrove il valore è
+                #  malformato, inutile leggere il resto del file
+                if err.pos < len(self._text) - 5 and not err.msg.startswith("Unterminated string"):
+                    raise ValueError(f"Malformed JSON value at byte {self._base + err.pos}: {err.msg}") from None
+                if not self._more():
+                    raise EOFError(f"Value at byte {self.tell()} is cut short")
+                continue
+            #  Un numero a fine blocco potrebbe continuare nel blocco successivo
+            if end == len(self._text) and self._more():
+                continue
+            start = self.tell()
+            self._pos = end
+            return start, self.tell()
+
+    def value(self, encoding: str):
+        """Decode the next value."""
+        start, end = self.skip()
+        raw = self._text[start - self._base : end - self._base].encode("latin-1")
+        return json.loads(raw.decode(encoding))
+
+    def iter_array(self) -> Iterator[None]:
+        """Step through an array: the caller must consume one value per iteration."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self.expect(separator if separator in ",]" else ",")
+            if separator == "]":
+                return
+
+    def iter_object(self, encoding: str) -> Iterator[str]:
+        """Step through an object, yielding its keys: the caller must consume each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value(encoding)
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self.expect(separator if separator in ",}" else ",")
+            if separator == "}":
+                return
+
+
+def is_streamable(encoding: str) -> bool:
+    """Can a backup in `encoding` be scanned byte-wise by `StreamingBackup`?"""
+    name = codecs.lookup(encoding).name
+    return name in ("utf-8", "utf-8-sig", "ascii") or name.startswith(("iso8859", "cp125"))
+
+
+class StreamingBackup(SpotifyBackup):
+    """A Spotify backup read incrementally from disk.
+
+    Opening it scans the file once to index the playlists; their tracks are
+    only decoded, one by one, when iterated.
+
+    Args:
+        `filename` (str): The backup file.
+        `encoding` (str): Characters encoding, see `is_streamable`.
+    """
+
+    def __init__(self, filename: str, encoding: str = "utf-8"):
+        super().__init__(filename)
+        self.encoding = encoding
+        #  chiave playlist -> (posizione della lista tracce nel file, numero di tracce)
+        self._tracks: Dict[Optional[str], Tuple[Optional[int], int]] = {}
+        self._albums_offset: Optional[int] = None
+        self._album_track_count = 0
+        self.truncated = False
+        self._index()
+
+    def _index(self) -> None:
+        with open(self.filename, "rb") as f:
+            scanner = _Scanner(f)
+            scanner.skip_bom()
+            try:
+                for key in scanner.iter_object(self.encoding):
+                    if key == "playlists" and scanner.peek() == "[":
+                        for _ in scanner.iter_array():
+                            self._index_playlist(scanner)
+                    elif key == "albums" and scanner.peek() == "[":
+                        self._albums_offset = scanner.tell()
+                        for _ in scanner.iter_array():
+                            self._index_album(scanner)
+                    else:
+                        scanner.skip()
+            except EOFError:
+                self.truncated = True
+                print(
+                    f"WARNING: Spotify backup {self.filename} is truncated, reading it up to byte {scanner.tell()}"
+                )
+
+    def _index_playlist(self, scanner: _Scanner) -> None:
+        header: dict = {}
+        tracks_offset = None
+        count = 0
+        try:
+            for key in scanner.iter_object(self.encoding):
+                if key == "tracks" and scanner.peek() == "[":
+                    tracks_offset = scanner.tell()
+                    for _ in scanner.iter_array():
+                        scanner.skip()
+                        count += 1
+                else:
+                    header[key] = scanner.value(self.encoding)
+        except EOFError:
+            #  Una playlist troncata viene indicizzata con le tracce lette fino al taglio
+            if "name" in header:
+                self._add_indexed_playlist(header, tracks_offset, count)
+            raise
+        self._add_indexed_playlist(header, tracks_offset, count)
+
+    def _add_indexed_playlist(self, header: dict, tracks_offset: Optional[int], count: int) -> None:
+        key = self._add_playlist(header)
+        if key != "":
+            self._tracks[key] = (tracks_offset, count)
+
+    def _index_album(self, scanner: _Scanner) -> None:
+        album = scanner.value(self.encoding)
+        try:
+            self._album_track_count += len(album["album"]["tracks"]["items"])
+        except (KeyError, TypeError):
+            pass
+
+    def track_count(self, playlist_id: Optional[str]) -> int:
+        return self._tracks.get(playlist_id, (None, 0))[1]
+
+    def iter_tracks(self, playlist_id: Optional[str], reverse: bool = False) -> Iterator[dict]:
+        self.get_playlist(playlist_id)
+        offset = self._tracks.get(playlist_id, (None, 0))[0]
+        if offset is None:
+            return iter(())
+        if reverse:
+            return self._iter_reversed(offset)
+        return self._iter_values(offset)
+
+    def iter_albums(self) -> Iterator[dict]:
+        if self._albums_offset is None:
+            return iter(())
+        return self._iter_values(self._albums_offset)
+
+    def album_track_count(self) -> int:
+        return self._album_track_count
+
+    def _iter_values(self, offset: int) -> Iterator:
+        with open(self.filename, "rb") as f:
+            scanner = _Scanner(f, offset)
+            try:
+                for _ in scanner.iter_array():
+                    yield scanner.value(self.encoding)
+            except EOFError:
+                return
+
+    def _iter_reversed(self, offset: int) -> Iterator:
+        """Iterate an array backwards: one pass to collect where its elements are, then read them from the end."""
+        starts = array("q")
+        ends = array("q")
+        with open(self.filename, "rb") as f:
+            scanner = _Scanner(f, offset)
+            try:
+                for _ in scanner.iter_array():
+                    start, end = scanner.skip()
+                    starts.append(start)
+                    ends.append(end)
+            except EOFError:
+                pass
+
+            for i in range(len(starts) - 1, -1, -1):
+                f.seek(starts[i])
+                yield json.loads(f.read(ends[i] - starts[i]).decode(self.encoding))
+
+
+class SqliteBackup(SpotifyBackup):
+    """A Spotify backup in the compact SQLite format written by `convert_backup`.
+
+    Only the playlists are loaded when opening it; tracks are read with
+    indexed queries while they are iterated.  Track entries and albums are
+    rebuilt with just the fields the backend reads (name, uri, first artist,
+    album name), in the same shape as in `playlists.json`.
+
+    Args:
+        `filename` (str): The database file.
+    """
+
+    def __init__(self, filename: str):
+        super().__init__(filename)
+        #  Sola lettura; check_same_thread=False perché le query sono serializzate dal lock
+        self._db = sqlite3.connect(
+            f"file:{os.path.abspath(filename)}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._rows: Dict[Optional[str], Tuple[int, int]] = {}
+
+        version = self._query("SELECT value FROM meta WHERE key = 'version'")
+        if not version or int(version[0][0]) > SQLITE_FORMAT_VERSION:
+            raise ValueError(f"{filename} is not a supported Spotify backup database")
+
+        for row in self._query(
+            "SELECT pos, track_count, id, name, description, snapshot_id, uri FROM playlists ORDER BY pos"
+        ):
+            header = {
+                field: value
+                for field, value in zip(_SQLITE_HEADER_FIELDS, row[2:])
+                if value is not None or field == "name"
+            }
+            key = self._add_playlist(header)
+            if key != "":
+                self._rows[key] = (row[0], row[1])
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _iter_tracks(self, playlist: int, reverse: bool, page: int = 1000) -> Iterator[tuple]:
+        """Track rows of a playlist, fetched a page at a time so memory stays flat on huge playlists."""
+        if reverse:
+            sql = "SELECT pos, uri, name, artist, album FROM tracks WHERE playlist = ? AND pos < ? ORDER BY pos DESC LIMIT ?"
+            last = 1 << 62
+        else:
+            sql = "SELECT pos, uri, name, artist, album FROM tracks WHERE playlist = ? AND pos > ? ORDER BY pos ASC LIMIT ?"
+            last = -1
+        while True:
+            rows = self._query(sql, (playlist, last, page))
+            for row in rows:
+                yield row[1:]
+            if len(rows) < page:
+                return
+            last = rows[-1][0]
+
+    @staticmethod
+    def _track_entry(uri, name, artist, album) -> dict:
+        if name is None:
+            return {"track": None}  # Traccia non disponibile su Spotify
+        return {
+            "track": {
+                "name": name,
+                "uri": uri,
+                "artists": [] if artist is None else [{"name": artist}],
+                "album": {"name": album},
+            }
+        }
+
+    def find_playlist_by_name(self, name: str) -> Optional[dict]:
+        rows = self._query("SELECT id FROM playlists WHERE name = ? ORDER BY pos LIMIT 1", (name,))
+        if not rows:
+            return None
+        return self.find_playlist(rows[0][0])
+
+    def find_track(self, uri: str) -> Optional[dict]:
+        rows = self._query(
+            "SELECT uri, name, artist, album FROM tracks WHERE uri = ? ORDER BY playlist, pos LIMIT 1",
+            (uri,),
+        )
+        return self._track_entry(*rows[0]) if rows else None
+
+    def track_count(self, playlist_id: Optional[str]) -> int:
+        return self._rows.get(playlist_id, (None, 0))[1]
+
+    def iter_tracks(self, playlist_id: Optional[str], reverse: bool = False) -> Iterator[dict]:
+        self.get_playlist(playlist_id)
+        if playlist_id not in self._rows:
+            return iter(())
+        rows = self._iter_tracks(self._rows[playlist_id][0], reverse)
+        return (self._track_entry(*row) for row in rows)
+
+    def iter_albums(self) -> Iterator[dict]:
+        for pos, name in self._query("SELECT pos, name FROM albums ORDER BY pos"):
+            items = [
+                self._track_entry(uri, track_name, artist, name)["track"]
+                for uri, track_name, artist in self._query(
+                    "SELECT uri, name, artist FROM album_tracks WHERE album = ? ORDER BY pos", (pos,)
+                )
+            ]
+            yield {"album": {"name": name, "tracks": {"items": items}}}
+
+    def album_track_count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM album_tracks")[0][0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE playlists (
+    pos INTEGER PRIMARY KEY, id TEXT, name TEXT, description TEXT, snapshot_id TEXT, uri TEXT,
+    track_count INTEGER NOT NULL
+);
+CREATE TABLE tracks (
+    playlist INTEGER NOT NULL, pos INTEGER NOT NULL, uri TEXT, name TEXT, artist TEXT, album TEXT,
+    PRIMARY KEY (playlist, pos)
+) WITHOUT ROWID;
+CREATE TABLE albums (pos INTEGER PRIMARY KEY, uri TEXT, name TEXT);
+CREATE TABLE album_tracks (
+    album INTEGER NOT NULL, pos INTEGER NOT NULL, uri TEXT, name TEXT, artist TEXT,
+    PRIMARY KEY (album, pos)
+) WITHOUT ROWID;
+"""
+
+#  Creati dopo il caricamento dei dati, che così è più veloce
+_SQLITE_INDEXES = """
+CREATE INDEX playlists_id ON playlists (id);
+CREATE INDEX playlists_name ON playlists (name);
+CREATE INDEX tracks_uri ON tracks (uri);
+"""
+
+
+def _track_row(src_track: dict) -> tuple:
+    """(uri, name, first artist, album) of a track entry, all None for a missing track."""
+    track = src_track.get("track") if isinstance(src_track, dict) else None
+    if track is None:
+        return (None, None, None, None)
+    artists = track.get("artists") or []
+    return (
+        track.get("uri"),
+        track.get("name"),
+        artists[0].get("name") if artists else None,
+        (track.get("album") or {}).get("name"),
+    )
+
+
+def convert_backup(
+    src: str = "playlists.json",
+    dst: str = DEFAULT_SQLITE_FILE,
+    encoding: str = "utf-8",
+) -> SqliteBackup:
+    """Convert a Spotify backup to the compact SQLite format.
+
+    The source is streamed, so memory stays flat, and the database is written
+    next to `dst` and renamed into place only when complete.
+
+    Args:
+        `src` (str): The backup to convert, in any format `open_backup` reads.
+        `dst` (str): The database to write.  It is replaced if it exists.
+        `encoding` (str): Characters encoding of `src`.
+
+    Returns:
+        SqliteBackup: The converted backup.
+    """
+    backup = open_backup(src, encoding)
+    partial = f"{dst}.partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    db = sqlite3.connect(partial)
+    try:
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.executescript(_SQLITE_SCHEMA)
+        with db:
+            db.execute(
+                "INSERT INTO meta VALUES ('version', ?)", (str(SQLITE_FORMAT_VERSION),)
+            )
+            for pos, playlist in enumerate(backup.iter_playlists()):
+                key = playlist.get("id")
+                if key is not None:
+                    key = str(key)
+                #  Playlist senza id e non "Liked Songs", o con id duplicato: non raggiungibili
+                reachable = backup.find_playlist(key) is playlist
+                count = _insert_rows(
+                    db,
+                    "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (pos, i) + _track_row(src_track)
+                        for i, src_track in enumerate(
+                            backup.iter_tracks(key) if reachable else ()
+                        )
+                    ),
+                )
+                db.execute(
+                    "INSERT INTO playlists VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (pos,)
+                    + tuple(playlist.get(field) for field in _SQLITE_HEADER_FIELDS)
+                    + (count,),
+                )
+
+            for pos, liked_album in enumerate(backup.iter_albums()):
+                album = liked_album["album"]
+                db.execute(
+                    "INSERT INTO albums VALUES (?, ?, ?)", (pos, album.get("uri"), album["name"])
+                )
+                _insert_rows(
+                    db,
+                    "INSERT INTO album_tracks VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (pos, i) + _track_row({"track": track})[:3]
+                        for i, track in enumerate(album["tracks"]["items"])
+                    ),
+                )
+            db.executescript(_SQLITE_INDEXES)
+        db.execute("VACUUM")
+    finally:
+        db.close()
+
+    os.replace(partial, dst)
+    return SqliteBackup(dst)
+
+
+def _insert_rows(db: sqlite3.Connection, sql: str, rows: Iterable[tuple]) -> int:
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    db.executemany(sql, counted())
+    return count
+
+
+def is_sqlite_backup(filename: str) -> bool:
+    with open(filename, "rb") as f:
+        return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+
+
+_open_backups: Dict[Tuple[str, str, bool], Tuple[tuple, SpotifyBackup]] = {}
+_open_backups_lock = threading.Lock()
+
+
+def open_backup(
+    filename: str = "playlists.json", encoding: str = "utf-8", streaming: bool = True
+) -> SpotifyBackup:
+    """Return a handle on the backup in `filename`, reusing the one already opened if the file didn't change.
+
+    A database written by `convert_backup` is read with `SqliteBackup`.  A JSON
+    backup is read with `StreamingBackup` when `streaming` and the encoding
+    allow it, else parsed in memory as a `PlaylistsBackup`.
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    streaming = streaming and is_streamable(encoding)
+
+    with _open_backups_lock:
+        cached = _open_backups.get((path, encoding, streaming))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        if is_sqlite_backup(path):
+            backup: SpotifyBackup = SqliteBackup(path)
+        elif streaming:
+            backup = StreamingBackup(path, encoding)
+        else:
+            with open(path, "r", encoding=encoding) as f:
+                backup = PlaylistsBackup(json.load(f), filename)
+        _open_backups[(path, encoding, streaming)] = (version, backup)
+        return backup
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+"""
+Adaptive rate limiter shared by every YTMusic request.
+
+The limiter is a token bucket whose refill rate follows the server: every
+failed request halves the rate (multiplicative decrease), every successful
+request gives a small fixed amount back (additive increase), up to the
+configured requests-per-second budget.  A healthy API is therefore used at
+full speed, while a throttling one is backed off from automatically.
+
+The limiter spaces out all the requests; a failed request is also retried
+after its own exponential back-off (`retry_delay`), even with no rate limit.
+"""
+
+import random
+import threading
+import time
+
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_RETRY_BACKOFF = 5.0  # Attesa prima del primo nuovo tentativo, raddoppia a ogni errore
+DEFAULT_RETRY_BACKOFF_MAX = 60.0
+
+
+def retry_delay(attempt: int, base: float = DEFAULT_RETRY_BACKOFF, cap: float = DEFAULT_RETRY_BACKOFF_MAX) -> float:
+    """Seconds to wait before retrying after the `attempt`-th failure (0 for the first).
+
+    `base * 2 ** attempt`, at most `cap`, with +-20% jitter so that concurrent
+    callers failing together don't retry together.
+    """
+    return min(cap, base * 2**attempt) * random.uniform(0.8, 1.2)
+
+
+class RateLimiter:
+    """AIMD token bucket.
+
+    Args:
+        `requests_per_second` (float): The budget, and starting rate.  0 disables limiting.
+        `burst` (int): Number of requests that may be sent back to back after an idle period.
+        `min_rate` (float): The rate never drops below this many requests per second.
+        `decrease_factor` (float): The rate is multiplied by this on every error.
+        `increase_step` (float): Requests per second given back on every success.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        burst: int = 1,
+        min_rate: float = 0.05,
+        decrease_factor: float = 0.5,
+        increase_step: float = 0.1,
+    ):
+        self.burst = max(1, burst)
+        self.min_rate = min_rate
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.max_rate = requests_per_second
+        self._rate = requests_per_second
+        self._next_slot = 0.0  # Time at which the next token becomes available
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.errors = 0
+        self.slept = 0.0
+
+    @property
+    def rate(self) -> float:
+        """The current allowed requests per second (0 when unlimited)."""
+        return self._rate
+
+    def set_budget(self, requests_per_second: float) -> None:
+        """Change the requests-per-second ceiling, keeping the adaptive state otherwise."""
+        with self._lock:
+            if requests_per_second == self.max_rate:
+                return
+            self.max_rate = requests_per_second
+            self._rate = requests_per_second
+
+    def acquire(self) -> float:
+        """Block until a request may be sent.  Returns the time waited."""
+        with self._lock:
+            if not self._rate:
+                return 0.0
+            interval = 1.0 / self._rate
+            now = time.monotonic()
+            #  Allow up to `burst` requests of credit to build up while idle, but no more
+            self._next_slot = max(self._next_slot, now - (self.burst - 1) * interval)
+            wait = max(0.0, self._next_slot - now)
+            self._next_slot += interval
+            self.slept += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.successes += 1
+            if self._rate:
+                self._rate = min(self.max_rate, self._rate + self.increase_step)
+
+    def on_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+            if self._rate:
+                self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+
+    def summary(self) -> str:
+        if not self.max_rate:
+            return f"Rate limiter: unlimited, {self.errors} errors"
+        return (
+            f"Rate limiter: {self._rate:.2f} requests/s (budget {self.max_rate:.2f}), "
+            f"{self.successes} ok, {self.errors} errors, slept {self.slept:.1f}s"
+        )
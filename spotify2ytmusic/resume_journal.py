@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Append-only journal of the tracks processed by `backend.copier`.
+
+One journal file exists per (source playlist, destination playlist) pair.  Each
+processed source track is appended as a JSON line with its outcome, so a run
+that dies halfway can be restarted and will skip the tracks that were already
+handled instead of searching for them again.
+
+Lines are written through a buffered file and fsync'ed in batches, either every
+`fsync_every` records or every `fsync_interval` seconds, so the journal stays
+out of the way of the copy loop.  A torn last line after a crash is ignored.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+DEFAULT_JOURNAL_DIR = "s2yt_journal"
+
+#  Outcomes that mean the track doesn't need to be looked at again
+DONE_OUTCOMES = ("added", "duplicate")
+
+
+def track_key(song: Iterable[str]) -> str:
+    """Journal key of a source track, built from its title, artist and album."""
+    return "\x1f".join(str(part) for part in tuple(song)[:3])
+
+
+def journal_path(
+    source: str, destination: str, directory: str = DEFAULT_JOURNAL_DIR
+) -> str:
+    """File name of the journal for copying `source` into `destination`."""
+    digest = hashlib.sha1(f"{source}\n{destination}".encode("utf-8")).hexdigest()[:12]
+    readable = re.sub(r"[^A-Za-z0-9_-]+", "_", f"{source}-{destination}")[:60]
+    return os.path.join(directory, f"{readable}-{digest}.jsonl")
+
+
+class ResumeJournal:
+    """Journal of processed source tracks.
+
+    Args:
+        `path` (str): The journal file, created along with its directory if needed.
+        `reset` (bool): Discard what is already journaled and start over.
+        `fsync_every` (int): Number of records after which the journal is synced to disk.
+        `fsync_interval` (float): Seconds after which pending records are synced to disk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        reset: bool = False,
+        fsync_every: int = 50,
+        fsync_interval: float = 2.0,
+    ):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._entries: Dict[str, dict] = {}
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        #  Reentrant: the SIGINT handler may close the journal while a record is being written
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        torn = False
+        if not reset:
+            torn = self._load()
+        self._file = open(path, "w" if reset else "a", encoding="utf-8")
+        if torn:
+            self._file.write("\n")  # Don't glue the next record onto a torn line
+
+    def _load(self) -> bool:
+        """Read the existing journal.  Returns True if it ends with a torn line."""
+        if not os.path.exists(self.path):
+            return False
+        line = "\n"
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn write from a crash
+                self._entries[entry["key"]] = entry
+        return not line.endswith("\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_done(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry["outcome"] in DONE_OUTCOMES
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._entries.get(key)
+
+    def record(self, key: str, outcome: str, video_id: Optional[str] = None) -> None:
+        entry = {"key": key, "outcome": outcome, "videoId": video_id}
+        with self._lock:
+            self._entries[key] = entry
+            if self._file is None:
+                return
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._unsynced += 1
+            if (
+                self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval
+            ):
+                self.sync()
+
+    def sync(self) -> None:
+        """Flush pending records and fsync them to disk."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self.sync()
+            self._file.close()
+            self._file = None
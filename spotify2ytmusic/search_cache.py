@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+Persistent on-disk cache for YTMusic search results.
+
+Re-running a copy after a crash or after switching matching algorithm used to
+repeat every `yt.search` round trip.  This module keeps the raw search
+responses in a small SQLite database, keyed on a canonicalised query string
+plus the search filter, so identical searches are served from disk.
+
+Entries expire after `ttl` seconds and the table is kept under `max_entries`
+rows by evicting the least recently used entries.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Optional
+
+DEFAULT_CACHE_FILE = "search_cache.sqlite3"
+DEFAULT_TTL = 30 * 24 * 60 * 60  # 30 days
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def canonicalize_query(query: str) -> str:
+    """Normalize a search query so trivially different spellings share a cache entry."""
+    query = unicodedata.normalize("NFC", query)
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """SQLite backed cache of YTMusic search responses.
+
+    Args:
+        `path` (str): The database file.  Use ":memory:" for a throw-away cache.
+        `ttl` (float): Seconds after which an entry is considered stale. 0 disables expiry.
+        `max_entries` (int): Upper bound on stored entries, least recently used are evicted first.
+        `refresh` (bool): Ignore stored entries on read, but keep storing fresh results.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_FILE,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        refresh: bool = False,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+
+        # Lookups may happen from several worker threads, sqlite3 connections are
+        # not thread safe by themselves so every access goes through the lock.
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS searches (
+                query TEXT NOT NULL,
+                filter TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                response TEXT NOT NULL,
+                PRIMARY KEY (query, filter)
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS searches_last_used ON searches (last_used)"
+        )
+        # Approximate row count: every put counts as an insert (replacing an entry
+        # overcounts), it is recounted exactly after each eviction.
+        (self._rows,) = self._db.execute("SELECT COUNT(*) FROM searches").fetchone()
+
+    def get(self, query: str, filter: Optional[str]) -> Optional[Any]:
+        """Return the cached response for `query`/`filter`, or None on a miss."""
+        key = (canonicalize_query(query), filter or "")
+        if self.refresh:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT created, response FROM searches WHERE query = ? AND filter = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            created, response = row
+            if self.ttl and now - created > self.ttl:
+                self._db.execute(
+                    "DELETE FROM searches WHERE query = ? AND filter = ?", key
+                )
+                self._rows -= 1
+                self.misses += 1
+                return None
+
+            self._db.execute(
+                "UPDATE searches SET last_used = ? WHERE query = ? AND filter = ?",
+                (now, *key),
+            )
+            self.hits += 1
+        return json.loads(response)
+
+    def put(self, query: str, filter: Optional[str], response: Any) -> None:
+        """Store a search response.  Responses that can't be serialized are not cached."""
+        try:
+            payload = json.dumps(response)
+        except (TypeError, ValueError):
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO searches (query, filter, created, last_used, response) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (canonicalize_query(query), filter or "", now, now, payload),
+            )
+            self._rows += 1
+            if self.max_entries and self._rows > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop expired entries and trim the table down to `max_entries`, in one statement."""
+        # Evict a little more than strictly needed so we don't run this on every insert
+        keep = self.max_entries - self.max_entries // 10
+        # Expired entries, and every entry after the `keep` most recently used ones
+        condition = "rowid IN (SELECT rowid FROM searches ORDER BY last_used DESC, rowid DESC LIMIT -1 OFFSET ?)"
+        params: tuple = (keep,)
+        if self.ttl:
+            condition = "created < ? OR " + condition
+            params = (time.time() - self.ttl, keep)
+        self._db.execute("DELETE FROM searches WHERE " + condition, params)
+        (self._rows,) = self._db.execute("SELECT COUNT(*) FROM searches").fetchone()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM searches").fetchone()
+        return count
+
+    def summary(self) -> str:
+        """One line description of the hit/miss counters."""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"Search cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -3,17 +3,121 @@
 #  This file is licensed under the MIT license
 #  This file originates from https://github.com/caseychu/spotify-backup
 
-import codecs
+import argparse
+import base64
+import email.utils
 import http.client
 import http.server
 import json
+import os
+import random
 import re
 import sys
+import threading
 import time
 import urllib.error
 import urllib.parse
 import urllib.request
 import webbrowser
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 8  # Requests to the Spotify API at the same time
+DEFAULT_TIMEOUT = 30  # Seconds without an answer before a request fails
+READ_CHUNK_SIZE = 64 * 1024
+RETRY_BACKOFF_SECONDS = 2.0  # First wait after a failed request, doubled at each try
+RETRY_BACKOFF_MAX_SECONDS = 60.0
+RATE_LIMITED_STATUSES = (429, 503)  # Answers that may come with a Retry-After header
+MAX_REDIRECTS = 5
+
+
+class SpotifyAPIError(Exception):
+    """A request to the Spotify API failed on every try."""
+
+
+def retry_after(err):
+    """The seconds to wait asked by the Retry-After header of `err`, None if there is none."""
+    value = err.headers.get("Retry-After") if err.headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def retry_delay(attempt):
+    """Exponential back-off with jitter before try number `attempt + 1`."""
+    return min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2**attempt) * random.uniform(0.8, 1.2)
+
+
+class _ConnectionPool:
+    """Idle keep-alive connections, by (scheme, host:port), reused across requests.
+
+    The proxies of the environment (urllib.request.getproxies(), e.g. $https_proxy)
+    are used like urllib does: HTTPS goes through a CONNECT tunnel to the proxy,
+    plain HTTP is sent to the proxy with the full URL.
+    """
+
+    def __init__(self, max_idle, timeout=DEFAULT_TIMEOUT, proxies=None):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self.opened = 0  # Connections opened so far, to see how many handshakes were saved
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def proxy(self, scheme, netloc):
+        """The proxy URL (split) to reach `netloc` through, None to connect directly."""
+        proxy = self.proxies.get(scheme)
+        if not proxy or urllib.request.proxy_bypass(urllib.parse.urlsplit(f"//{netloc}").hostname):
+            return None
+        return urllib.parse.urlsplit(proxy if "://" in proxy else "http://" + proxy)
+
+    @staticmethod
+    def proxy_headers(proxy):
+        """The Proxy-Authorization header for the user and password in the proxy URL."""
+        if not proxy.username:
+            return {}
+        credentials = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+        return {"Proxy-Authorization": "Basic " + base64.b64encode(credentials.encode()).decode("ascii")}
+
+    def acquire(self, scheme, netloc):
+        """An idle connection to `netloc` if there is one (reused True), else a new one."""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+            self.opened += 1
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = self.proxy(scheme, netloc)
+        if proxy is None:
+            return connection_class(netloc, timeout=self.timeout), False
+        connection = connection_class(proxy.netloc.rpartition("@")[2], timeout=self.timeout)
+        if scheme == "https":
+            connection.set_tunnel(netloc, headers=self.proxy_headers(proxy))
+        return connection, False
+
+    def release(self, scheme, netloc, connection):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            connections = [connection for idle in self._idle.values() for connection in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
 
 
 class SpotifyAPI:
@@ -21,33 +125,106 @@ class SpotifyAPI:
 
     BASE_URL = "https://api.spotify.com/v1/"
 
-    def __init__(self, auth):
+    def __init__(self, auth, concurrency=DEFAULT_CONCURRENCY):
         self._auth = auth
+        self.concurrency = max(1, concurrency)
+        # Shared by every thread using this instance: caps the requests in flight
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._pool = _ConnectionPool(self.concurrency)
+        # When Spotify rate limits a request, every thread waits until then (time.monotonic())
+        self._pause_until = 0.0
+        self._pause_lock = threading.Lock()
 
     def get(self, url, params={}, tries=3):
-        """Fetch a resource from Spotify API."""
+        """Fetch a resource from Spotify API.
+
+        Failed requests are tried again after an exponential back-off.  A 429 or 503
+        answer pauses all the requests of this instance for the time asked by its
+        Retry-After header (or the back-off if there is none).
+        Raises SpotifyAPIError if the last try fails too.
+        """
         url = self._construct_url(url, params)
-        for _ in range(tries):
+        for attempt in range(tries):
+            self._wait_pause()
             try:
                 req = self._create_request(url)
-                return self._read_response(req)
+                with self._slots:
+                    return self._read_response(req)
             except Exception as err:
                 print(f"Error fetching URL {url}: {err}")
-                time.sleep(2)
-        sys.exit("Failed to fetch data from Spotify API after retries.")
+                if attempt == tries - 1:
+                    raise SpotifyAPIError(f"Failed to fetch {url} from Spotify API after {tries} tries: {err}") from err
+                if isinstance(err, urllib.error.HTTPError) and err.code in RATE_LIMITED_STATUSES:
+                    delay = retry_after(err)
+                    self._pause(retry_delay(attempt) if delay is None else delay)
+                else:
+                    time.sleep(retry_delay(attempt))
+
+    def _pause(self, seconds):
+        """Hold back the requests of every thread for `seconds`."""
+        print(f"Spotify is rate limiting, waiting {seconds:.1f} seconds...")
+        with self._pause_lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+    def _wait_pause(self):
+        while True:
+            with self._pause_lock:
+                remaining = self._pause_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
 
     def list(self, url, params={}):
-        """Fetch paginated resources and return as a combined list."""
+        """Fetch paginated resources and return as a combined list.
+
+        The first page tells how many items there are, the other pages are then
+        fetched by offset, up to `concurrency` at a time, and joined in order.
+        """
         response = self.get(url, params)
         items = response["items"]
+        if not response["next"]:
+            return items
+
+        total, limit = response.get("total"), response.get("limit")
+        if total is None or not limit or self.concurrency == 1:
+            # No offsets to compute (or no concurrency): follow the "next" links
+            while response["next"]:
+                response = self.get(response["next"])
+                items += response["items"]
+            return items
+
+        page_params = {key: value for key, value in params.items() if key not in ("offset", "limit")}
+        offsets = range(response.get("offset", 0) + limit, total, limit)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="spotify") as pool:
+            # map() yields the pages in offset order, whatever order they arrive in
+            pages = pool.map(
+                lambda offset: self.get(url, {**page_params, "offset": offset, "limit": limit}),
+                offsets,
+            )
+            for page in pages:
+                items += page["items"]
+        return items
+
+    def list_until(self, url, params, known):
+        """Fetch a paginated resource sorted newest first, up to the first item in `known`.
 
-        while response["next"]:
+        Returns the items before it, the key of the known item (None if none was
+        reached) and the total number of items reported by Spotify.
+        """
+        response = self.get(url, params)
+        items = []
+        while True:
+            for item in response["items"]:
+                key = saved_item_key(item)
+                if key in known:
+                    return items, key, response.get("total")
+                items.append(item)
+            if not response["next"]:
+                return items, None, response.get("total")
             response = self.get(response["next"])
-            items += response["items"]
-        return items
 
     @staticmethod
-    def authorize(client_id, scope):
+    def authorize(client_id, scope, concurrency=DEFAULT_CONCURRENCY):
         """Open a browser for user authorization and return SpotifyAPI instance."""
         redirect_uri = f"http://127.0.0.1:{SpotifyAPI._SERVER_PORT}/redirect"
         url = SpotifyAPI._construct_auth_url(client_id, scope, redirect_uri)
@@ -59,7 +236,7 @@ class SpotifyAPI:
             while True:
                 server.handle_request()
         except SpotifyAPI._Authorization as auth:
-            return SpotifyAPI(auth.access_token)
+            return SpotifyAPI(auth.access_token, concurrency)
 
     @staticmethod
     def _construct_auth_url(client_id, scope, redirect_uri):
@@ -87,10 +264,80 @@ class SpotifyAPI:
         return req
 
     def _read_response(self, req):
-        """Read and parse the response."""
-        with urllib.request.urlopen(req) as res:
-            reader = codecs.getreader("utf-8")
-            return json.load(reader(res))
+        """Send the request on a pooled keep-alive connection, read and parse the response.
+
+        Redirects are followed, up to MAX_REDIRECTS; the Authorization header is only
+        sent again to the same host.
+        """
+        url = req.full_url
+        headers = dict(req.header_items())
+        headers["Accept-Encoding"] = "gzip"
+        for _ in range(MAX_REDIRECTS + 1):
+            res, body = self._send(url, headers)
+            location = res.getheader("Location")
+            if res.status not in (301, 302, 303, 307, 308) or not location:
+                break
+            location = urllib.parse.urljoin(url, location)
+            if urllib.parse.urlsplit(location).netloc != urllib.parse.urlsplit(url).netloc:
+                headers.pop("Authorization", None)
+            url = location
+        else:
+            raise urllib.error.HTTPError(url, res.status, f"More than {MAX_REDIRECTS} redirects", res.headers, None)
+
+        if res.status >= 300:
+            raise urllib.error.HTTPError(url, res.status, res.reason, res.headers, None)
+        return json.loads(body.decode("utf-8"))
+
+    def _send(self, url, headers):
+        """GET `url` on a pooled connection: the response and its body."""
+        url = urllib.parse.urlsplit(url)
+        path = url.path + ("?" + url.query if url.query else "")
+        proxy = self._pool.proxy(url.scheme, url.netloc)
+        if proxy is not None and url.scheme == "http":
+            path = url.geturl()  # The proxy needs the whole URL
+            headers = {**headers, **self._pool.proxy_headers(proxy)}
+
+        while True:
+            connection, reused = self._pool.acquire(url.scheme, url.netloc)
+            try:
+                connection.request("GET", path, headers=headers)
+                res = connection.getresponse()
+                body = self._read_body(res)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused:
+                    continue  # The server closed the idle connection: try again on a new one
+                raise
+            except Exception:
+                connection.close()
+                raise
+            break
+
+        if res.will_close:
+            connection.close()
+        else:
+            self._pool.release(url.scheme, url.netloc, connection)
+        return res, body
+
+    @staticmethod
+    def _read_body(res):
+        """The response body, gunzipped chunk by chunk as it arrives if it is compressed."""
+        decompressor = None
+        if res.getheader("Content-Encoding", "").lower() == "gzip":
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = []
+        while True:
+            chunk = res.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(decompressor.decompress(chunk) if decompressor else chunk)
+        if decompressor:
+            chunks.append(decompressor.flush())
+        return b"".join(chunks)
+
+    def close(self):
+        """Close the idle connections."""
+        self._pool.close()
 
     _SERVER_PORT = 43019
 
@@ -136,73 +383,263 @@ class SpotifyAPI:
             self.access_token = access_token
 
 
-def fetch_user_data(spotify, dump):
-    """Fetch playlists and liked songs based on the dump parameter."""
+def saved_item_key(item):
+    """Identify a liked song or album: when it was saved, and the Spotify id."""
+    saved = item.get("track") or item.get("album") or {}
+    return item.get("added_at"), saved.get("id")
+
+
+def fetch_saved_items(spotify, url, limit, previous_items=None):
+    """Fetch the liked songs or albums at `url`, reusing `previous_items` if given.
+
+    Spotify returns them newest first, so only the items saved since the previous
+    backup are fetched, up to the first one it already has.  If the counts do not
+    add up (something was removed in between), everything is fetched again.
+    """
+    if not previous_items:
+        return spotify.list(url, {"limit": limit})
+
+    positions = {saved_item_key(item): i for i, item in enumerate(previous_items)}
+    new_items, known_key, total = spotify.list_until(url, {"limit": limit}, positions)
+    if known_key is not None:
+        items = new_items + previous_items[positions[known_key]:]
+        if total is None or len(items) == total:
+            return items
+    print(f"Backup of {url} out of date, loading it all again...")
+    return spotify.list(url, {"limit": limit})
+
+
+def load_previous_backup(file):
+    """The JSON backup in `file` for an incremental backup, or None to back up everything."""
+    if not os.path.exists(file):
+        return None
+    try:
+        with open(file, encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError) as err:
+        print(f"Unable to read the previous backup {file}, backing up everything: {err}")
+        return None
+    if not isinstance(previous, dict) or "playlists" not in previous:
+        print(f"{file} is not a JSON backup, backing up everything")
+        return None
+    return previous
+
+
+def fetch_user_data(spotify, dump, previous=None, writer=None):
+    """Fetch playlists and liked songs based on the dump parameter.
+
+    The liked songs, liked albums and playlist tracks are fetched at the same time;
+    the requests in flight are capped by `spotify.concurrency`.
+
+    With a `previous` backup, the tracks of the playlists whose `snapshot_id` did not
+    change are reused and only the newly liked songs and albums are fetched.
+
+    With a `writer` (BackupWriter), each playlist is written as soon as it and the ones
+    before it are fetched, and is not kept: the returned list of playlists is empty.
+    At most `2 * concurrency` playlists are fetched ahead of the one being written.
+    """
     playlists = []
     liked_albums = []
-
-    if "liked" in dump:
-        print("Loading liked albums and songs...")
-        liked_tracks = spotify.list("me/tracks", {"limit": 50})
-        liked_albums = spotify.list("me/albums", {"limit": 50})
-        playlists.append({"name": "Liked Songs", "tracks": liked_tracks})
-
-    if "playlists" in dump:
-        print("Loading playlists...")
-        playlist_data = spotify.list("me/playlists", {"limit": 50})
-        for playlist in playlist_data:
-            print(f"Loading playlist: {playlist['name']}")
-            playlist["tracks"] = spotify.list(
-                playlist["tracks"]["href"], {"limit": 100}
-            )
-        playlists.extend(playlist_data)
+    playlist_data = []
+
+    previous_liked = []
+    previous_playlists = {}
+    for playlist in (previous or {}).get("playlists", []):
+        if playlist.get("id"):
+            previous_playlists[playlist["id"]] = playlist
+        elif playlist.get("name") == "Liked Songs":
+            previous_liked = playlist["tracks"]
+    previous_albums = (previous or {}).get("albums") or []
+
+    def emit(playlist):
+        if writer is None:
+            playlists.append(playlist)
+        else:
+            writer.write_playlist(playlist)
+
+    with ThreadPoolExecutor(max_workers=spotify.concurrency, thread_name_prefix="playlist") as pool:
+        liked_tracks = None
+        if "liked" in dump:
+            print("Loading liked albums and songs...")
+            liked_tracks = pool.submit(fetch_saved_items, spotify, "me/tracks", 50, previous_liked)
+            liked_albums_future = pool.submit(fetch_saved_items, spotify, "me/albums", 50, previous_albums)
+
+        if "playlists" in dump:
+            print("Loading playlists...")
+            playlist_data = spotify.list("me/playlists", {"limit": 50})
+
+        def start(playlist):
+            """The fetch of the playlist tracks, None if the previous backup has them."""
+            old = previous_playlists.get(playlist["id"])
+            if old is not None and old.get("snapshot_id") == playlist.get("snapshot_id") and isinstance(old.get("tracks"), list):
+                playlist["tracks"] = old["tracks"]
+                return None
+            return pool.submit(spotify.list, playlist["tracks"]["href"], {"limit": 100})
+
+        unchanged = 0
+        playlist_count = len(playlist_data)
+
+        def write_next():
+            # Same order as the serial version: the liked songs, then the playlists as listed by Spotify
+            nonlocal liked_tracks, unchanged
+            if liked_tracks is not None:
+                emit({"name": "Liked Songs", "tracks": liked_tracks.result()})
+                liked_tracks = None
+                return
+            number, playlist, future = in_flight.popleft()
+            if future is None:
+                unchanged += 1
+            else:
+                playlist["tracks"] = future.result()
+                print(f"Loaded playlist {number}/{playlist_count}: {playlist['name']} ({len(playlist['tracks'])} tracks)")
+            emit(playlist)
+            if writer is not None:
+                playlist_data[number - 1] = None  # Written: let its tracks go
+
+        in_flight = deque()
+        for number, playlist in enumerate(playlist_data, 1):
+            in_flight.append((number, playlist, start(playlist)))
+            if len(in_flight) >= 2 * spotify.concurrency:
+                write_next()
+        while liked_tracks is not None or in_flight:
+            write_next()
+        if previous is not None and playlist_count:
+            print(f"{unchanged} playlists unchanged since the previous backup")
+
+        if "liked" in dump:
+            liked_albums = liked_albums_future.result()
 
     return playlists, liked_albums
 
 
-def write_to_file(file, format, playlists, liked_albums):
-    """Write fetched data to a file in the specified format."""
-    print(f"Writing to {file}...")
-    with open(file, "w", encoding="utf-8") as f:
+class BackupWriter:
+    """Write a backup one playlist at a time.
+
+    The data goes to `file` + ".partial", flushed after every playlist, and `finish()`
+    renames it to `file`: an interrupted backup never replaces the previous one, and
+    its partial JSON file can still be read (up to the cut) by `playlists_backup`.
+    The playlist fields are written before its tracks, so a playlist cut in the middle
+    of its tracks is still found by name.
+    """
+
+    def __init__(self, file, format="json"):
+        self.file = file
+        self.format = format
+        self.partial = file + ".partial"
+        self._f = open(self.partial, "w", encoding="utf-8")
+        self._playlists = 0
         if format == "json":
-            json.dump({"playlists": playlists, "albums": liked_albums}, f)
+            self._f.write('{"playlists": [')
+
+    def write_playlist(self, playlist):
+        f = self._f
+        if self.format == "json":
+            header = {key: value for key, value in playlist.items() if key != "tracks"}
+            f.write(", " if self._playlists else "")
+            f.write(json.dumps(header)[:-1] + (", " if header else "") + '"tracks": [')
+            for i, track in enumerate(playlist["tracks"]):
+                f.write((", " if i else "") + json.dumps(track))
+            f.write("]}")
         else:
-            for playlist in playlists:
-                f.write(playlist["name"] + "\r\n")
-                for track in playlist["tracks"]:
-                    if track["track"]:
-                        f.write(
-                            "{name}\t{artists}\t{album}\t{uri}\t{release_date}\r\n".format(
-                                uri=track["track"]["uri"],
-                                name=track["track"]["name"],
-                                artists=", ".join(
-                                    [
-                                        artist["name"]
-                                        for artist in track["track"]["artists"]
-                                    ]
-                                ),
-                                album=track["track"]["album"]["name"],
-                                release_date=track["track"]["album"]["release_date"],
-                            )
+            f.write(playlist["name"] + "\r\n")
+            for track in playlist["tracks"]:
+                if track["track"]:
+                    f.write(
+                        "{name}\t{artists}\t{album}\t{uri}\t{release_date}\r\n".format(
+                            uri=track["track"]["uri"],
+                            name=track["track"]["name"],
+                            artists=", ".join(
+                                [
+                                    artist["name"]
+                                    for artist in track["track"]["artists"]
+                                ]
+                            ),
+                            album=track["track"]["album"]["name"],
+                            release_date=track["track"]["album"]["release_date"],
                         )
-                f.write("\r\n")
+                    )
+            f.write("\r\n")
+        self._playlists += 1
+        f.flush()
+
+    def finish(self, liked_albums=()):
+        """Write the liked albums (JSON only), close the file and move it to its place."""
+        if self.format == "json":
+            self._f.write('], "albums": [')
+            for i, album in enumerate(liked_albums):
+                self._f.write((", " if i else "") + json.dumps(album))
+            self._f.write("]}")
+        self._f.close()
+        os.replace(self.partial, self.file)
 
 
-def main(dump="playlists,liked", format="json", file="playlists.json", token=""):
+def write_to_file(file, format, playlists, liked_albums):
+    """Write fetched data to a file in the specified format."""
+    print(f"Writing to {file}...")
+    writer = BackupWriter(file, format)
+    for playlist in playlists:
+        writer.write_playlist(playlist)
+    writer.finish(liked_albums)
+
+
+def main(
+    dump="playlists,liked",
+    format="json",
+    file="playlists.json",
+    token="",
+    concurrency=DEFAULT_CONCURRENCY,
+    incremental=False,
+):
     print("Starting backup...")
+    previous = None
+    if incremental:
+        if format == "json":
+            previous = load_previous_backup(file)
+        else:
+            print("Incremental backups need --format=json, backing up everything")
+
     spotify = (
-        SpotifyAPI(token)
+        SpotifyAPI(token, concurrency)
         if token
         else SpotifyAPI.authorize(
             client_id="5c098bcc800e45d49e476265bc9b6934",
             scope="playlist-read-private playlist-read-collaborative user-library-read",
+            concurrency=concurrency,
         )
     )
 
-    playlists, liked_albums = fetch_user_data(spotify, dump)
-    write_to_file(file, format, playlists, liked_albums)
+    writer = BackupWriter(file, format)
+    print(f"Writing to {writer.partial}...")
+    try:
+        _, liked_albums = fetch_user_data(spotify, dump, previous, writer)
+    except SpotifyAPIError as err:
+        sys.exit(f"{err}\nThe playlists fetched so far are in {writer.partial}")
+    finally:
+        spotify.close()
+    writer.finish(liked_albums)
     print(f"Backup completed! Data written to {file}")
 
 
+def _parse_arguments():
+    parser = argparse.ArgumentParser(description="Back up your Spotify playlists, liked songs and liked albums")
+    parser.add_argument("file", nargs="?", default="playlists.json", help="Output file (default: playlists.json)")
+    parser.add_argument("--dump", default="playlists,liked", help="What to back up: playlists, liked or both (default: playlists,liked)")
+    parser.add_argument("--format", choices=["json", "txt"], default="json", help="Output format (default: json)")
+    parser.add_argument("--token", default="", help="Use this OAuth token instead of authorizing in the browser")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Requests to Spotify at the same time (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse the unchanged playlists and the liked songs of the backup already in the output file",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
+    args = _parse_arguments()
+    main(args.dump, args.format, args.file, args.token, args.concurrency, args.incremental)
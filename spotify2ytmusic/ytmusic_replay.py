@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""
+Record and replay of YTMusic traffic, to measure and regression-test runs offline.
+
+`RecordingYTMusic` wraps a real `YTMusic` and appends every call of the
+methods in `RECORDED_METHODS` (arguments, and result or error) to a cassette
+file, one JSON object per line.  `ReplayYTMusic` is a drop-in stand-in that
+serves a cassette back without network or login, optionally adding latency
+and failing a share of the calls, to see how a run behaves against a slow or
+throttling server.
+
+Calls are matched on the method and its arguments.  A call made several times
+gets the recorded answers in order, the last one is repeated when they run out.
+Writes (`create_playlist`, `add_playlist_items`, `rate_song`) that are not in
+the cassette succeed, so a replay may copy to other playlists than the
+recording did; any other call that is not in the cassette raises `CassetteMiss`.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+RECORDED_METHODS = (
+    "search",
+    "get_search_suggestions",
+    "get_album",
+    "get_playlist",
+    "get_liked_songs",
+    "get_library_playlists",
+    "create_playlist",
+    "add_playlist_items",
+    "rate_song",
+)
+
+
+class CassetteMiss(Exception):
+    """A replayed call that is not in the cassette."""
+
+
+class ReplayedError(Exception):
+    """An error raised by YTMusic during the recording, raised again on replay."""
+
+
+class InjectedError(Exception):
+    """An error made up by `ReplayYTMusic` to simulate a failing server."""
+
+
+def _call_key(method: str, args: tuple, kwargs: dict) -> str:
+    return json.dumps([method, list(args), kwargs], sort_keys=True, default=str)
+
+
+class RecordingYTMusic:
+    """Forward every call to `yt`, writing the traffic of `RECORDED_METHODS` to `cassette`.
+
+    The cassette is overwritten.  Every line is flushed as soon as the call
+    returns, so an interrupted run still leaves a usable cassette.
+    """
+
+    def __init__(self, yt, cassette: str):
+        self.yt = yt
+        self.cassette = cassette
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._file = open(cassette, "w", encoding="utf-8")
+
+    def __getattr__(self, name: str):
+        func = getattr(self.yt, name)
+        if name not in RECORDED_METHODS:
+            return func
+
+        def record(*args, **kwargs):
+            interaction = {"method": name, "args": list(args), "kwargs": kwargs}
+            try:
+                interaction["result"] = func(*args, **kwargs)
+                return interaction["result"]
+            except Exception as e:
+                interaction["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                self._write(interaction)
+
+        record.__name__ = name
+        return record
+
+    def _write(self, interaction: dict) -> None:
+        line = json.dumps(interaction, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.calls += 1
+
+    def summary(self) -> str:
+        return f"Recorded {self.calls} YTMusic calls to {self.cassette}"
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class ReplayYTMusic:
+    """Serve the calls recorded in `cassette` in place of `YTMusic`.
+
+    Args:
+        `cassette` (str): A file written by `RecordingYTMusic`.
+        `latency` (float): Seconds every call waits before answering.
+        `jitter` (float): Up to this many seconds are added at random to `latency`.
+        `error_rate` (float): Share (0-1) of the calls that fail with `InjectedError`.
+        `seed` (int): Seed of the random latency and errors, for repeatable runs.
+    """
+
+    def __init__(
+        self,
+        cassette: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.cassette = cassette
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.misses = 0
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._created_playlists = 0
+        self._interactions: Dict[str, deque] = defaultdict(deque)
+        with open(cassette, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                interaction = json.loads(line)
+                key = _call_key(interaction["method"], tuple(interaction["args"]), interaction["kwargs"])
+                self._interactions[key].append(interaction)
+
+    def __getattr__(self, name: str):
+        if name not in RECORDED_METHODS:
+            raise AttributeError(f"{name} is not replayed by ReplayYTMusic")
+
+        def replay(*args, **kwargs):
+            return self._replay(name, args, kwargs)
+
+        replay.__name__ = name
+        return replay
+
+    def _replay(self, method: str, args: tuple, kwargs: dict):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+            queue = self._interactions.get(_call_key(method, args, kwargs))
+            interaction = None
+            if queue:
+                #  L'ultima risposta resta in coda, viene ripetuta per le chiamate in più
+                interaction = queue.popleft() if len(queue) > 1 else queue[0]
+            else:
+                self.misses += 1
+                self._created_playlists += method == "create_playlist"
+                created = self._created_playlists
+
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise InjectedError(f"Injected error in {method}")
+
+        if interaction is None:
+            if method == "create_playlist":
+                return f"REPLAY{created}"
+            if method == "add_playlist_items":
+                return {"status": "STATUS_SUCCEEDED"}
+            if method == "rate_song":
+                return {}
+            raise CassetteMiss(f"{method}{args or ''}{kwargs or ''} is not in {self.cassette}")
+        if "error" in interaction:
+            raise ReplayedError(interaction["error"])
+        return interaction["result"]
+
+    def summary(self) -> str:
+        return (
+            f"Replay: {self.calls} calls, {self.misses} not in the cassette, "
+            f"{self.injected_errors} injected errors"
+        )
@@ -1,8 +1,15 @@
 #!/usr/bin/env python
 
+import contextlib
+import io
+import json
+import operator
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 import spotify2ytmusic
+from spotify2ytmusic import backend, cli, playlists_backup
 
 
 class TestCopier(unittest.TestCase):
@@ -66,5 +73,168 @@ class TestCopier(unittest.TestCase):
         )
 
 
+class TestIterators(unittest.TestCase):
+    def test_length_hint(self):
+        songs = backend.iter_spotify_playlist(
+            "68QlHDwCiXfhodLpS72iOx", spotify_playlist_file="tests/playliststest.json"
+        )
+        self.assertEqual(operator.length_hint(songs), 38)
+        next(songs)
+        self.assertEqual(operator.length_hint(songs), 37)
+        self.assertEqual(len(list(songs)), 37)
+
+
+class TestPlaylistsBackup(unittest.TestCase):
+    def test_open_backup_is_shared(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "playlists.json")
+            with open(path, "w") as f:
+                f.write('{"playlists": [{"name": "A", "id": "a", "tracks": []}]}')
+            backup = playlists_backup.open_backup(path)
+            self.assertIs(playlists_backup.open_backup(path), backup)
+            self.assertEqual(backup.get_playlist("a")["name"], "A")
+            self.assertRaises(ValueError, backup.get_playlist, "b")
+
+            with open(path, "w") as f:
+                f.write('{"playlists": [{"name": "B", "id": "b", "tracks": []}, {}]}')
+            os.utime(path, ns=(0, 0))
+            backup = playlists_backup.open_backup(path)
+            self.assertEqual(backup.get_playlist("b")["name"], "B")
+
+    def test_streaming_matches_full_parse(self):
+        full = playlists_backup.open_backup("tests/playliststest.json", streaming=False)
+        stream = playlists_backup.open_backup("tests/playliststest.json")
+        self.assertIsInstance(stream, playlists_backup.StreamingBackup)
+        for reverse in (True, False):
+            self.assertEqual(
+                list(backend.iter_spotify_playlist("68QlHDwCiXfhodLpS72iOx", backup=stream, reverse_playlist=reverse)),
+                list(backend.iter_spotify_playlist("68QlHDwCiXfhodLpS72iOx", backup=full, reverse_playlist=reverse)),
+            )
+
+    def test_streaming_truncated(self):
+        with open("tests/playliststest.json", "rb") as f:
+            data = f.read()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "playlists.json")
+            with open(path, "wb") as f:
+                f.write(data[: len(data) // 2])
+            backup = playlists_backup.StreamingBackup(path)
+            self.assertTrue(backup.truncated)
+            count = backup.track_count("68QlHDwCiXfhodLpS72iOx")
+            self.assertTrue(0 < count < 38)
+            self.assertEqual(len(list(backup.iter_tracks("68QlHDwCiXfhodLpS72iOx", reverse=True))), count)
+
+    def test_streaming_values_across_blocks(self):
+        data = {"playlists": [{"name": "Caf\u00e9", "id": "a", "public": False, "tracks": [{"track": None, "n": -1.5e3}]}]}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "playlists.json")
+            with open(path, "w") as f:
+                json.dump(data, f)
+            #  Ogni taglio possibile di stringhe, escape, letterali e numeri tra un blocco e l'altro
+            for chunk_size in range(1, 40):
+                with patch.object(playlists_backup, "CHUNK_SIZE", chunk_size):
+                    backup = playlists_backup.StreamingBackup(path)
+                    self.assertFalse(backup.truncated)
+                    self.assertEqual(backup.to_dict(), dict(data, albums=[]))
+
+    def test_streaming_malformed(self):
+        text = '{"playlists": [{"name": "A", "id": "a", "tracks": [{"track": {"name": "T" "x"}}]}, ' + '{"name": "B"}, ' * 1000
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "playlists.json")
+            with open(path, "w") as f:
+                f.write(text + "{}]}")
+            with self.assertRaisesRegex(ValueError, f"at byte {text.index('"x"')}:"):
+                playlists_backup.StreamingBackup(path)
+
+    def test_sqlite_backup(self):
+        data = {
+            "playlists": [
+                {"name": "Liked Songs", "tracks": [
+                    {"track": {"name": "T1", "uri": "spotify:track:1", "artists": [{"name": "A1"}], "album": {"name": "B1"}}},
+                    {"track": None},
+                ]},
+                {"name": "P", "id": "p", "snapshot_id": "s", "images": [], "tracks": [
+                    {"track": {"name": "T2", "uri": "spotify:track:2", "artists": [{"name": "A2"}, {"name": "X"}], "album": {"name": "B2"}}},
+                ]},
+            ],
+            "albums": [{"album": {"name": "B3", "tracks": {"items": [{"name": "T3", "artists": [{"name": "A3"}]}]}}}],
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "playlists.json")
+            with open(path, "w") as f:
+                json.dump(data, f)
+            dst = os.path.join(tmpdir, "playlists.sqlite3")
+            playlists_backup.convert_backup(path, dst)
+
+            backup = playlists_backup.open_backup(dst)
+            self.assertIsInstance(backup, playlists_backup.SqliteBackup)
+            self.assertEqual(backup.find_playlist("p"), {"id": "p", "name": "P", "snapshot_id": "s"})
+            self.assertIs(backup.find_playlist_by_name("P"), backup.find_playlist("p"))
+            self.assertEqual(backup.find_track("spotify:track:2")["track"]["name"], "T2")
+            self.assertEqual(backup.track_count(None), 2)
+            self.assertEqual(
+                list(backend.iter_spotify_playlist(None, backup=backup)),
+                [backend.SongInfo("T1", "A1", "B1", "spotify:track:1")],
+            )
+            self.assertEqual(
+                list(backend.iter_spotify_liked_albums(backup=backup)),
+                [backend.SongInfo("T3", "A3", "B3")],
+            )
+
+            self.assertEqual(
+                backend.load_playlists_json(dst),
+                {
+                    "playlists": [
+                        {"name": "Liked Songs", "tracks": [backup.find_track("spotify:track:1"), {"track": None}]},
+                        {"id": "p", "name": "P", "snapshot_id": "s", "tracks": [backup.find_track("spotify:track:2")]},
+                    ],
+                    "albums": list(backup.iter_albums()),
+                },
+            )
+
+            output = io.StringIO()
+            with patch("sys.argv", ["s2yt_list_liked_albums", "--spotify-backup", dst]), contextlib.redirect_stdout(output):
+                cli.list_liked_albums()
+            self.assertEqual(output.getvalue(), "B3 - A3 - T3\n")
+            backup.close()
+
+
+class TestSync(unittest.TestCase):
+    @patch("spotify2ytmusic.backend.lookup_song")
+    def test_sync_skips_present_tracks(self, mock_lookup):
+        mock_lookup.side_effect = lambda yt, title, artist, album, algo, **kwargs: {
+            "videoId": f"new-{title}",
+            "title": title,
+        }
+        yt = MagicMock()
+        yt.get_playlist.return_value = {
+            "title": "Test Playlist",
+            "tracks": [
+                {"videoId": "v1", "title": "Song One", "artists": [{"name": "The Band"}]},
+                {"videoId": "v2", "title": "Song Two (Remastered 2011)", "artists": [{"name": "Band"}]},
+            ],
+        }
+        src_tracks = [
+            backend.SongInfo("Song One", "The Band", "Album"),
+            backend.SongInfo("Song Two - 2011 Remaster", "The Band", "Album"),
+            backend.SongInfo("Song Three", "The Band", "Album"),
+        ]
+        backend.configure_rate_limiter(0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cwd = os.getcwd()
+            os.chdir(tmpdir)
+            try:
+                backend.copier(iter(src_tracks), "dst_test", yt=yt, sync=True)
+            finally:
+                os.chdir(cwd)
+
+        yt.get_playlist.assert_called_once_with(playlistId="dst_test", limit=None)
+        self.assertEqual([c.args[1] for c in mock_lookup.call_args_list], ["Song Three"])
+        yt.add_playlist_items.assert_called_once_with(
+            playlistId="dst_test", videoIds=["new-Song Three"], duplicates=False
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import unittest
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.evaluation import GoldenTrack, evaluate_algorithm, load_golden_set
+from spotify2ytmusic.ytmusic_replay import ReplayYTMusic
+
+
+def song(title, artist, album, video_id):
+    return {"title": title, "artists": [{"name": artist}], "album": {"name": album}, "videoId": video_id}
+
+
+class TestEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cassette = os.path.join(self.tmpdir.name, "cassette.jsonl")
+        searches = {
+            "Hey Jude The Beatles": [song("Let It Be", "The Beatles", "Let It Be", "v1"), song("Hey Jude", "The Beatles", "Hey Jude", "v2")],
+            "Missing Song Nobody": [song("Other Song", "Somebody", "Other", "v3")],
+        }
+        with open(self.cassette, "w", encoding="utf-8") as f:
+            for query, results in searches.items():
+                f.write(json.dumps({"method": "search", "args": [], "kwargs": {"query": query, "filter": "songs"}, "result": results}) + "\n")
+                f.write(json.dumps({"method": "get_search_suggestions", "args": [], "kwargs": {"query": query}, "result": [query]}) + "\n")
+        backend.configure_search_cache(enabled=False)
+        backend.configure_rate_limiter(0)
+
+    def tearDown(self):
+        backend.configure_search_cache()
+        backend.configure_rate_limiter(backend.DEFAULT_REQUESTS_PER_SECOND)
+        self.tmpdir.cleanup()
+
+    def test_load_golden_set(self):
+        filename = os.path.join(self.tmpdir.name, "golden.csv")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write("title,artist,album,video_id\nHey Jude,The Beatles,Hey Jude,v2|v4\nMissing Song,Nobody,,\n")
+        golden = load_golden_set(filename)
+        self.assertEqual(golden[0].video_ids, frozenset({"v2", "v4"}))
+        self.assertEqual(golden[1], GoldenTrack("Missing Song", "Nobody", "", frozenset()))
+
+    def test_evaluate_algorithm(self):
+        golden = [
+            GoldenTrack("Hey Jude", "The Beatles", "Hey Jude", frozenset({"v2"})),
+            GoldenTrack("Missing Song", "Nobody", "Unknown", frozenset()),
+        ]
+        yt = ReplayYTMusic(self.cassette)
+
+        first = evaluate_algorithm(yt, golden, 0)
+        self.assertEqual((first.answered, first.correct, first.fallbacks), (2, 0, 0))
+
+        normalized = evaluate_algorithm(yt, golden, 3)
+        self.assertEqual(normalized.precision, 0.5)
+        self.assertEqual(normalized.recall, 1.0)
+        self.assertEqual(normalized.fallback_rate, 0.5)
+        self.assertEqual(normalized.requests_per_track, 1.0)
+        self.assertEqual(normalized.matched_by, {"normalized": 1, "first_result": 1})
+
+        with_suggestions = evaluate_algorithm(yt, golden, 3, suggestions=True)
+        self.assertEqual(with_suggestions.requests_per_track, 2.0)
+        self.assertEqual(with_suggestions.correct, 1)
+        self.assertEqual(yt.misses, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.event_log import EventSink, export_csv, read_events
+from spotify2ytmusic.ytmusic_replay import ReplayYTMusic
+
+
+def song(title, artist, album, video_id):
+    return {"title": title, "artists": [{"name": artist}], "album": {"name": album}, "videoId": video_id}
+
+
+class TestEventLog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.events = os.path.join(self.tmpdir.name, "events.jsonl")
+        self.csv = os.path.join(self.tmpdir.name, "log.csv")
+
+    def tearDown(self):
+        backend.configure_event_log()
+        backend.configure_search_cache()
+        backend.configure_rate_limiter(backend.DEFAULT_REQUESTS_PER_SECOND)
+        self.tmpdir.cleanup()
+
+    def test_buffered_sink(self):
+        sink = EventSink(self.events, buffer_size=3, flush_interval=60)
+        sink.emit("match", title="a")
+        sink.emit("match", title="b")
+        self.assertEqual(list(read_events(self.events)), [])  # Ancora nel buffer
+        sink.emit("match", title="c")
+        self.assertEqual([event["title"] for event in read_events(self.events)], ["a", "b", "c"])
+        sink.emit("error", title="d")
+        sink.close()
+        self.assertEqual(len(list(read_events(self.events))), 4)
+
+        #  Una seconda sessione si aggiunge in fondo e si può esportare da sola
+        sink = EventSink(self.events)
+        sink.emit("error", title="e", artist="f", album="g")
+        sink.close()
+        self.assertEqual(export_csv(self.events, self.csv, sink.start_offset), 1)
+        with open(self.csv, newline="", encoding="utf-8") as f:
+            self.assertEqual(next(csv.reader(f))[1:], ["ERROR: Not Found on Youtube", "e", "f", "g"])
+
+    @patch("spotify2ytmusic.backend.time.sleep")  # La ricerca mancante viene ritentata
+    def test_copier_events(self, _sleep):
+        cassette = os.path.join(self.tmpdir.name, "cassette.jsonl")
+        searches = {
+            "Hey Jude The Beatles": [song("Hey Jude", "The Beatles", "Hey Jude", "v1")],
+            "Missing Song Nobody": [song("Other Song", "Somebody", "Other", "v2")],
+            "Hey Jude (Remastered) The Beatles": [song("Hey Jude", "The Beatles", "Hey Jude", "v1")],
+        }
+        with open(cassette, "w", encoding="utf-8") as f:
+            for query, results in searches.items():
+                f.write(json.dumps({"method": "search", "args": [], "kwargs": {"query": query, "filter": "songs"}, "result": results}) + "\n")
+        backend.configure_search_cache(enabled=False)
+        backend.configure_rate_limiter(0)
+        backend.configure_event_log(self.events, self.csv)
+
+        tracks = [
+            backend.SongInfo("Hey Jude", "The Beatles", "Hey Jude", "spotify:track:1"),
+            backend.SongInfo("Missing Song", "Nobody", "Unknown", "spotify:track:2"),
+            backend.SongInfo("Hey Jude (Remastered)", "The Beatles", "Hey Jude", "spotify:track:3"),
+            backend.SongInfo("Not In Cassette", "Nobody", "Unknown", "spotify:track:4"),
+        ]
+        backend.copier(iter(tracks), None, dry_run=True, yt_search_algo=3, yt=ReplayYTMusic(cassette), concurrency=2)
+
+        events = list(read_events(self.events))
+        self.assertEqual(
+            [(event["event"], event.get("uri")) for event in events],
+            [
+                ("session_start", None),
+                ("match", "spotify:track:1"),
+                ("fallback", "spotify:track:2"),
+                ("duplicate", "spotify:track:3"),
+                ("error", "spotify:track:4"),
+                ("session_end", None),
+            ],
+        )
+        self.assertEqual((events[2]["video_id"], events[2]["yt_title"]), ("v2", "Other Song"))
+        self.assertEqual(events[-1]["incomplete"], 1)
+
+        with open(self.csv, newline="", encoding="utf-8") as f:
+            kinds = [row[1] if row else "" for row in csv.reader(f)]
+        self.assertEqual(
+            kinds,
+            [
+                "Inizio Sessione",
+                "Spotify",
+                "YouTubeMusic",
+                "",
+                "DUPLICATE (presente)(YTMusic)",
+                "DUPLICATE (saltata)(Spotify)",
+                "ERROR: Not Found on Youtube",
+                "Fine Sessione",
+                "",
+                "",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.metrics import MetricsExporter, MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+    def test_export_formats(self):
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests")
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        requests.inc(method="search")
+        requests.inc(2, method="search")
+        for value in (0.05, 0.5, 0.5, 3.0):
+            latency.observe(value)
+
+        text = registry.to_prometheus()
+        self.assertIn('requests_total{method="search"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn("latency_seconds_count 4", text)
+
+        snapshot = json.loads(registry.to_json())["metrics"]["latency_seconds"]["values"][0]
+        self.assertEqual((snapshot["count"], snapshot["sum"], snapshot["p50"], snapshot["p99"]), (4, 4.05, 1.0, None))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "metrics.json")
+            exporter = MetricsExporter(registry, path, "json", interval=60)
+            exporter.stop()
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f)["metrics"]["requests_total"]["values"][0]["value"], 3)
+
+    @patch("spotify2ytmusic.backend.time.sleep")
+    def test_ytmusic_call_metrics(self, _sleep):
+        func = MagicMock(side_effect=[Exception("HTTP 429"), "ok"])
+        func.__name__ = "_add_playlist_items"
+        backend.configure_rate_limiter(0)
+        retries = backend.request_retries.value(method="add_playlist_items")
+        count = backend.request_seconds.count(method="add_playlist_items")
+
+        self.assertEqual(backend.ytmusic_call(func, tries=2), "ok")
+        self.assertEqual(backend.request_retries.value(method="add_playlist_items"), retries + 1)
+        self.assertEqual(backend.request_seconds.count(method="add_playlist_items"), count + 2)
+        backend.configure_rate_limiter(backend.DEFAULT_REQUESTS_PER_SECOND)
+
+
+if __name__ == "__main__":
+    unittest.main()
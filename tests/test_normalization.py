@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+from spotify2ytmusic.normalized_metadata_algorithm import (
+    best_candidate,
+    bounded_levenshtein_distance,
+    clean_metadata,
+    levenshtein_distance,
+    normalize_track,
+    normalize_youtube_track,
+    normalized_track_match,
+    normalized_tracks_match,
+    rank_candidates,
+    transliterate_text,
+)
+
+
+class TestCleanMetadata(unittest.TestCase):
+    def test_rules(self):
+        self.assertEqual(clean_metadata("Song (feat. Someone) - Remastered 2011"), "song")
+        self.assertEqual(clean_metadata("Abbey Road (Super Deluxe Edition) EP", "album"), "abbey road")
+        self.assertEqual(clean_metadata("The Rolling  Stones", "artist"), "rollingstones")
+        self.assertEqual(clean_metadata("Beyoncé & Jay-Z", "artist"), "beyonceandjayz")
+
+    def test_fold_unicode(self):
+        self.assertEqual(transliterate_text("Ærø ő"), "AEro ő")
+        self.assertEqual(transliterate_text("Ærø ő", fold_unicode=True), "AEro o")
+        self.assertEqual(clean_metadata("Sigur Rós – Hoppípolla", fold_unicode=True), "sigur ros – hoppipolla")
+
+
+class TestLevenshtein(unittest.TestCase):
+    def test_bounded_matches_full(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            text1 = "".join(rng.choice("ab c") for _ in range(rng.randint(0, 10)))
+            text2 = "".join(rng.choice("ab c") for _ in range(rng.randint(0, 10)))
+            max_distance = rng.randint(0, 3)
+            self.assertEqual(
+                bounded_levenshtein_distance(text1, text2, max_distance),
+                min(levenshtein_distance(text1, text2), max_distance + 1),
+                (text1, text2, max_distance),
+            )
+
+
+class TestNormalizedTrack(unittest.TestCase):
+    def test_precomputed_match(self):
+        spotify = normalize_track("Hey Jude - Remastered 2015", "Hey Jude", "The Beatles")
+        self.assertIs(normalize_track("Hey Jude - Remastered 2015", "Hey Jude", "The Beatles"), spotify)
+        self.assertEqual(spotify.clean_title, "hey jude")
+
+        candidates = [
+            {"title": "Hey Jude (Remastered 2015)", "album": {"name": "1"}, "artists": [{"name": "The Beatles"}]},
+            {"title": "Hey Jude (Instrumental)", "album": {"name": "Hey Jude"}, "artists": [{"name": "The Beatles"}]},
+            {"title": "Beatles: Hey Jude", "album": None, "artists": [{"name": "Beatles & Friends"}]},
+            {"title": "Let It Be", "album": "Let It Be", "artists": [{"name": "The Beatles"}]},
+        ]
+        decisions = [
+            normalized_tracks_match(spotify, normalize_youtube_track(song)) for song in candidates[:2]
+        ]
+        self.assertEqual(decisions, [True, False])
+        for song in candidates:
+            self.assertEqual(
+                normalized_tracks_match(spotify, normalize_youtube_track(song)),
+                normalized_track_match("Hey Jude - Remastered 2015", "Hey Jude", "The Beatles", song),
+            )
+
+
+class TestScoredMatching(unittest.TestCase):
+    def test_rank_candidates(self):
+        spotify = normalize_track("Hey Jude - Remastered 2015", "Hey Jude", "The Beatles")
+        songs = [
+            {"title": "Let It Be", "album": {"name": "Let It Be"}, "artists": [{"name": "The Beatles"}]},
+            {"title": "Hey Jude (Instrumental)", "album": {"name": "Hey Jude"}, "artists": [{"name": "The Beatles"}]},
+            {"title": "Hey Jude", "album": None},
+            {"title": "Hey Jude (Remastered 2015)", "album": {"name": "Hey Jude"}, "artists": [{"name": "The Beatles"}]},
+        ]
+        ranked = rank_candidates(spotify, songs)
+        self.assertEqual([candidate.position for candidate in ranked], [3, 1, 0, 2])
+        self.assertIn("title_clean", ranked[0].reasons)
+        self.assertIn("album_exact", ranked[0].reasons)
+        self.assertIn("instrumental_mismatch", ranked[1].reasons)
+        self.assertEqual(ranked[-1].reasons, ("malformed",))
+        self.assertEqual(ranked[-1].score, 0)
+
+        self.assertIs(best_candidate(spotify, songs, 0.7).song, songs[3])
+        self.assertIsNone(best_candidate(spotify, songs[:3], 0.7))
+        self.assertIsNone(best_candidate(spotify, [], 0.7))
+
+
+if __name__ == "__main__":
+    unittest.main()
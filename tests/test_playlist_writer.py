@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+import contextlib
+import io
+import unittest
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import backend
+
+
+class TestPlaylistWriter(unittest.TestCase):
+    def setUp(self):
+        backend.configure_rate_limiter(0)
+
+    def test_chunks_keep_order(self):
+        yt = MagicMock()
+        writer = backend.PlaylistWriter(yt, "dst", batch_size=3)
+        for i in range(7):
+            writer.add(f"v{i}")
+        writer.flush()
+
+        chunks = [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual(chunks, [["v0", "v1", "v2"], ["v3", "v4", "v5"], ["v6"]])
+        self.assertEqual(writer.written, 7)
+
+    @patch("spotify2ytmusic.rate_limiter.time.sleep")
+    def test_bisect_on_failure(self, _sleep):
+        yt = MagicMock()
+
+        def add_playlist_items(playlistId, videoIds, duplicates):
+            if "bad" in videoIds:
+                raise Exception("rejected")
+
+        yt.add_playlist_items.side_effect = add_playlist_items
+        writer = backend.PlaylistWriter(yt, "dst", batch_size=4)
+        for video_id in ["a", "b", "bad", "c"]:
+            writer.add(video_id)
+
+        written = [
+            c.kwargs["videoIds"]
+            for c in yt.add_playlist_items.call_args_list
+            if "bad" not in c.kwargs["videoIds"]
+        ]
+        self.assertEqual(written, [["a", "b"], ["c"]])
+        self.assertEqual(writer.failed, ["bad"])
+        self.assertEqual(writer.written, 3)
+
+    @patch("spotify2ytmusic.backend.time.sleep")
+    def test_rejected_track_is_not_retried(self, sleep):
+        yt = MagicMock()
+
+        def add_playlist_items(playlistId, videoIds, duplicates):
+            if "present" in videoIds:
+                return {"status": "STATUS_FAILED", "actions": []}
+            return {"status": "STATUS_SUCCEEDED"}
+
+        yt.add_playlist_items.side_effect = add_playlist_items
+        journal = MagicMock()
+        writer = backend.PlaylistWriter(yt, "dst", batch_size=50, journal=journal)
+        for i in range(50):
+            writer.add("present" if i == 17 else f"v{i}", f"k{i}")
+
+        self.assertEqual(yt.add_playlist_items.call_count, 13)  # 1 + 2 per livello di bisezione
+        sleep.assert_not_called()
+        self.assertEqual((writer.written, writer.failed, writer.rejected), (49, [], ["present"]))
+        journal.record.assert_any_call("k17", "duplicate", "present")
+
+
+class TestLookupPipeline(unittest.TestCase):
+    @patch("spotify2ytmusic.backend.lookup_song")
+    def test_concurrent_order_matches_serial(self, mock_lookup):
+        def lookup(yt, title, artist, album, algo, details, suggestions):
+            if title == "t13":
+                raise ValueError("not found")
+            details.fallback = title == "t7"
+            backend._lookup_message(details, f"\tNO-MATCH: {title}")
+            return {"videoId": title}
+
+        mock_lookup.side_effect = lookup
+        tracks = [backend.SongInfo(f"t{i}", "artist", "album") for i in range(40)]
+
+        def run(concurrency):
+            return [
+                (src.title, dst and dst["videoId"], details and (details.fallback, details.messages), type(err))
+                for src, dst, details, err in backend._iter_lookups(
+                    MagicMock(), iter(tracks), 3, concurrency
+                )
+            ]
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            results = run(8)
+        self.assertEqual(output.getvalue(), "")  # I messaggi di ogni ricerca tornano con il suo risultato
+        self.assertEqual(results, run(1))
+        self.assertEqual(len(results), 40)
+        self.assertEqual(results[5], ("t5", "t5", (False, ["\tNO-MATCH: t5"]), type(None)))
+        self.assertEqual([title for title, _, details, _ in results if details and details[0]], ["t7"])
+
+    @patch("spotify2ytmusic.backend.lookup_song")
+    def test_memo_shared_between_runs(self, mock_lookup):
+        mock_lookup.side_effect = lambda yt, title, artist, album, algo, **kwargs: {"videoId": title}
+        memo = backend.LookupMemo()
+        tracks = [
+            backend.SongInfo("Song", "The Artist", "Album"),
+            backend.SongInfo("song", "Artist", "Album (Deluxe Edition)"),
+        ]
+
+        for _ in range(2):
+            results = list(backend._iter_lookups(MagicMock(), iter(tracks), 3, 2, memo))
+            self.assertEqual([dst["videoId"] for _, dst, _, _ in results], ["Song", "Song"])
+
+        self.assertEqual(mock_lookup.call_count, 1)
+        self.assertEqual((memo.hits, memo.misses), (3, 1))
+
+    def test_memo_forgets_failures(self):
+        memo = backend.LookupMemo()
+        track = backend.SongInfo("Song", "Artist", "Album")
+        lookup = MagicMock(side_effect=[ConnectionError("timeout"), {"videoId": "v"}])
+        with self.assertRaises(ConnectionError):
+            memo.lookup(track, lookup)
+        self.assertEqual(memo.lookup(track, lookup), {"videoId": "v"})
+        self.assertEqual(memo.lookup(track, lookup), {"videoId": "v"})
+        self.assertEqual(lookup.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.rate_limiter import RateLimiter, retry_delay
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_aimd(self):
+        limiter = RateLimiter(10, min_rate=1, decrease_factor=0.5, increase_step=1)
+        limiter.on_error()
+        limiter.on_error()
+        self.assertEqual(limiter.rate, 2.5)
+        for _ in range(3):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 5.5)
+        for _ in range(10):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 10)
+        for _ in range(10):
+            limiter.on_error()
+        self.assertEqual(limiter.rate, 1)
+
+    @patch("spotify2ytmusic.rate_limiter.time.sleep")
+    @patch("spotify2ytmusic.rate_limiter.time.monotonic", return_value=100.0)
+    def test_acquire_spacing(self, _monotonic, sleep):
+        limiter = RateLimiter(4, burst=2)
+        waits = [limiter.acquire() for _ in range(4)]
+        self.assertEqual(waits, [0.0, 0.0, 0.25, 0.5])
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_unlimited(self):
+        limiter = RateLimiter(0)
+        self.assertEqual(limiter.acquire(), 0.0)
+        limiter.on_error()
+        self.assertEqual(limiter.rate, 0)
+
+
+class TestRetryBackoff(unittest.TestCase):
+    def test_retry_delay(self):
+        delays = [retry_delay(attempt, base=5, cap=60) for attempt in range(6)]
+        for delay, expected in zip(delays, [5, 10, 20, 40, 60, 60]):
+            self.assertTrue(expected * 0.8 <= delay <= expected * 1.2, (delay, expected))
+
+    @patch("spotify2ytmusic.backend.time.sleep")
+    def test_unlimited_rate_still_backs_off(self, sleep):
+        backend.configure_rate_limiter(0)
+        func = MagicMock(side_effect=[Exception("HTTP 429"), Exception("HTTP 429"), "ok"])
+        func.__name__ = "search"
+        try:
+            self.assertEqual(backend.ytmusic_call(func, tries=3), "ok")
+        finally:
+            backend.configure_rate_limiter(backend.DEFAULT_REQUESTS_PER_SECOND)
+        waits = [c.args[0] for c in sleep.call_args_list]
+        self.assertEqual(len(waits), 2)
+        self.assertTrue(4 <= waits[0] <= 6 and 8 <= waits[1] <= 12, waits)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.resume_journal import ResumeJournal, track_key
+
+
+class TestResumeJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "journal", "pl.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_reload_and_torn_line(self):
+        journal = ResumeJournal(self.path)
+        journal.record("a", "added", "v1")
+        journal.record("b", "error")
+        journal.close()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"key": "c", "outc')
+
+        journal = ResumeJournal(self.path)
+        self.assertTrue(journal.is_done("a"))
+        self.assertFalse(journal.is_done("b"))
+        self.assertIsNone(journal.get("c"))
+        journal.record("d", "duplicate", "v2")
+        journal.close()
+
+        self.assertTrue(ResumeJournal(self.path).is_done("d"))
+        self.assertEqual(len(ResumeJournal(self.path, reset=True)), 0)
+
+    @patch("spotify2ytmusic.backend.lookup_song")
+    def test_copier_skips_journaled_tracks(self, mock_lookup):
+        mock_lookup.side_effect = lambda yt, title, artist, album, algo, **kwargs: {
+            "videoId": title,
+            "title": title,
+        }
+        tracks = [backend.SongInfo(f"t{i}", "artist", "album") for i in range(5)]
+        backend.configure_rate_limiter(0)
+
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            journal = ResumeJournal(backend.journal_path("src", "dst"))
+            for track in tracks[:3]:
+                journal.record(track_key(track), "added", track.title)
+            journal.close()
+
+            yt = MagicMock()
+            backend.copier(iter(tracks), "dst", yt=yt, source_id="src", concurrency=1)
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(
+            [c.args[1] for c in mock_lookup.call_args_list], ["t3", "t4"]
+        )
+        yt.add_playlist_items.assert_called_once_with(
+            playlistId="dst", videoIds=["t3", "t4"], duplicates=False
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
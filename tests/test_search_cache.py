@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+import unittest
+from unittest.mock import patch
+
+from spotify2ytmusic.search_cache import SearchCache, canonicalize_query
+
+
+class TestSearchCache(unittest.TestCase):
+    def test_canonical_query_hit(self):
+        cache = SearchCache(":memory:")
+        cache.put("Survival  Yes", "songs", [{"videoId": "abc"}])
+
+        self.assertEqual(cache.get(" survival yes ", "songs"), [{"videoId": "abc"}])
+        self.assertIsNone(cache.get("survival yes", "videos"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(canonicalize_query("A\tB "), "a b")
+
+    def test_ttl_expiry(self):
+        cache = SearchCache(":memory:", ttl=10)
+        with patch("spotify2ytmusic.search_cache.time.time", return_value=1000):
+            cache.put("query", "songs", [])
+        with patch("spotify2ytmusic.search_cache.time.time", return_value=1011):
+            self.assertIsNone(cache.get("query", "songs"))
+        self.assertEqual(len(cache), 0)
+
+    def test_size_bound(self):
+        cache = SearchCache(":memory:", max_entries=20)
+        for i in range(50):
+            cache.put(f"query {i}", "songs", [i])
+        self.assertLessEqual(len(cache), 20)
+        self.assertEqual(cache.get("query 49", "songs"), [49])
+        self.assertIsNone(cache.get("query 0", "songs"))
+
+    def test_eviction_is_amortized(self):
+        cache = SearchCache(":memory:", max_entries=100)
+        statements = []
+        cache._db.set_trace_callback(statements.append)
+        for i in range(300):
+            cache.put(f"query {i}", "songs", [i])
+        #  Un conteggio solo dopo ogni rimozione, non a ogni inserimento
+        self.assertLessEqual(sum("COUNT(*)" in statement for statement in statements), 25)
+        self.assertLessEqual(len(cache), 100)
+
+    def test_refresh_skips_reads(self):
+        cache = SearchCache(":memory:", refresh=True)
+        cache.put("query", "songs", [1])
+        self.assertIsNone(cache.get("query", "songs"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.ytmusic_replay import (
+    CassetteMiss,
+    InjectedError,
+    RecordingYTMusic,
+    ReplayedError,
+    ReplayYTMusic,
+)
+
+
+class TestYTMusicReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cassette = os.path.join(self.tmpdir.name, "cassette.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def record(self):
+        yt = MagicMock()
+        yt.search.side_effect = [[{"videoId": "a"}], [{"videoId": "b"}]]
+        yt.get_playlist.side_effect = Exception("HTTP 429")
+        yt.create_playlist.return_value = "PL1"
+        recorder = RecordingYTMusic(yt, self.cassette)
+        recorder.search(query="x", filter="songs")
+        recorder.search(query="x", filter="songs")
+        with self.assertRaises(Exception):
+            recorder.get_playlist("PL0", limit=None)
+        recorder.create_playlist(title="t", description="d")
+        recorder.get_home()  # Not recorded
+        recorder.close()
+        self.assertEqual(recorder.calls, 4)
+
+    def test_record_replay(self):
+        self.record()
+        yt = ReplayYTMusic(self.cassette)
+        self.assertEqual(yt.search(query="x", filter="songs"), [{"videoId": "a"}])
+        self.assertEqual(yt.search(query="x", filter="songs"), [{"videoId": "b"}])
+        self.assertEqual(yt.search(query="x", filter="songs"), [{"videoId": "b"}])
+        with self.assertRaises(ReplayedError):
+            yt.get_playlist("PL0", limit=None)
+        self.assertEqual(yt.create_playlist(title="t", description="d"), "PL1")
+
+        #  Writes not in the cassette succeed, reads fail
+        self.assertEqual(yt.create_playlist(title="other", description="d"), "REPLAY1")
+        self.assertEqual(yt.add_playlist_items(playlistId="PL1", videoIds=["a"]), {"status": "STATUS_SUCCEEDED"})
+        with self.assertRaises(CassetteMiss):
+            yt.search(query="y", filter="songs")
+        self.assertEqual(yt.misses, 3)
+
+    def test_injected_errors(self):
+        self.record()
+        yt = ReplayYTMusic(self.cassette, error_rate=0.5, seed=1)
+        failures = 0
+        for _ in range(200):
+            try:
+                yt.search(query="x", filter="songs")
+            except InjectedError:
+                failures += 1
+        self.assertEqual(failures, yt.injected_errors)
+        self.assertTrue(60 < failures < 140)
+
+    @patch("spotify2ytmusic.backend.time.sleep")
+    def test_replay_skips_playlist_settle(self, sleep):
+        self.record()
+        backend.configure_ytmusic_transport(replay=self.cassette)
+        try:
+            backend.configure_rate_limiter(0)
+            self.assertEqual(backend._ytmusic_create_playlist(backend.get_ytmusic(), "other", "d"), "REPLAY1")
+            sleep.assert_not_called()
+        finally:
+            backend.configure_ytmusic_transport()
+            backend.configure_rate_limiter(backend.DEFAULT_REQUESTS_PER_SECOND)
+        self.assertEqual(backend.playlist_settle_seconds, backend.PLAYLIST_SETTLE_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()